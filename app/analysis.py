@@ -0,0 +1,945 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Callable
+
+from app.api_client import (
+    REPAIR_LANGUAGE_HINT,
+    DeepSeekClient,
+    DeepSeekResponse,
+    build_repair_requirements,
+    estimate_prompt_tokens,
+    response_tokens,
+    usage_metrics,
+)
+from app.cancel import Cancelled, CancelToken
+from app.chunking import FILE_MARKER_RE, Chunk, chunk_code
+from app.compaction import CompactionResult, compact_code
+from app.concurrency import get_controller
+from app.git_diff import DiffHunk, format_hunks, locate_issue
+from app.hedging import get_hedger
+from app.json_stream import extract_json_object
+from app.metrics import combine, content_hash, detect_language, measure, measure_many
+from app.models import (
+    MIN_CATEGORIES,
+    CategoryResult,
+    ReviewResult,
+    merge_review_fix,
+    parse_review_json,
+    review_problems,
+    review_result_from_dict,
+)
+from app.providers import get_provider, input_token_budget
+from app.result_cache import ResultCache, cache_key, is_cacheable
+from app.routing import get_router, should_fail_over
+from app.scheduler import current_deadline, current_priority, get_scheduler
+from app.settings import AppSettings
+from app.singleflight import SingleFlight
+from app.spend import get_ledger
+
+PROJECT_REQUIREMENTS = (
+    "这是一个多文件项目，请额外检测跨文件连贯逻辑：\n"
+    "- 调用链是否自洽、模块边界是否清晰\n"
+    "- 命名/接口/数据结构是否一致\n"
+    "- 重复逻辑与可复用点\n"
+    "- 潜在循环依赖、耦合过高点\n"
+    "请在 categories 增加维度：连贯性/跨文件逻辑、一致性/架构。"
+)
+
+REDUCE_REQUIREMENTS = (
+    "输入不是源代码，而是同一项目中每个文件的单独检测结果摘要（JSON 列表），"
+    "包含文件名、分数、总结、主要问题以及顶层符号与导入。\n"
+    "请只基于这些摘要给出项目级结论：overall_summary 概括整个项目；"
+    "categories 只需输出跨文件维度：连贯性/跨文件逻辑、一致性/架构，"
+    "以及你发现的其他跨文件问题（如重复逻辑、循环依赖、耦合）。"
+)
+
+DIFF_REQUIREMENTS = (
+    "输入不是完整文件，而是当前分支相对基线的改动片段：每个文件以“### 路径”开头，"
+    "每个片段以“@@ 第 起-止 行 @@”开头；行首数字为新版本中的行号，“+”为新增行，“-”为删除行，其余为上下文。\n"
+    "只评价改动行及其直接影响，上下文仅供理解，不要评价未改动的代码；"
+    "每条 issues 以“路径:行号”开头标明位置。"
+)
+
+FAILOVER_DEADLINE_S = 30.0
+MAX_REPAIR_CHARS = 16000
+
+PROJECT_LANGUAGE_HINT = "多文件项目（可能多语言）"
+DIFF_LANGUAGE_HINT = "Git 分支改动片段"
+
+_COMPLEXITY_ORDER = {"低": 0, "中": 1, "高": 2}
+
+
+@dataclass(frozen=True)
+class AnalysisOutcome:
+    result: ReviewResult
+    from_cache: bool = False
+
+
+_FLIGHTS: SingleFlight[AnalysisOutcome] = SingleFlight()
+
+
+def coalescing_stats() -> dict[str, int]:
+    return _FLIGHTS.stats()
+
+
+@dataclass(frozen=True)
+class FileResult:
+    name: str
+    result: ReviewResult
+    from_cache: bool = False
+    error: str = ""
+    unchanged: bool = False
+
+
+@dataclass
+class AnalysisState:
+    fingerprint: str = ""
+    files: dict[str, tuple[str, FileResult]] = field(default_factory=dict)
+    project_key: str = ""
+    project: ReviewResult | None = None
+
+    def reset(self, fingerprint: str = "") -> None:
+        self.fingerprint = fingerprint
+        self.files = {}
+        self.project_key = ""
+        self.project = None
+
+    def lookup(self, name: str, digest: str) -> FileResult | None:
+        entry = self.files.get(name)
+        if entry is None or entry[0] != digest:
+            return None
+        return entry[1]
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "files": {
+                name: {"hash": digest, "result": asdict(fr.result)} for name, (digest, fr) in self.files.items()
+            },
+            "project_key": self.project_key if self.project is not None else "",
+            "project": asdict(self.project) if self.project is not None else None,
+        }
+
+    @classmethod
+    def from_json(cls, data: Any) -> AnalysisState:
+        state = cls()
+        if not isinstance(data, dict):
+            return state
+        state.fingerprint = str(data.get("fingerprint") or "")
+        files = data.get("files") if isinstance(data.get("files"), dict) else {}
+        for name, entry in files.items():
+            if not isinstance(entry, dict) or not isinstance(entry.get("result"), dict):
+                continue
+            result = review_result_from_dict(entry["result"])
+            state.files[str(name)] = (str(entry.get("hash") or ""), FileResult(name=str(name), result=result))
+        if isinstance(data.get("project"), dict) and data.get("project_key"):
+            state.project_key = str(data["project_key"])
+            state.project = review_result_from_dict(data["project"])
+        return state
+
+
+def settings_fingerprint(settings: AppSettings) -> str:
+    model, base_url = _model_identity(settings)
+    providers = [r.provider for r in settings.routes] or [settings.provider]
+    prompt = json.dumps(
+        [settings.compaction, [get_provider(p).response_format for p in providers], MIN_CATEGORIES],
+        separators=(",", ":"),
+    )
+    return cache_key(code="", model=model, base_url=base_url, language_hint="", extra_requirements=prompt)
+
+
+def analyze_single(
+    settings: AppSettings,
+    code: str,
+    language_hint: str,
+    extra_requirements: str = "",
+    cache: ResultCache | None = None,
+    force_refresh: bool = False,
+    on_delta: Callable[[str], None] | None = None,
+    path: str = "",
+    cancel: CancelToken | None = None,
+    min_categories: int = MIN_CATEGORIES,
+    split_files: bool | None = None,
+) -> AnalysisOutcome:
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+    if split_files is None:
+        split_files = language_hint in (PROJECT_LANGUAGE_HINT, DIFF_LANGUAGE_HINT)
+    compacted = compact_code(code, settings.compaction, path)
+    model, base_url = _model_identity(settings)
+    key = cache_key(
+        code=compacted.text,
+        model=model,
+        base_url=base_url,
+        language_hint=language_hint,
+        extra_requirements=extra_requirements,
+    )
+    if cache is not None and not force_refresh:
+        hit = cache.get(key)
+        if hit is not None:
+            return AnalysisOutcome(result=parse_review_json(hit), from_cache=True)
+
+    def run(token: CancelToken, relay: Callable[[str], None] | None) -> AnalysisOutcome:
+        return _analyze_uncached(
+            settings,
+            code,
+            compacted,
+            key,
+            language_hint,
+            extra_requirements,
+            cache,
+            force_refresh,
+            relay,
+            path,
+            token,
+            min_categories,
+            split_files,
+        )
+
+    outcome, joined = _FLIGHTS.do(key, run, on_delta, cancel)
+    if joined:
+        metrics = {**outcome.result.metrics, **_local_metrics(code, path, language_hint)}
+        return replace(outcome, result=replace(outcome.result, metrics=metrics))
+    return outcome
+
+
+def _analyze_uncached(
+    settings: AppSettings,
+    code: str,
+    compacted: CompactionResult,
+    key: str,
+    language_hint: str,
+    extra_requirements: str,
+    cache: ResultCache | None,
+    force_refresh: bool,
+    on_delta: Callable[[str], None] | None,
+    path: str,
+    cancel: CancelToken,
+    min_categories: int = MIN_CATEGORIES,
+    split_files: bool = False,
+) -> AnalysisOutcome:
+    overhead = estimate_prompt_tokens("", language_hint, extra_requirements)
+    targets = [(r.provider, r.model) for r in settings.routes] or [(settings.provider, settings.model)]
+    budget = min(input_token_budget(provider, model, overhead) for provider, model in targets)
+    if compacted.compacted_tokens > budget:
+        ratio = compacted.original_tokens / max(1, compacted.compacted_tokens)
+        chunked = _analyze_chunked(
+            settings,
+            code,
+            language_hint,
+            extra_requirements,
+            int(budget * ratio),
+            cache,
+            force_refresh,
+            path,
+            cancel,
+            split_files,
+        )
+        if chunked is not None:
+            metrics = {**chunked.result.metrics, **_local_metrics(code, path, language_hint), **compacted.to_metrics()}
+            return replace(chunked, result=replace(chunked.result, metrics=metrics))
+    if settings.hedging:
+        resp, extras = _hedged_request(settings, compacted.text, language_hint, extra_requirements, on_delta, cancel)
+    else:
+        resp, extras = _request(settings, compacted.text, language_hint, extra_requirements, on_delta, cancel)
+    payload = _safe_parse_json(resp.content_text)
+    problems = review_problems(payload, min_categories)
+    repair: dict[str, Any] = {}
+    if problems:
+        payload, repair = _repair_payload(settings, payload, problems, compacted.text, min_categories, cancel)
+    payload.setdefault("metrics", {})
+    if isinstance(payload.get("metrics"), dict):
+        payload["metrics"] = {**payload["metrics"], **_local_metrics(code, path, language_hint), **compacted.to_metrics()}
+    if cache is not None and is_cacheable(payload):
+        cache.put(key, payload)
+    usage: dict[str, Any] = usage_metrics(resp.usage)
+    if resp.retries:
+        usage["retries"] = resp.retries
+    usage.update(extras)
+    usage.update(repair)
+    if usage and isinstance(payload.get("metrics"), dict):
+        payload = {**payload, "metrics": {**payload["metrics"], **usage}}
+    return AnalysisOutcome(result=parse_review_json(payload))
+
+
+def _repair_payload(
+    settings: AppSettings,
+    payload: dict,
+    problems: list[str],
+    code: str,
+    min_categories: int,
+    cancel: CancelToken | None,
+) -> tuple[dict, dict[str, int]]:
+    partial = "raw_text" not in payload
+    if partial:
+        categories = [c for c in payload.get("categories") or [] if isinstance(c, dict)]
+        with_code = bool(payload.get("repaired")) or len(categories) < min_categories
+        keep = {k: payload[k] for k in ("overall_score", "overall_summary", "categories") if k in payload}
+        material = json.dumps(keep, ensure_ascii=False, separators=(",", ":"))
+        if with_code:
+            material += f"\n\n原始代码：\n{code}"
+    else:
+        with_code = False
+        material = payload["raw_text"][:MAX_REPAIR_CHARS]
+    requirements = build_repair_requirements(problems, partial, with_code)
+    try:
+        resp, _ = _request(settings, material, REPAIR_LANGUAGE_HINT, requirements, None, cancel)
+    except Cancelled:
+        raise
+    except Exception:
+        return payload, {}
+    metrics = {"repair_requests": 1}
+    prompt_tokens = usage_metrics(resp.usage).get("prompt_tokens")
+    if prompt_tokens:
+        metrics["repair_prompt_tokens"] = prompt_tokens
+    fix = _safe_parse_json(resp.content_text)
+    if "raw_text" in fix:
+        return payload, metrics
+    merged = merge_review_fix(payload, fix)
+    remaining = review_problems(merged, min_categories)
+    if len(remaining) >= len(problems):
+        return payload, metrics
+    return merged, {**metrics, "repaired_fields": len(problems) - len(remaining)}
+
+
+def _request(
+    settings: AppSettings,
+    code: str,
+    language_hint: str,
+    extra_requirements: str,
+    on_delta: Callable[[str], None] | None,
+    cancel: CancelToken | None = None,
+) -> tuple[DeepSeekResponse, dict[str, Any]]:
+    if not settings.routes:
+        return _send(settings, code, language_hint, extra_requirements, on_delta, cancel=cancel), {}
+    router = get_router()
+    ranked = router.ranked(settings.routes)
+    for i, endpoint in enumerate(ranked):
+        target = replace(
+            settings,
+            provider=endpoint.provider,
+            base_url=endpoint.base_url,
+            api_key=endpoint.api_key,
+            model=endpoint.model,
+        )
+        streamed = False
+
+        def relay(piece: str) -> None:
+            nonlocal streamed
+            streamed = True
+            on_delta(piece)
+
+        last = i == len(ranked) - 1
+        try:
+            resp = _send(
+                target, code, language_hint, extra_requirements, relay if on_delta is not None else None, not last, cancel
+            )
+        except Cancelled:
+            raise
+        except Exception as e:
+            router.record(endpoint, 0.0, ok=False)
+            if last or streamed or not should_fail_over(e):
+                raise
+            continue
+        router.record(endpoint, resp.elapsed_s, ok=True)
+        return resp, {"endpoint": endpoint.label}
+    raise RuntimeError("没有可用的路由端点")
+
+
+def _hedged_request(
+    settings: AppSettings,
+    code: str,
+    language_hint: str,
+    extra_requirements: str,
+    on_delta: Callable[[str], None] | None,
+    cancel: CancelToken | None = None,
+) -> tuple[DeepSeekResponse, dict[str, Any]]:
+    hedger = get_hedger()
+    hedger.admit(settings.hedge_budget_pct)
+    streaming = settings.stream and on_delta is not None
+    key = "|".join((*_model_identity(settings), "stream" if streaming else "full"))
+    delay = hedger.delay(key, settings.hedge_percentile)
+    started = time.monotonic()
+    if delay is None:
+        observed = False
+
+        def observe(piece: str) -> None:
+            nonlocal observed
+            if not observed:
+                observed = True
+                hedger.observe(key, time.monotonic() - started)
+            on_delta(piece)
+
+        resp, extras = _request(
+            settings, code, language_hint, extra_requirements, observe if on_delta is not None else None, cancel
+        )
+        if not observed:
+            hedger.observe(key, time.monotonic() - started)
+        return resp, extras
+
+    progressed = threading.Event()
+    results: queue.Queue = queue.Queue()
+    tokens: dict[str, CancelToken] = {}
+    owner: list[str] = []
+    owner_lock = threading.Lock()
+
+    def attempt(name: str, target: AppSettings, token: CancelToken) -> None:
+        def relay(piece: str) -> None:
+            if name == "primary" and not progressed.is_set():
+                progressed.set()
+                hedger.observe(key, time.monotonic() - started)
+            with owner_lock:
+                if not owner:
+                    owner.append(name)
+                mine = owner[0] == name
+            if mine:
+                on_delta(piece)
+
+        try:
+            resp, extras = _request(target, code, language_hint, extra_requirements, relay if on_delta is not None else None, token)
+        except Exception as e:
+            results.put((name, None, {}, e))
+        else:
+            results.put((name, resp, extras, None))
+        finally:
+            if name == "primary" and not progressed.is_set():
+                progressed.set()
+                hedger.observe(key, time.monotonic() - started)
+
+    def launch(name: str, target: AppSettings) -> None:
+        tokens[name] = CancelToken()
+        if cancel is not None:
+            cancel.on_cancel(tokens[name].cancel)
+        context = contextvars.copy_context()
+        threading.Thread(
+            target=context.run, args=(attempt, name, target, tokens[name]), name=f"hedge-{name}", daemon=True
+        ).start()
+
+    launch("primary", settings)
+    if not progressed.wait(delay) and hedger.try_hedge():
+        launch("backup", _hedge_target(settings))
+    pending = len(tokens)
+    fallback: tuple[str, DeepSeekResponse, dict[str, Any]] | None = None
+    error: Exception | None = None
+    while pending:
+        name, resp, extras, exc = results.get()
+        pending -= 1
+        if exc is not None:
+            error = error or exc
+            continue
+        if not is_cacheable(_safe_parse_json(resp.content_text)):
+            fallback = fallback or (name, resp, extras)
+            continue
+        for other, token in tokens.items():
+            if other != name:
+                token.cancel()
+        if len(tokens) > 1:
+            extras = {**extras, "hedge": name}
+            if name == "backup":
+                hedger.record_win()
+        return resp, extras
+    if fallback is not None:
+        return fallback[1], fallback[2]
+    raise error or RuntimeError("对冲请求均未返回结果")
+
+
+def _hedge_target(settings: AppSettings) -> AppSettings:
+    if settings.hedge_backup:
+        endpoint = settings.hedge_backup[0]
+    elif len(settings.routes) > 1:
+        endpoint = get_router().ranked(settings.routes)[1]
+    else:
+        return settings
+    return replace(
+        settings,
+        provider=endpoint.provider,
+        base_url=endpoint.base_url,
+        api_key=endpoint.api_key,
+        model=endpoint.model,
+        routes=(),
+    )
+
+
+def _send(
+    settings: AppSettings,
+    code: str,
+    language_hint: str,
+    extra_requirements: str,
+    on_delta: Callable[[str], None] | None,
+    quick: bool = False,
+    cancel: CancelToken | None = None,
+) -> DeepSeekResponse:
+    spec = get_provider(settings.provider)
+    policy = spec.retry_policy
+    if quick:
+        policy = replace(policy, max_attempts=min(2, policy.max_attempts), deadline_s=min(FAILOVER_DEADLINE_S, policy.deadline_s))
+    limiter = get_controller().limiter(spec.provider_id, settings.base_url, settings.model, spec.initial_concurrency)
+    ledger = get_ledger()
+    ledger.enforce(settings.budget_daily_hard_usd)
+    gate = limiter.slot(current_priority(), cancel, current_deadline())
+    with gate as slot, get_scheduler().admit(spec.provider_id, cancel):
+        slot.started = time.monotonic()
+        client = DeepSeekClient(
+            base_url=settings.base_url,
+            api_key=settings.api_key,
+            stream_usage=spec.stream_usage,
+            retry_policy=policy,
+            on_retry=slot.on_retry,
+            response_format=spec.response_format,
+            provider=spec.provider_id,
+        )
+        resp = client.analyze_code(
+            code=code,
+            language_hint=language_hint,
+            model=settings.model,
+            extra_requirements=extra_requirements,
+            stream=settings.stream and on_delta is not None,
+            on_delta=on_delta,
+            cancel=cancel,
+        )
+        slot.tokens = response_tokens(resp, code, language_hint, extra_requirements)
+    ledger.charge_response(spec.provider_id, settings.model, resp, code, language_hint, extra_requirements)
+    return resp
+
+
+def _model_identity(settings: AppSettings) -> tuple[str, str]:
+    if settings.routes:
+        return "route:" + ",".join(r.label for r in settings.routes), ""
+    return settings.model, settings.base_url
+
+
+def _chunk_where(chunk: Chunk, diff: bool) -> str:
+    if not chunk.path:
+        return f"第 {chunk.start_line}-{chunk.end_line} 行"
+    where = chunk.path if diff else f"{chunk.path} 第 {chunk.start_line}-{chunk.end_line} 行"
+    return f"{where} 等 {chunk.files} 个文件" if chunk.files > 1 else where
+
+
+def _analyze_chunked(
+    settings: AppSettings,
+    code: str,
+    language_hint: str,
+    extra_requirements: str,
+    budget: int,
+    cache: ResultCache | None,
+    force_refresh: bool,
+    path: str = "",
+    cancel: CancelToken | None = None,
+    split_files: bool = False,
+) -> AnalysisOutcome | None:
+    chunks = chunk_code(code, max(512, budget - 64), split_files=split_files)
+    if len(chunks) <= 1:
+        return None
+    total = len(chunks)
+    diff = language_hint.startswith(DIFF_LANGUAGE_HINT)
+    names = [f"片段 {i}/{total}（{_chunk_where(c, diff)}）" for i, c in enumerate(chunks, 1)]
+    workers = max(1, min(settings.max_workers, total))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analyze-chunk") as pool:
+        futures = [
+            pool.submit(
+                contextvars.copy_context().run,
+                analyze_single,
+                settings,
+                code=c.text,
+                language_hint=f"{language_hint}（{name}）",
+                extra_requirements=extra_requirements,
+                cache=cache,
+                force_refresh=force_refresh,
+                path=path,
+                cancel=cancel,
+                split_files=split_files,
+            )
+            for c, name in zip(chunks, names)
+        ]
+        outcomes = [f.result() for f in futures]
+    parts = [FileResult(name=name, result=o.result, from_cache=o.from_cache) for name, o in zip(names, outcomes)]
+    merged = aggregate_file_results(parts, unit="段")
+    metrics = {**merged.metrics, "chunks": total}
+    metrics.pop("files", None)
+    summary = f"输入超出模型上下文预算，已按函数/类边界拆分为 {total} 段并行分析。\n{merged.overall_summary}"
+    result = ReviewResult(
+        overall_score=merged.overall_score,
+        overall_summary=summary,
+        categories=merged.categories,
+        metrics=metrics,
+        raw_json={"chunks": [{"name": p.name, "result": p.result.raw_json} for p in parts]},
+    )
+    return AnalysisOutcome(result=result, from_cache=all(o.from_cache for o in outcomes))
+
+
+def analyze_diff(
+    settings: AppSettings,
+    hunks: list[DiffHunk],
+    cache: ResultCache | None = None,
+    force_refresh: bool = False,
+    on_delta: Callable[[str], None] | None = None,
+    cancel: CancelToken | None = None,
+) -> AnalysisOutcome:
+    if not hunks:
+        raise ValueError("与基线相比没有代码改动")
+    code = format_hunks(hunks)
+    outcome = analyze_single(
+        settings,
+        code=code,
+        language_hint=DIFF_LANGUAGE_HINT,
+        extra_requirements=DIFF_REQUIREMENTS,
+        cache=cache,
+        force_refresh=force_refresh,
+        on_delta=on_delta,
+        cancel=cancel,
+    )
+    result = outcome.result
+    categories = [replace(c, issues=[_located_issue(x, hunks) for x in c.issues]) for c in result.categories]
+    metrics = {
+        **result.metrics,
+        "language": DIFF_LANGUAGE_HINT,
+        "files": len({h.path for h in hunks}),
+        "hunks": len(hunks),
+        "lines": code.count("\n") + 1,
+        "added_lines": sum(h.added for h in hunks),
+        "removed_lines": sum(h.removed for h in hunks),
+        "changed_ranges": [h.location for h in hunks],
+    }
+    return AnalysisOutcome(result=replace(result, categories=categories, metrics=metrics), from_cache=outcome.from_cache)
+
+
+def _located_issue(issue: str, hunks: list[DiffHunk]) -> str:
+    location = locate_issue(issue, hunks)
+    if not location or issue.startswith(location):
+        return issue
+    return f"[{location}] {issue}"
+
+
+def analyze_each(
+    settings: AppSettings,
+    files: list[tuple[str, str]],
+    max_workers: int = 4,
+    cache: ResultCache | None = None,
+    force_refresh: bool = False,
+    on_file_done: Callable[[FileResult, int, int], None] | None = None,
+    state: AnalysisState | None = None,
+    cancel: CancelToken | None = None,
+) -> list[FileResult]:
+    if not files:
+        raise ValueError("没有可检测的文件")
+    digests = [content_hash(code).hex() for _, code in files]
+    if state is not None:
+        fingerprint = settings_fingerprint(settings)
+        if state.fingerprint != fingerprint:
+            state.reset(fingerprint)
+    done: dict[int, FileResult] = {}
+    pending: list[int] = []
+    for idx, (name, _) in enumerate(files):
+        reused = None if state is None or force_refresh else state.lookup(name, digests[idx])
+        if reused is None:
+            pending.append(idx)
+            continue
+        done[idx] = replace(reused, from_cache=True, unchanged=True)
+        if on_file_done is not None:
+            on_file_done(done[idx], len(done), len(files))
+    if pending:
+        measure_many([files[i] for i in pending])
+        workers = max(1, min(int(max_workers), len(pending)))
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analyze-file")
+        try:
+            futures = {
+                pool.submit(
+                    contextvars.copy_context().run,
+                    _analyze_file,
+                    settings,
+                    files[idx][0],
+                    files[idx][1],
+                    cache,
+                    force_refresh,
+                    cancel,
+                ): idx
+                for idx in pending
+            }
+            if cancel is not None:
+                cancel.on_cancel(lambda: pool.shutdown(wait=False, cancel_futures=True))
+            for fut in as_completed(futures):
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                idx = futures[fut]
+                done[idx] = fut.result()
+                if on_file_done is not None:
+                    on_file_done(done[idx], len(done), len(files))
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+    results = [done[i] for i in range(len(files))]
+    if state is not None:
+        state.files = {
+            fr.name: (digest, replace(fr, from_cache=False, unchanged=False))
+            for fr, digest in zip(results, digests)
+            if not fr.error
+        }
+    return results
+
+
+def analyze_files(
+    settings: AppSettings,
+    files: list[tuple[str, str]],
+    max_workers: int = 4,
+    cache: ResultCache | None = None,
+    force_refresh: bool = False,
+    reduce_with_model: bool = True,
+    on_file_done: Callable[[FileResult, int, int], None] | None = None,
+    state: AnalysisState | None = None,
+    cancel: CancelToken | None = None,
+) -> tuple[ReviewResult, list[FileResult]]:
+    file_results = analyze_each(
+        settings,
+        files,
+        max_workers=max_workers,
+        cache=cache,
+        force_refresh=force_refresh,
+        on_file_done=on_file_done,
+        state=state,
+        cancel=cancel,
+    )
+    ok = [fr for fr in file_results if not fr.error]
+    if not ok:
+        raise RuntimeError("所有文件均分析失败：\n" + "\n".join(f"{fr.name}: {fr.error}" for fr in file_results))
+    project = reduce_file_results(
+        settings,
+        file_results,
+        files,
+        use_model=reduce_with_model,
+        cache=cache,
+        force_refresh=force_refresh,
+        state=state,
+        cancel=cancel,
+    )
+    return project, file_results
+
+
+def _analyze_file(
+    settings: AppSettings,
+    name: str,
+    code: str,
+    cache: ResultCache | None,
+    force_refresh: bool,
+    cancel: CancelToken | None = None,
+) -> FileResult:
+    try:
+        outcome = analyze_single(
+            settings,
+            code=code,
+            language_hint=detect_language(code, name),
+            cache=cache,
+            force_refresh=force_refresh,
+            path=name,
+            cancel=cancel,
+        )
+    except Cancelled:
+        raise
+    except Exception as e:
+        failed = parse_review_json({"overall_summary": f"分析失败：{e}", "categories": []})
+        return FileResult(name=name, result=failed, error=f"{type(e).__name__}: {e}")
+    return FileResult(name=name, result=outcome.result, from_cache=outcome.from_cache)
+
+
+def reduce_file_results(
+    settings: AppSettings,
+    file_results: list[FileResult],
+    files: list[tuple[str, str]],
+    use_model: bool = True,
+    cache: ResultCache | None = None,
+    force_refresh: bool = False,
+    state: AnalysisState | None = None,
+    cancel: CancelToken | None = None,
+) -> ReviewResult:
+    ok = [fr for fr in file_results if not fr.error]
+    key = _project_key(state, ok, use_model) if state is not None else ""
+    if key and not force_refresh and state.project is not None and state.project_key == key:
+        return state.project
+    project = _reduce(settings, ok, files, use_model, cache, force_refresh, cancel)
+    if state is not None:
+        state.project_key, state.project = (key, project) if key else ("", None)
+    return project
+
+
+def _reduce(
+    settings: AppSettings,
+    ok: list[FileResult],
+    files: list[tuple[str, str]],
+    use_model: bool,
+    cache: ResultCache | None,
+    force_refresh: bool,
+    cancel: CancelToken | None = None,
+) -> ReviewResult:
+    local = aggregate_file_results(ok)
+    if not use_model or len(ok) < 2:
+        return local
+    codes = dict(files)
+    digest = _project_digest(ok, codes)
+    try:
+        outcome = analyze_single(
+            settings,
+            code=digest,
+            language_hint="项目级汇总（逐文件结果摘要）",
+            extra_requirements=REDUCE_REQUIREMENTS,
+            cache=cache,
+            force_refresh=force_refresh,
+            cancel=cancel,
+            min_categories=1,
+        )
+    except Cancelled:
+        raise
+    except Exception:
+        return local
+    return _merge_reduce(local, outcome.result)
+
+
+def _project_key(state: AnalysisState, ok: list[FileResult], use_model: bool) -> str:
+    if not ok or any(fr.name not in state.files for fr in ok):
+        return ""
+    material = json.dumps([use_model, [[fr.name, state.files[fr.name][0]] for fr in ok]], separators=(",", ":"))
+    return content_hash(material).hex()
+
+
+def aggregate_file_results(file_results: list[FileResult], unit: str = "个文件") -> ReviewResult:
+    if not file_results:
+        return parse_review_json({})
+    weights = [max(1, _int(fr.result.metrics.get("lines"), 1)) for fr in file_results]
+    total_w = sum(weights)
+    overall = int(round(sum(fr.result.overall_score * w for fr, w in zip(file_results, weights)) / total_w))
+
+    order: list[str] = []
+    acc: dict[str, dict[str, Any]] = {}
+    for fr, w in zip(file_results, weights):
+        for cat in fr.result.categories:
+            slot = acc.get(cat.name)
+            if slot is None:
+                slot = {"score": 0.0, "weight": 0, "summaries": [], "issues": [], "suggestions": []}
+                acc[cat.name] = slot
+                order.append(cat.name)
+            slot["score"] += cat.score * w
+            slot["weight"] += w
+            if cat.summary:
+                slot["summaries"].append(f"{fr.name}：{cat.summary}")
+            slot["issues"].extend(f"[{fr.name}] {x}" for x in cat.issues)
+            for s in cat.suggestions:
+                if s not in slot["suggestions"]:
+                    slot["suggestions"].append(s)
+    categories = [
+        CategoryResult(
+            name=name,
+            score=int(round(acc[name]["score"] / max(1, acc[name]["weight"]))),
+            summary="；".join(acc[name]["summaries"][:3]),
+            issues=acc[name]["issues"],
+            suggestions=acc[name]["suggestions"],
+        )
+        for name in order
+    ]
+
+    metrics: dict[str, Any] = {"files": len(file_results)}
+    for key in ("lines", "code_lines", "comment_lines", "functions", "classes"):
+        metrics[key] = sum(_int(fr.result.metrics.get(key), 0) for fr in file_results)
+    for key in ("max_complexity", "max_nesting"):
+        metrics[key] = max(_int(fr.result.metrics.get(key), 0) for fr in file_results)
+    hints = [str(fr.result.metrics.get("complexity_hint") or "") for fr in file_results]
+    hints = [h for h in hints if h in _COMPLEXITY_ORDER]
+    if hints:
+        metrics["complexity_hint"] = max(hints, key=lambda h: _COMPLEXITY_ORDER[h])
+
+    worst = sorted(file_results, key=lambda fr: fr.result.overall_score)[:3]
+    summary = f"共 {len(file_results)} {unit}，加权总体分 {overall}。" + (
+        "得分最低：" + "、".join(f"{fr.name}（{fr.result.overall_score}）" for fr in worst) + "。" if worst else ""
+    )
+    return ReviewResult(
+        overall_score=overall,
+        overall_summary=summary,
+        categories=categories,
+        metrics=metrics,
+        raw_json={"files": [{"name": fr.name, "result": fr.result.raw_json} for fr in file_results]},
+    )
+
+
+def _merge_reduce(local: ReviewResult, reduced: ReviewResult) -> ReviewResult:
+    if not isinstance(reduced.raw_json.get("categories"), list) or not reduced.raw_json.get("categories"):
+        return local
+    known = {c.name for c in local.categories}
+    cross = [c for c in reduced.categories if c.name not in known]
+    overall = local.overall_score
+    if reduced.overall_score > 0:
+        overall = int(round((local.overall_score + reduced.overall_score) / 2))
+    summary = reduced.overall_summary or local.overall_summary
+    return ReviewResult(
+        overall_score=overall,
+        overall_summary=f"{summary}\n{local.overall_summary}",
+        categories=[*local.categories, *cross],
+        metrics=local.metrics,
+        raw_json={**local.raw_json, "reduce": reduced.raw_json},
+    )
+
+
+def _project_digest(file_results: list[FileResult], codes: dict[str, str]) -> str:
+    items = []
+    for fr in file_results:
+        code = codes.get(fr.name, "")
+        items.append(
+            {
+                "file": fr.name,
+                "score": fr.result.overall_score,
+                "summary": fr.result.overall_summary,
+                "categories": {c.name: c.score for c in fr.result.categories},
+                "issues": [x for c in fr.result.categories for x in c.issues][:8],
+                "symbols": _SYMBOL_RE.findall(code)[:40],
+                "imports": [m.strip() for m in _IMPORT_RE.findall(code)][:30],
+            }
+        )
+    return json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+
+
+_SYMBOL_RE = re.compile(
+    r"^\s*(?:export\s+)?(?:pub\s+)?(?:async\s+)?(?:def|class|function|func|fn|interface|struct|trait|impl)\s+(\w+)",
+    flags=re.M,
+)
+_IMPORT_RE = re.compile(r"^(\s*(?:import|from|#include|use|require|package)\b[^\n]{0,120})", flags=re.M)
+
+
+def _int(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except Exception:
+        return default
+
+
+def _local_metrics(code: str, path: str = "", language_hint: str = "") -> dict:
+    if language_hint.startswith(DIFF_LANGUAGE_HINT):
+        return {}
+    if language_hint.startswith(PROJECT_LANGUAGE_HINT):
+        sections = _project_sections(code)
+        if sections:
+            return combine(measure_many(sections))
+    return measure(code, path).to_dict()
+
+
+def _project_sections(code: str) -> list[tuple[str, str]]:
+    sections: list[tuple[str, list[str]]] = []
+    for line in code.splitlines():
+        if FILE_MARKER_RE.match(line):
+            sections.append((line[4:].strip(), []))
+        elif sections:
+            sections[-1][1].append(line)
+    return [(name, "\n".join(body)) for name, body in sections]
+
+
+def _safe_parse_json(text: str) -> dict:
+    obj, complete = extract_json_object(text)
+    if not isinstance(obj, dict):
+        return {"overall_score": 0, "overall_summary": "无法解析模型返回为JSON。", "raw_text": text.strip()}
+    if not complete:
+        obj["repaired"] = True
+    return obj
@@ -1,17 +1,76 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
-from typing import Any
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable
 from urllib.parse import urljoin, urlparse
 
-import requests
+from app.cancel import Cancelled, CancelToken
+from app.models import REVIEW_SCHEMA
+from app.retry import RetryEvent, RetryPolicy, call_with_retry
+from app.telemetry import RequestRecord, get_telemetry
+from app.tokens import estimate_tokens
+from app.transport import Transport, get_transport
+
+PROMPT_VERSION = "3"
+
+SYSTEM_PROMPT = (
+    "你是资深代码审查与代码质量分析助手。你只输出 JSON，不能输出任何解释性文字。"
+    "输出必须可被 json.loads 直接解析。分数范围 0-100，越高越好。"
+)
+
+RESPONSE_SCHEMA = json.dumps(
+    {
+        "overall_score": 0,
+        "overall_summary": "一句话总结优缺点",
+        "categories": [{"name": "简洁性", "score": 0, "summary": "简短说明", "issues": ["问题"], "suggestions": ["建议"]}],
+    },
+    ensure_ascii=False,
+    separators=(",", ":"),
+)
+
+REVIEW_INSTRUCTIONS = (
+    "请按以下 JSON 结构输出结果（字段名保持一致，categories 至少 5 项），不要输出多余文本：\n"
+    f"{RESPONSE_SCHEMA}\n"
+    "检测维度建议包含：简洁性、可读性、复杂度、可维护性、风格一致性、潜在缺陷/边界情况、安全性。\n"
+    "issues/suggestions 尽量具体到代码片段或模式，但不要粘贴整段代码。"
+    "代码中“…（已省略…）”处为预处理折叠的许可证、长注释、数据表或生成代码，不必评价。"
+)
+
+SYSTEM_MESSAGE = f"{SYSTEM_PROMPT}\n{REVIEW_INSTRUCTIONS}"
+
+REPAIR_LANGUAGE_HINT = "JSON（上一次审查输出）"
+
+RESPONSE_FORMATS = ("json_object", "json_schema")
 
 
 @dataclass(frozen=True)
 class DeepSeekResponse:
     content_text: str
     raw: dict[str, Any]
+    retries: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def usage(self) -> dict[str, Any]:
+        usage = self.raw.get("usage")
+        return usage if isinstance(usage, dict) else {}
+
+
+@dataclass
+class _UsageCounters:
+    requests: int = 0
+    reported: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+
+
+_usage_lock = threading.Lock()
+_usage = _UsageCounters()
+_unsupported_formats: set[tuple[str, str]] = set()
 
 
 def _is_v1_base_url(base_url: str) -> bool:
@@ -33,45 +92,173 @@ def _endpoint(base_url: str, path_under_v1: str) -> str:
 
 
 class OpenAICompatClient:
-    def __init__(self, base_url: str, api_key: str, timeout_s: int = 60) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        timeout_s: int = 60,
+        transport: Transport | None = None,
+        stream_usage: bool = False,
+        retry_policy: RetryPolicy | None = None,
+        on_retry: Callable[[RetryEvent], None] | None = None,
+        response_format: str = "",
+        provider: str = "",
+    ) -> None:
         self._base_url = base_url.rstrip("/") + "/"
         self._api_key = api_key.strip()
         self._timeout_s = timeout_s
+        self._transport = transport or get_transport()
+        self._stream_usage = stream_usage
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._on_retry = on_retry
+        self._response_format = response_format if response_format in RESPONSE_FORMATS else ""
+        self._provider = provider
+
+    def analyze_code(
+        self,
+        code: str,
+        language_hint: str,
+        model: str,
+        extra_requirements: str = "",
+        stream: bool = False,
+        on_delta: Callable[[str], None] | None = None,
+        cancel: CancelToken | None = None,
+    ) -> DeepSeekResponse:
+        started = time.perf_counter()
+        timings: dict[str, float] = {}
+        retries: list[RetryEvent] = []
+        status, error, result = "error", "", None
+        try:
+            result = self._analyze(
+                code, language_hint, model, extra_requirements, stream, on_delta, cancel, timings, retries, started
+            )
+            status = "ok"
+            return result
+        except Cancelled:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            usage = result.usage if result is not None else {}
+            phases = {k: v for k, v in timings.items() if k.endswith("_ms")}
+            phases["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            get_telemetry().record(
+                RequestRecord(
+                    provider=self._provider,
+                    model=model,
+                    host=self._base_url.rstrip("/"),
+                    stream=stream,
+                    status=status,
+                    http_status=int(timings.get("status", 0)),
+                    error=error,
+                    retries=len(retries),
+                    request_bytes=int(timings.get("request_bytes", 0)),
+                    response_bytes=int(timings.get("response_bytes", 0)),
+                    prompt_tokens=_int_usage(usage, "prompt_tokens"),
+                    cached_tokens=cached_prompt_tokens(usage),
+                    completion_tokens=_int_usage(usage, "completion_tokens"),
+                    phases=phases,
+                )
+            )
 
-    def analyze_code(self, code: str, language_hint: str, model: str, extra_requirements: str = "") -> DeepSeekResponse:
+    def _analyze(
+        self,
+        code: str,
+        language_hint: str,
+        model: str,
+        extra_requirements: str,
+        stream: bool,
+        on_delta: Callable[[str], None] | None,
+        cancel: CancelToken | None,
+        timings: dict[str, float],
+        retries: list[RetryEvent],
+        started: float,
+    ) -> DeepSeekResponse:
         url = _endpoint(self._base_url, "chat/completions")
-        headers = {"Authorization": f"Bearer {self._api_key}", "Content-Type": "application/json"}
+        headers = {"Authorization": f"Bearer {self._api_key}"}
         body = {
             "model": model,
             "temperature": 0.1,
             "messages": [
-                {
-                    "role": "system",
-                    "content": (
-                        "你是资深代码审查与代码质量分析助手。你只输出 JSON，不能输出任何解释性文字。"
-                        "输出必须可被 json.loads 直接解析。分数范围 0-100，越高越好。"
-                    ),
-                },
+                {"role": "system", "content": SYSTEM_MESSAGE},
                 {
                     "role": "user",
                     "content": _build_user_prompt(code=code, language_hint=language_hint, extra_requirements=extra_requirements),
                 },
             ],
         }
-        resp = requests.post(url, headers=headers, data=json.dumps(body), timeout=self._timeout_s)
+        fmt_key = (self._base_url, model)
+        if self._response_format and fmt_key not in _unsupported_formats:
+            body["response_format"] = _response_format_body(self._response_format)
+        if stream:
+            body["stream"] = True
+            if self._stream_usage:
+                body["stream_options"] = {"include_usage": True}
+        lazy = stream or cancel is not None
+
+        def send() -> Any:
+            return self._send(
+                url,
+                lambda: self._transport.post_json(
+                    url, body, headers=headers, timeout=self._timeout_s, stream=lazy, timings=timings, cancel=cancel
+                ),
+                retries,
+                cancel,
+            )
+
+        resp = send()
+        if "response_format" in body and resp.status_code == 400 and _rejects_response_format(resp):
+            resp.close()
+            with _usage_lock:
+                _unsupported_formats.add(fmt_key)
+            del body["response_format"]
+            resp = send()
+        if cancel is not None:
+            cancel.on_cancel(resp.close)
+        if stream:
+            try:
+                resp.raise_for_status()
+                result = replace(
+                    _read_event_stream(resp, on_delta, cancel, timings, started),
+                    retries=len(retries),
+                    elapsed_s=time.perf_counter() - timings.get("sent_at", started),
+                )
+            except Exception as e:
+                if cancel is not None and cancel.cancelled:
+                    raise Cancelled() from e
+                raise
+            finally:
+                resp.close()
+            record_usage(result.usage)
+            return result
         resp.raise_for_status()
-        raw = resp.json()
+        try:
+            raw = resp.json()
+            timings["response_bytes"] = len(resp.content)
+        except Exception as e:
+            if cancel is not None and cancel.cancelled:
+                raise Cancelled() from e
+            raise
         content_text = ""
         try:
             content_text = raw["choices"][0]["message"]["content"]
         except Exception:
             content_text = json.dumps(raw, ensure_ascii=False)
-        return DeepSeekResponse(content_text=content_text, raw=raw)
+        result = DeepSeekResponse(
+            content_text=content_text,
+            raw=raw,
+            retries=len(retries),
+            elapsed_s=time.perf_counter() - timings.get("sent_at", started),
+        )
+        record_usage(result.usage)
+        return result
 
     def list_models(self) -> list[str]:
         url = _endpoint(self._base_url, "models")
         headers = {"Authorization": f"Bearer {self._api_key}"}
-        resp = requests.get(url, headers=headers, timeout=self._timeout_s)
+        resp = self._send(url, lambda: self._transport.get(url, headers=headers, timeout=self._timeout_s), [])
         resp.raise_for_status()
         raw = resp.json()
         items = raw.get("data", [])
@@ -87,36 +274,176 @@ class OpenAICompatClient:
         uniq = sorted(set(model_ids))
         return uniq
 
+    def _send(self, url: str, send: Callable[[], Any], retries: list[RetryEvent], cancel: CancelToken | None = None) -> Any:
+        def on_retry(event: RetryEvent) -> None:
+            retries.append(event)
+            self._transport.count_retry(url)
+            if self._on_retry is not None:
+                self._on_retry(event)
+
+        if cancel is None:
+            return call_with_retry(send, self._retry_policy, on_retry=on_retry)
+        cancel.raise_if_cancelled()
+        try:
+            resp = call_with_retry(send, self._retry_policy, on_retry=on_retry, sleep=cancel.sleep)
+        except Exception as e:
+            if cancel.cancelled and not isinstance(e, Cancelled):
+                raise Cancelled() from e
+            raise
+        if cancel.cancelled:
+            resp.close()
+            raise Cancelled()
+        return resp
+
 
 DeepSeekClient = OpenAICompatClient
 
-def _build_user_prompt(code: str, language_hint: str, extra_requirements: str) -> str:
-    schema = {
-        "overall_score": 0,
-        "overall_summary": "一句话总结优缺点",
-        "metrics": {"lines": 0, "functions": 0, "classes": 0, "complexity_hint": "低/中/高"},
-        "metrics": {"lines": 0, "functions": 0, "classes": 0, "complexity_hint": "低/中/高"},
-        "categories": [
-            {
-                "name": "简洁性",
-                "score": 0,
-                "summary": "简短说明",
-                "issues": ["问题1", "问题2"],
-                "suggestions": ["建议1", "建议2"],
-            }
-        ],
+
+def _rejects_response_format(resp: Any) -> bool:
+    try:
+        text = resp.text.lower()
+    except Exception:
+        return False
+    return any(word in text for word in ("response_format", "json_object", "json_schema"))
+
+
+def _response_format_body(kind: str) -> dict[str, Any]:
+    if kind == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": "code_review", "strict": True, "schema": REVIEW_SCHEMA}}
+    return {"type": "json_object"}
+
+
+def _read_event_stream(
+    resp: Any,
+    on_delta: Callable[[str], None] | None,
+    cancel: CancelToken | None = None,
+    timings: dict[str, float] | None = None,
+    started: float = 0.0,
+) -> DeepSeekResponse:
+    parts: list[str] = []
+    usage: dict[str, Any] = {}
+    last: dict[str, Any] = {}
+    received = 0
+    for line in resp.iter_lines(decode_unicode=False):
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        received += len(line) + 1
+        if timings is not None:
+            timings["response_bytes"] = received
+        if not line or not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            break
+        try:
+            event = json.loads(data.decode("utf-8"))
+        except Exception:
+            continue
+        if not isinstance(event, dict):
+            continue
+        last = event
+        if isinstance(event.get("usage"), dict):
+            usage = event["usage"]
+        choices = event.get("choices")
+        if not isinstance(choices, list) or not choices or not isinstance(choices[0], dict):
+            continue
+        if isinstance(choices[0].get("usage"), dict):
+            usage = choices[0]["usage"]
+        delta = choices[0].get("delta") or {}
+        piece = delta.get("content") if isinstance(delta, dict) else None
+        if isinstance(piece, str) and piece:
+            if not parts and timings is not None:
+                timings["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            parts.append(piece)
+            if on_delta is not None:
+                on_delta(piece)
+    content_text = "".join(parts)
+    raw: dict[str, Any] = {
+        "id": last.get("id"),
+        "model": last.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content_text}}],
+        "stream": True,
     }
-    extra = (extra_requirements or "").strip()
-    extra_block = f"\n额外要求：\n{extra}\n" if extra else ""
+    if usage:
+        raw["usage"] = usage
+    return DeepSeekResponse(content_text=content_text, raw=raw)
+
+
+def _int_usage(usage: dict[str, Any], name: str) -> int:
+    value = usage.get(name)
+    return int(value) if isinstance(value, (int, float)) else 0
+
+
+def cached_prompt_tokens(usage: dict[str, Any]) -> int:
+    details = usage.get("prompt_tokens_details")
+    candidates = [details.get("cached_tokens") if isinstance(details, dict) else None]
+    candidates += [usage.get("prompt_cache_hit_tokens"), usage.get("cached_tokens")]
+    for value in candidates:
+        if isinstance(value, (int, float)):
+            return int(value)
+    return 0
+
+
+def usage_metrics(usage: dict[str, Any]) -> dict[str, int]:
+    if not isinstance(usage.get("prompt_tokens"), (int, float)):
+        return {}
+    return {"prompt_tokens": int(usage["prompt_tokens"]), "cached_prompt_tokens": cached_prompt_tokens(usage)}
+
+
+def record_usage(usage: dict[str, Any]) -> None:
+    with _usage_lock:
+        _usage.requests += 1
+        if not isinstance(usage.get("prompt_tokens"), (int, float)):
+            return
+        _usage.reported += 1
+        _usage.prompt_tokens += int(usage["prompt_tokens"])
+        _usage.cached_tokens += cached_prompt_tokens(usage)
+        completion = usage.get("completion_tokens")
+        _usage.completion_tokens += int(completion) if isinstance(completion, (int, float)) else 0
+
+
+def usage_stats() -> dict[str, int]:
+    with _usage_lock:
+        return dict(vars(_usage))
+
+
+def format_usage_stats(stats: dict[str, int]) -> str:
+    if not stats["reported"]:
+        return ""
+    rate = 100 * stats["cached_tokens"] / max(1, stats["prompt_tokens"])
     return (
-        f"语言提示：{language_hint}\n"
-        "请按以下 JSON 结构输出结果（字段名保持一致，categories 至少 5 项），不要输出多余文本：\n"
-        f"{json.dumps(schema, ensure_ascii=False)}\n\n"
-        "检测维度建议包含：简洁性、可读性、复杂度、可维护性、风格一致性、潜在缺陷/边界情况、安全性。\n"
-        f"{extra_block}"
-        "issues/suggestions 尽量具体到代码片段或模式，但不要粘贴整段代码。\n\n"
-        "待检测代码如下：\n"
-        "```text\n"
-        f"{code}\n"
-        "```"
+        f"输入 token {stats['prompt_tokens']}  前缀缓存命中 {stats['cached_tokens']}（{rate:.0f}%）  "
+        f"输出 token {stats['completion_tokens']}  （{stats['reported']}/{stats['requests']} 次请求返回用量）"
     )
+
+
+def build_repair_requirements(problems: list[str], partial: bool, with_code: bool) -> str:
+    if not partial:
+        task = "下面是上一次审查的输出，但它不是合法 JSON。请把其中的审查内容整理为规定结构的 JSON 对象，不要增删结论。"
+    else:
+        task = (
+            "下面是上一次审查输出的 JSON，其中部分字段不符合要求。请只输出一个 JSON 对象，"
+            "仅包含需要修正或补充的顶层字段；categories 中只给出有问题或缺失的维度（以 name 对应），其余保持原样不要重复输出。"
+        )
+    if with_code:
+        task += "缺失维度请依据随后附上的原始代码补充。"
+    return task + "\n存在的问题：\n" + "\n".join(f"- {p}" for p in problems)
+
+
+def estimate_prompt_tokens(code: str, language_hint: str, extra_requirements: str = "") -> int:
+    user = _build_user_prompt(code=code, language_hint=language_hint, extra_requirements=extra_requirements)
+    return estimate_tokens(SYSTEM_MESSAGE) + estimate_tokens(user) + 8
+
+
+def response_tokens(resp: DeepSeekResponse, code: str, language_hint: str, extra_requirements: str = "") -> int:
+    usage = resp.usage
+    prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+    if isinstance(prompt, (int, float)) and isinstance(completion, (int, float)):
+        return int(prompt) + int(completion)
+    return estimate_prompt_tokens(code, language_hint, extra_requirements) + estimate_tokens(resp.content_text)
+
+
+def _build_user_prompt(code: str, language_hint: str, extra_requirements: str) -> str:
+    extra = (extra_requirements or "").strip()
+    extra_block = f"额外要求：\n{extra}\n\n" if extra else ""
+    return f"{extra_block}语言提示：{language_hint}\n待检测代码如下：\n```text\n{code}\n```"
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from app.tokens import estimate_tokens
+
+FILE_MARKER_RE = re.compile(r"^### \S")
+_HEADER_RE = re.compile(r"^### (.+?)(?:（续，第 (\d+) 行起）)?\s*$")
+_CONTINUATION_RE = re.compile(r"^\s*(?:[})\]]|else\b|elif\b|except\b|finally\b|catch\b|case\b|default\b|\.|&&|\|\||\+|-)")
+_ATTACH_RE = re.compile(r"^\s*(?:@|#(?!include)|//|/\*|\*|\"\"\"|'''|\[\w)")
+
+
+@dataclass(frozen=True)
+class Chunk:
+    start_line: int
+    end_line: int
+    text: str
+    path: str = ""
+    files: int = 1
+
+
+def chunk_code(code: str, budget_tokens: int, split_files: bool = False) -> list[Chunk]:
+    lines = code.splitlines()
+    if not lines:
+        return []
+    if estimate_tokens(code) <= budget_tokens:
+        return [Chunk(start_line=1, end_line=len(lines), text=code)]
+    depths = _line_depths(lines)
+    costs = [estimate_tokens(ln) + 1 for ln in lines]
+    segments: list[tuple[int, int]] = []
+    if split_files:
+        starts = [i for i, ln in enumerate(lines) if FILE_MARKER_RE.match(ln)]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        bounds = [*starts, len(lines)]
+        for a, b in zip(bounds, bounds[1:]):
+            segments.extend(_split_range(lines, depths, costs, a, b, budget_tokens))
+        owner: list[int] = []
+        for i, ln in enumerate(lines):
+            owner.append(i if FILE_MARKER_RE.match(ln) else (owner[-1] if owner else -1))
+        return [_in_file(c, lines, owner) for c in _pack(lines, costs, segments, budget_tokens)]
+    segments = _split_range(lines, depths, costs, 0, len(lines), budget_tokens)
+    return _pack(lines, costs, segments, budget_tokens)
+
+
+def _in_file(chunk: Chunk, lines: list[str], owner: list[int]) -> Chunk:
+    a, b = chunk.start_line - 1, chunk.end_line
+    header = owner[a]
+    if header < 0:
+        return chunk
+    m = _HEADER_RE.match(lines[header])
+    path, base = m.group(1), int(m.group(2) or 1) - 1
+    last = max(i for i in range(a, b) if owner[i] == header)
+    start, end = base + max(1, a - header), base + max(1, last - header)
+    text = chunk.text if header == a else f"### {path}（续，第 {start} 行起）\n{chunk.text}"
+    return Chunk(start_line=start, end_line=end, text=text, path=path, files=len(set(owner[a:b])))
+
+
+def _split_range(
+    lines: list[str], depths: list[int], costs: list[int], start: int, end: int, budget: int
+) -> list[tuple[int, int]]:
+    if sum(costs[start:end]) <= budget or end - start <= 1:
+        return [(start, end)]
+    body = [depths[i] for i in range(start + 1, end) if lines[i].strip()]
+    if not body:
+        return [(start, end)]
+    level = min(body)
+    if depths[start] <= level and lines[start].strip():
+        level = depths[start]
+    cuts = _boundaries(lines, depths, start, end, level)
+    if len(cuts) <= 1:
+        cuts = [start, *[i for i in range(start + 1, end) if not lines[i - 1].strip() and lines[i].strip()]]
+        if len(cuts) <= 1:
+            return [(i, i + 1) for i in range(start, end)]
+        return [seg for a, b in zip(cuts, [*cuts[1:], end]) for seg in _pack_lines(costs, a, b, budget)]
+    out: list[tuple[int, int]] = []
+    for a, b in zip(cuts, [*cuts[1:], end]):
+        if sum(costs[a:b]) <= budget:
+            out.append((a, b))
+        elif b - a > 1:
+            out.extend(_split_range(lines, depths, costs, a, b, budget))
+        else:
+            out.append((a, b))
+    return out
+
+
+def _boundaries(lines: list[str], depths: list[int], start: int, end: int, level: int) -> list[int]:
+    cuts = [start]
+    i = start + 1
+    while i < end:
+        ln = lines[i]
+        if ln.strip() and depths[i] == level and not _CONTINUATION_RE.match(ln) and not _ATTACH_RE.match(ln):
+            j = i
+            while j - 1 > cuts[-1] and lines[j - 1].strip() and depths[j - 1] == level and _ATTACH_RE.match(lines[j - 1]):
+                j -= 1
+            if j > cuts[-1]:
+                cuts.append(j)
+        i += 1
+    return cuts
+
+
+def _pack_lines(costs: list[int], start: int, end: int, budget: int) -> list[tuple[int, int]]:
+    out: list[tuple[int, int]] = []
+    a = start
+    total = 0
+    for i in range(start, end):
+        if total and total + costs[i] > budget:
+            out.append((a, i))
+            a, total = i, 0
+        total += costs[i]
+    out.append((a, end))
+    return out
+
+
+def _pack(lines: list[str], costs: list[int], segments: list[tuple[int, int]], budget: int) -> list[Chunk]:
+    chunks: list[Chunk] = []
+    cur_a, cur_b, cur_cost = -1, -1, 0
+    for a, b in segments:
+        cost = sum(costs[a:b])
+        if cur_a >= 0 and cur_cost + cost > budget:
+            chunks.append(_make_chunk(lines, cur_a, cur_b))
+            cur_a = -1
+        if cur_a < 0:
+            cur_a, cur_cost = a, 0
+        cur_b = b
+        cur_cost += cost
+    if cur_a >= 0:
+        chunks.append(_make_chunk(lines, cur_a, cur_b))
+    return [c for c in chunks if c.text.strip()]
+
+
+def _make_chunk(lines: list[str], a: int, b: int) -> Chunk:
+    return Chunk(start_line=a + 1, end_line=b, text="\n".join(lines[a:b]))
+
+
+def _line_depths(lines: list[str]) -> list[int]:
+    brace_lines = sum(1 for ln in lines if ln.rstrip().endswith(("{", "}")))
+    colon_lines = sum(1 for ln in lines if ln.rstrip().endswith(":"))
+    if brace_lines >= colon_lines:
+        return _brace_depths(lines)
+    return [_indent(ln) if ln.strip() else 0 for ln in lines]
+
+
+def _indent(line: str) -> int:
+    return len(line.expandtabs(4)) - len(line.expandtabs(4).lstrip())
+
+
+def _brace_depths(lines: list[str]) -> list[int]:
+    depths: list[int] = []
+    depth = 0
+    in_block = False
+    quote = ""
+    for ln in lines:
+        depths.append(depth)
+        i = 0
+        n = len(ln)
+        while i < n:
+            c = ln[i]
+            if in_block:
+                if c == "*" and i + 1 < n and ln[i + 1] == "/":
+                    in_block = False
+                    i += 1
+            elif quote:
+                if c == "\\":
+                    i += 1
+                elif c == quote:
+                    quote = ""
+            elif c == "/" and i + 1 < n and ln[i + 1] == "/":
+                break
+            elif c == "/" and i + 1 < n and ln[i + 1] == "*":
+                in_block = True
+                i += 1
+            elif c in "\"'`":
+                quote = c
+            elif c == "{":
+                depth += 1
+            elif c == "}":
+                depth = max(0, depth - 1)
+            i += 1
+        if quote != "`":
+            quote = ""
+    return depths
@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import argparse
+import configparser
+import glob
+import json
+import os
+import sys
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, TextIO
+
+from app.analysis import (
+    DIFF_LANGUAGE_HINT,
+    DIFF_REQUIREMENTS,
+    AnalysisState,
+    FileResult,
+    analyze_diff,
+    analyze_each,
+    coalescing_stats,
+    reduce_file_results,
+)
+from app.api_client import format_usage_stats, usage_stats
+from app.compaction import COMPACTION_MODES
+from app.concurrency import format_limits, get_controller
+from app.git_diff import GitDiffError, changed_hunks, format_hunks
+from app.hedging import format_hedge_stats, get_hedger
+from app.ingest import IngestOptions, IngestStats, iter_source_files, read_source
+from app.metrics import detect_language
+from app.models import ReviewResult
+from app.providers import PROVIDERS, get_provider
+from app.result_cache import ResultCache
+from app.routing import format_routes, get_router
+from app.scheduler import BATCH, format_scheduler_stats, get_scheduler, scheduling
+from app.settings import DEFAULT_PROVIDER, AppSettings, config_dir, resolve_routes
+from app.singleflight import format_flight_stats
+from app.spend import check_budget, estimate_spend, format_estimate, format_spend, get_ledger
+from app.telemetry import format_telemetry_by_model, get_telemetry
+from app.transport import TransportConfig, configure_transport
+
+EXIT_OK = 0
+EXIT_BELOW_THRESHOLD = 1
+EXIT_USAGE = 2
+EXIT_ANALYSIS_ERROR = 3
+
+def default_config_dir() -> Path:
+    env = os.environ.get("CODE_QUALITY_CONFIG_DIR", "").strip()
+    if env:
+        return Path(env)
+    return config_dir()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli",
+        description="无界面批量代码质量检测：分析文件、目录或通配符，输出 JSON/JSONL。",
+    )
+    parser.add_argument("paths", nargs="*", help="文件、目录或通配符（如 'src/**/*.py'）；--diff 模式下为限定范围的路径")
+    parser.add_argument("--provider", choices=[p.provider_id for p in PROVIDERS], help="API 厂商")
+    parser.add_argument("--model", help="模型名称")
+    parser.add_argument("--base-url", help="接口 Base URL")
+    parser.add_argument("--api-key", help="API Key（也可用环境变量 CODE_QUALITY_API_KEY）")
+    parser.add_argument("--config-dir", type=Path, default=None, help="配置目录（读取 settings.ini 与缓存；默认与图形界面相同，也可用环境变量 CODE_QUALITY_CONFIG_DIR）")
+    parser.add_argument("--max-kb", type=int, default=1024, help="目录扫描时跳过超过该大小的文件（默认 1024 KB）")
+    parser.add_argument("--no-gitignore", action="store_true", help="目录扫描时不遵循 .gitignore")
+    parser.add_argument("-j", "--workers", type=int, default=16, help="最大并发请求数（默认 16，实际并发按限流与延迟自适应调整）")
+    parser.add_argument("--project", action="store_true", help="额外输出项目级汇总结果")
+    parser.add_argument("--no-reduce", action="store_true", help="项目汇总只在本地聚合，不额外请求模型")
+    parser.add_argument("--format", choices=("jsonl", "json"), default="jsonl", help="输出格式（默认 jsonl）")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="输出文件（默认标准输出）")
+    parser.add_argument("--fail-under", type=int, default=None, help="任一结果分数低于该值时退出码为 1")
+    parser.add_argument("--no-cache", action="store_true", help="不读写结果缓存")
+    parser.add_argument("--force-refresh", action="store_true", help="忽略已有缓存重新分析")
+    parser.add_argument("--state", type=Path, default=None, help="增量状态文件：再次运行时只分析内容有变化的文件")
+    parser.add_argument(
+        "--compact", choices=COMPACTION_MODES, default=None, help="发送前的代码压缩：off/whitespace/aggressive（默认读取配置，否则 whitespace）"
+    )
+    parser.add_argument(
+        "--route",
+        action="append",
+        default=None,
+        metavar="PROVIDER:MODEL[*WEIGHT]",
+        help="按延迟与错误率在多个厂商/模型间路由并自动故障转移（可重复或逗号分隔；默认读取配置）",
+    )
+    parser.add_argument("--hedge", action="store_true", help="慢请求对冲：超过近期延迟分位数仍无响应时再发一个相同请求，先返回者胜出")
+    parser.add_argument("--hedge-percentile", type=int, default=None, help="触发对冲的延迟分位数（默认 90）")
+    parser.add_argument("--hedge-budget", type=int, default=None, help="对冲请求最多占普通请求的百分比（默认 10）")
+    parser.add_argument("--hedge-backup", metavar="PROVIDER:MODEL", default=None, help="对冲请求发往的备份厂商/模型（默认同一端点）")
+    parser.add_argument("--diff", metavar="BASE", default=None, help="只审查当前分支相对 BASE 的改动（git diff BASE...HEAD）")
+    parser.add_argument("--context", type=int, default=10, help="--diff 模式下改动片段前后保留的上下文行数（默认 10）")
+    parser.add_argument(
+        "--deadline", type=float, default=None, metavar="SECONDS", help="请求排队超过该时长仍未发出则放弃（计为该文件失败）"
+    )
+    parser.add_argument("--budget-tokens", type=int, default=None, help="本次预计输入 token 超过该值则不发送（默认读取配置）")
+    parser.add_argument("--budget-usd", type=float, default=None, help="当日累计花费（美元）上限，超过则不再发送（默认读取配置）")
+    parser.add_argument("-y", "--yes", action="store_true", help="超过提醒预算时不再询问，直接继续")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不在标准错误输出进度")
+    return parser
+
+
+def collect_files(patterns: list[str], options: IngestOptions | None = None, stats: IngestStats | None = None) -> list[Path]:
+    options = options or IngestOptions()
+    seen: set[Path] = set()
+    out: list[Path] = []
+
+    def add(p: Path) -> None:
+        rp = p.resolve()
+        if rp not in seen and rp.is_file():
+            seen.add(rp)
+            out.append(rp)
+
+    for pattern in patterns:
+        path = Path(pattern)
+        if any(ch in pattern for ch in "*?["):
+            for match in sorted(glob.glob(pattern, recursive=True)):
+                add(Path(match))
+        elif path.is_dir():
+            for child in iter_source_files(path, options, stats):
+                add(child)
+        elif path.is_file():
+            add(path)
+    return out
+
+
+def load_cli_settings(args: argparse.Namespace, config_dir: Path) -> AppSettings:
+    ini = configparser.RawConfigParser()
+    ini_path = config_dir / "settings.ini"
+    if ini_path.is_file():
+        try:
+            ini.read(ini_path, encoding="utf-8")
+        except configparser.Error:
+            ini = configparser.RawConfigParser()
+
+    def stored(section: str, key: str, default: str = "") -> str:
+        value = ini.get(section, key, fallback=default).strip()
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        return value or default
+
+    provider = args.provider or os.environ.get("CODE_QUALITY_PROVIDER") or stored("provider", "current", DEFAULT_PROVIDER)
+    spec = get_provider(provider)
+    pid = spec.provider_id
+    api_key = (
+        args.api_key
+        or os.environ.get("CODE_QUALITY_API_KEY")
+        or os.environ.get(f"{pid.upper()}_API_KEY")
+        or stored(pid, "api_key")
+    )
+    model_default = spec.default_models[0] if spec.default_models else ""
+    compaction = args.compact or stored("analysis", "compaction", "whitespace")
+    if compaction not in COMPACTION_MODES:
+        compaction = "whitespace"
+    route_spec = ",".join(args.route) if args.route else stored("analysis", "routes")
+
+    def route_value(key: str, default: str = "") -> str:
+        section, _, name = key.partition("/")
+        if name == "api_key":
+            return os.environ.get(f"{section.upper()}_API_KEY") or stored(section, name, default)
+        return stored(section, name, default)
+
+    hedge_spec = args.hedge_backup if args.hedge_backup is not None else stored("hedging", "backup")
+    hedge_percentile = args.hedge_percentile or int(stored("hedging", "percentile", "90") or 90)
+    hedge_budget = args.hedge_budget if args.hedge_budget is not None else int(stored("hedging", "budget_pct", "10") or 10)
+    budget_tokens = args.budget_tokens if args.budget_tokens is not None else int(stored("budget", "job_hard_tokens", "0") or 0)
+    budget_usd = args.budget_usd if args.budget_usd is not None else float(stored("budget", "daily_hard_usd", "0") or 0)
+    return AppSettings(
+        provider=pid,
+        api_key=(api_key or "").strip(),
+        base_url=(args.base_url or stored(pid, "base_url", spec.default_base_url)).strip(),
+        model=(args.model or stored(pid, "model", model_default)).strip(),
+        stream=False,
+        cache_enabled=not args.no_cache,
+        max_workers=max(1, args.workers),
+        reduce_with_model=not args.no_reduce,
+        compaction=compaction,
+        route_spec=route_spec,
+        routes=resolve_routes(route_spec, route_value),
+        hedging=args.hedge or stored("hedging", "enabled", "false").lower() == "true",
+        hedge_percentile=min(99, max(50, hedge_percentile)),
+        hedge_budget_pct=min(100, max(0, hedge_budget)),
+        hedge_spec=hedge_spec,
+        hedge_backup=resolve_routes(hedge_spec, route_value),
+        budget_job_soft_tokens=int(stored("budget", "job_soft_tokens", "200000") or 0),
+        budget_job_hard_tokens=max(0, budget_tokens),
+        budget_daily_soft_usd=float(stored("budget", "daily_soft_usd", "0") or 0),
+        budget_daily_hard_usd=max(0.0, budget_usd),
+    )
+
+
+def result_record(kind: str, name: str, result: ReviewResult, from_cache: bool = False, error: str = "") -> dict:
+    data = asdict(result)
+    data.pop("raw_json", None)
+    record: dict[str, Any] = {"type": kind, "file": name, **data, "from_cache": from_cache}
+    if error:
+        record["error"] = error
+    return record
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.paths and not args.diff:
+        parser.error("需要至少一个路径，或使用 --diff BASE")
+    config_dir = args.config_dir or default_config_dir()
+    settings = load_cli_settings(args, config_dir)
+    if args.route and not settings.routes:
+        print("错误：--route 中没有可用端点（需为每个厂商配置 API Key，或设置环境变量 <厂商>_API_KEY）。", file=sys.stderr)
+        return EXIT_USAGE
+    if not settings.api_key and not settings.routes:
+        print(f"错误：缺少 {get_provider(settings.provider).display_name} API Key（--api-key 或 CODE_QUALITY_API_KEY）。", file=sys.stderr)
+        return EXIT_USAGE
+    if (not settings.base_url or not settings.model) and not settings.routes:
+        print("错误：缺少 Base URL 或模型名称。", file=sys.stderr)
+        return EXIT_USAGE
+
+    controller = get_controller()
+    controller.load(config_dir / "concurrency.json")
+    get_telemetry().configure(config_dir / "telemetry.jsonl")
+    ledger = get_ledger()
+    ledger.load(config_dir / "spend.json")
+    get_scheduler().configure(provider_cap=settings.max_workers)
+    try:
+        with scheduling(BATCH, args.deadline):
+            if args.diff:
+                return run_diff_review(args, settings, config_dir)
+            return run_review(args, settings, config_dir)
+    finally:
+        controller.save(config_dir / "concurrency.json")
+        ledger.save(config_dir / "spend.json")
+
+
+def run_review(args: argparse.Namespace, settings: AppSettings, config_dir: Path) -> int:
+    options = IngestOptions(max_bytes=max(0, args.max_kb) * 1024, use_gitignore=not args.no_gitignore)
+    stats = IngestStats()
+    files: list[tuple[str, str]] = []
+    for p in collect_files(args.paths, options, stats):
+        text = read_source(p, 0, stats)
+        if text is not None:
+            files.append((_display_name(p), text))
+    if not files:
+        print("错误：没有找到可检测的文件。", file=sys.stderr)
+        return EXIT_USAGE
+    prompts = [(text, detect_language(text, name), "") for name, text in files]
+    if not _preflight(args, settings, prompts, 1 if args.project and settings.reduce_with_model else 0):
+        return EXIT_USAGE
+
+    configure_transport(TransportConfig(pool_size=max(args.workers, 4)))
+    cache = None
+    if settings.cache_enabled:
+        try:
+            cache = ResultCache(config_dir / "result_cache.sqlite3")
+        except Exception as e:
+            _log(args, f"结果缓存不可用：{e}")
+
+    state = load_state(args.state) if args.state else None
+    out: TextIO = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    records: list[dict] = []
+
+    def emit(record: dict) -> None:
+        if args.format == "jsonl":
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+        else:
+            records.append(record)
+
+    def on_file_done(fr: FileResult, done: int, total: int) -> None:
+        source = "（未变更）" if fr.unchanged else "（缓存）" if fr.from_cache else ""
+        status = f"失败：{fr.error}" if fr.error else f"{fr.result.overall_score}/100{source}"
+        _log(args, f"[{done}/{total}] {fr.name} {status}")
+        emit(result_record("file", fr.name, fr.result, fr.from_cache, fr.error))
+
+    try:
+        file_results = analyze_each(
+            settings,
+            files,
+            max_workers=settings.max_workers,
+            cache=cache,
+            force_refresh=args.force_refresh,
+            on_file_done=on_file_done,
+            state=state,
+        )
+        scores = [fr.result.overall_score for fr in file_results if not fr.error]
+        if args.project and scores:
+            project = reduce_file_results(
+                settings,
+                file_results,
+                files,
+                use_model=settings.reduce_with_model,
+                cache=cache,
+                force_refresh=args.force_refresh,
+                state=state,
+            )
+            scores.append(project.overall_score)
+            emit(result_record("project", "", project))
+        if args.format == "json":
+            json.dump(records, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+        if state is not None:
+            save_state(args.state, state)
+        _log_usage(args, settings)
+
+    if any(fr.error for fr in file_results):
+        return EXIT_ANALYSIS_ERROR
+    if args.fail_under is not None and any(s < args.fail_under for s in scores):
+        return EXIT_BELOW_THRESHOLD
+    return EXIT_OK
+
+
+def run_diff_review(args: argparse.Namespace, settings: AppSettings, config_dir: Path) -> int:
+    try:
+        hunks = changed_hunks(Path.cwd(), args.diff, args.context, tuple(args.paths))
+    except GitDiffError as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not hunks:
+        _log(args, f"与 {args.diff} 相比没有代码改动。")
+        return EXIT_OK
+    _log(args, f"共 {len({h.path for h in hunks})} 个文件、{len(hunks)} 处改动，正在分析…")
+    if not _preflight(args, settings, [(format_hunks(hunks), DIFF_LANGUAGE_HINT, DIFF_REQUIREMENTS)]):
+        return EXIT_USAGE
+    configure_transport(TransportConfig(pool_size=max(args.workers, 4)))
+    cache = None
+    if settings.cache_enabled:
+        try:
+            cache = ResultCache(config_dir / "result_cache.sqlite3")
+        except Exception as e:
+            _log(args, f"结果缓存不可用：{e}")
+    try:
+        outcome = analyze_diff(settings, hunks, cache=cache, force_refresh=args.force_refresh)
+    except Exception as e:
+        print(f"错误：分析失败：{type(e).__name__}: {e}", file=sys.stderr)
+        return EXIT_ANALYSIS_ERROR
+    finally:
+        if cache is not None:
+            cache.close()
+        _log_usage(args, settings)
+    record = result_record("diff", args.diff, outcome.result, outcome.from_cache)
+    out: TextIO = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.format == "jsonl":
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            json.dump([record], out, ensure_ascii=False, indent=2)
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.fail_under is not None and outcome.result.overall_score < args.fail_under:
+        return EXIT_BELOW_THRESHOLD
+    return EXIT_OK
+
+
+def load_state(path: Path) -> AnalysisState:
+    try:
+        return AnalysisState.from_json(json.loads(path.read_text(encoding="utf-8")))
+    except (OSError, ValueError):
+        return AnalysisState()
+
+
+def save_state(path: Path, state: AnalysisState) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(state.to_json(), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"警告：无法写入增量状态文件 {path}：{e}", file=sys.stderr)
+
+
+def _display_name(path: Path) -> str:
+    try:
+        return str(path.relative_to(Path.cwd()))
+    except ValueError:
+        return str(path)
+
+
+def _preflight(
+    args: argparse.Namespace, settings: AppSettings, prompts: list[tuple[str, str, str]], extra_requests: int = 0
+) -> bool:
+    estimate = estimate_spend(settings, prompts, extra_requests)
+    _log(args, format_estimate(estimate))
+    check = check_budget(settings, estimate, get_ledger())
+    if check.level == "ok":
+        return True
+    for reason in check.reasons:
+        print(f"预算：{reason}", file=sys.stderr)
+    if check.level == "hard":
+        print("错误：超出预算上限，未发送任何请求。", file=sys.stderr)
+        return False
+    if args.yes:
+        return True
+    if not sys.stdin.isatty():
+        print("错误：超出提醒预算；确认后请加 --yes 重新运行。", file=sys.stderr)
+        return False
+    try:
+        answer = input("仍要继续吗？[y/N] ")
+    except EOFError:
+        return False
+    return answer.strip().lower() in ("y", "yes")
+
+
+def _log_usage(args: argparse.Namespace, settings: AppSettings) -> None:
+    for line in (
+        format_usage_stats(usage_stats()),
+        format_limits(get_controller().snapshot()),
+        format_routes(get_router().snapshot(settings.routes)),
+        format_hedge_stats(get_hedger().stats()),
+        format_flight_stats(coalescing_stats()),
+        format_scheduler_stats(get_scheduler().stats()),
+        format_telemetry_by_model(get_telemetry().recent()),
+        format_spend(get_ledger()),
+    ):
+        if line:
+            _log(args, line)
+
+
+def _log(args: argparse.Namespace, message: str) -> None:
+    if not args.quiet:
+        print(message, file=sys.stderr, flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from app.chunking import FILE_MARKER_RE
+from app.tokens import estimate_tokens
+
+COMPACTION_MODES = ("off", "whitespace", "aggressive")
+
+LONG_COMMENT_LINES = 8
+KEPT_COMMENT_LINES = 2
+TABLE_MIN_LINES = 30
+KEPT_TABLE_HEAD = 3
+KEPT_TABLE_TAIL = 1
+LONG_LITERAL_CHARS = 200
+KEPT_LITERAL_CHARS = 60
+LONG_LINE_CHARS = 1000
+KEPT_LINE_CHARS = 300
+
+_COMMENT_RE = re.compile(
+    r"^\s*(?://|/\*|\*/|\*(?=\s|$)|#(?![!\[]|include|define|undef|if|else|elif|endif|pragma|import|error|region|endregion))"
+)
+_LICENSE_RE = re.compile(r"copyright|licen[cs]e|spdx-license|all rights reserved|版权|许可", re.I)
+_PREAMBLE_RE = re.compile(r"^(?:#!|#.*coding[:=])")
+_GENERATED_RE = re.compile(r"@generated|do not edit|code generated|auto-?generated|自动生成", re.I)
+_VENDORED_PATH_RE = re.compile(
+    r"(?:^|/)(?:vendor|vendors|third_party|thirdparty|node_modules|dist|generated|__generated__)/"
+    r"|\.min\.(?:js|css)$|_pb2(?:_grpc)?\.py$|\.pb\.go$|\.g\.dart$|\.designer\.cs$",
+    re.I,
+)
+_STRING_RE = re.compile(r""""(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*'""")
+_DATA_LINE_RE = re.compile(r"^[\sS\d.,:;+\-_xXa-fA-F\[\](){}]*$")
+_LONG_LITERAL_RE = re.compile(r""""((?:[^"\\\n]|\\.){%d,})"|'((?:[^'\\\n]|\\.){%d,})'""" % (LONG_LITERAL_CHARS, LONG_LITERAL_CHARS))
+
+
+@dataclass(frozen=True)
+class CompactionResult:
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+    elided: tuple[str, ...] = ()
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.original_tokens - self.compacted_tokens)
+
+    def to_metrics(self) -> dict:
+        if not self.original_tokens:
+            return {}
+        metrics: dict = {
+            "input_tokens": self.compacted_tokens,
+            "input_tokens_saved": self.saved_tokens,
+            "input_tokens_saved_pct": int(round(100 * self.saved_tokens / self.original_tokens)),
+        }
+        if self.elided:
+            metrics["elided"] = list(self.elided[:20])
+        return metrics
+
+
+def compact_code(code: str, mode: str = "whitespace", path: str = "") -> CompactionResult:
+    original = estimate_tokens(code)
+    if mode not in COMPACTION_MODES or mode == "off":
+        return CompactionResult(code, original, original)
+    elided: list[str] = []
+    lines = code.splitlines()
+    if any(FILE_MARKER_RE.match(ln) for ln in lines):
+        out: list[str] = []
+        name, body = "", []
+        for ln in lines:
+            if FILE_MARKER_RE.match(ln):
+                out.extend(_compact_section(body, mode, name, True, elided))
+                out.append(ln)
+                name, body = ln[4:].strip(), []
+            else:
+                body.append(ln)
+        out.extend(_compact_section(body, mode, name, True, elided))
+    else:
+        out = _compact_section(lines, mode, path, False, elided)
+    text = "\n".join(out).strip("\n")
+    return CompactionResult(text, original, estimate_tokens(text), tuple(elided))
+
+
+def _compact_section(lines: list[str], mode: str, path: str, in_project: bool, elided: list[str]) -> list[str]:
+    lines = [ln.rstrip() for ln in lines]
+    if mode == "aggressive":
+        if in_project and _is_generated(lines, path):
+            code_lines = sum(1 for ln in lines if ln)
+            if code_lines:
+                elided.append(f"{path}: 生成/第三方代码 {code_lines} 行")
+                return [f"…（已省略生成/第三方代码 {code_lines} 行）"]
+        lines = _elide_license(lines, path, elided)
+        lines = _elide_comment_runs(lines, path, elided)
+        lines = _elide_tables(lines, path, elided)
+        lines = [_shorten_line(ln) for ln in lines]
+    return _collapse_blank_runs(lines)
+
+
+def _collapse_blank_runs(lines: list[str]) -> list[str]:
+    out: list[str] = []
+    for ln in lines:
+        if not ln and (not out or not out[-1]):
+            continue
+        out.append(ln)
+    while out and not out[-1]:
+        out.pop()
+    return out
+
+
+def _is_generated(lines: list[str], path: str) -> bool:
+    if _VENDORED_PATH_RE.search(path.replace("\\", "/")):
+        return True
+    head = [ln for ln in lines[:8] if ln]
+    return any(_COMMENT_RE.match(ln) and _GENERATED_RE.search(ln) for ln in head)
+
+
+def _elide_license(lines: list[str], path: str, elided: list[str]) -> list[str]:
+    start = 0
+    while start < len(lines) and (not lines[start] or _PREAMBLE_RE.match(lines[start])):
+        start += 1
+    end = start
+    while end < len(lines) and (not lines[end] or _COMMENT_RE.match(lines[end])):
+        end += 1
+    block = lines[start:end]
+    count = sum(1 for ln in block if ln)
+    if count < 3 or not any(_LICENSE_RE.search(ln) for ln in block):
+        return lines
+    elided.append(f"{path or '代码'}: 许可证头 {count} 行")
+    return [*lines[:start], f"…（已省略许可证头 {count} 行）", *lines[end:]]
+
+
+def _elide_comment_runs(lines: list[str], path: str, elided: list[str]) -> list[str]:
+    out: list[str] = []
+    i = 0
+    while i < len(lines):
+        j = i
+        while j < len(lines) and lines[j] and _COMMENT_RE.match(lines[j]):
+            j += 1
+        if j - i > LONG_COMMENT_LINES:
+            dropped = j - i - KEPT_COMMENT_LINES
+            indent = lines[i][: len(lines[i]) - len(lines[i].lstrip())]
+            out.extend(lines[i : i + KEPT_COMMENT_LINES])
+            out.append(f"{indent}…（已省略 {dropped} 行注释）")
+            elided.append(f"{path or '代码'}: 注释 {dropped} 行")
+            i = j
+        elif j > i:
+            out.extend(lines[i:j])
+            i = j
+        else:
+            out.append(lines[i])
+            i += 1
+    return out
+
+
+def _is_data_line(line: str) -> bool:
+    stripped = _STRING_RE.sub("S", line.strip())
+    return bool(stripped) and "," in stripped and any(c.isdigit() or c == "S" for c in stripped) and bool(
+        _DATA_LINE_RE.match(stripped)
+    )
+
+
+def _elide_tables(lines: list[str], path: str, elided: list[str]) -> list[str]:
+    out: list[str] = []
+    i = 0
+    while i < len(lines):
+        j = i
+        while j < len(lines) and _is_data_line(lines[j]):
+            j += 1
+        if j - i >= TABLE_MIN_LINES:
+            dropped = j - i - KEPT_TABLE_HEAD - KEPT_TABLE_TAIL
+            indent = lines[i][: len(lines[i]) - len(lines[i].lstrip())]
+            out.extend(lines[i : i + KEPT_TABLE_HEAD])
+            out.append(f"{indent}…（已省略 {dropped} 行数据）")
+            out.extend(lines[j - KEPT_TABLE_TAIL : j])
+            elided.append(f"{path or '代码'}: 数据表 {dropped} 行")
+            i = j
+        else:
+            out.append(lines[i])
+            i += 1
+    return out
+
+
+def _shorten_line(line: str) -> str:
+    if len(line) <= LONG_LITERAL_CHARS:
+        return line
+    line = _LONG_LITERAL_RE.sub(_shorten_literal, line)
+    if len(line) > LONG_LINE_CHARS:
+        line = f"{line[:KEPT_LINE_CHARS]}…（已省略 {len(line) - KEPT_LINE_CHARS} 字符）"
+    return line
+
+
+def _shorten_literal(m: re.Match[str]) -> str:
+    quote = m.group(0)[0]
+    body = m.group(1) if m.group(1) is not None else m.group(2)
+    head = body[:KEPT_LITERAL_CHARS].rstrip("\\")
+    return f"{quote}{head}…（省略 {len(body) - KEPT_LITERAL_CHARS} 字符）{quote}"
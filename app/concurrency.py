@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from app.cancel import Cancelled, CancelToken
+from app.retry import RETRY_EXCEPTIONS, RetryEvent
+from app.scheduler import DeadlineExceeded
+
+MIN_LIMIT = 1.0
+MAX_LIMIT = 64.0
+LATENCY_ALPHA = 0.2
+BASELINE_ALPHA = 0.05
+DECREASE_COOLDOWN_S = 2.0
+LATENCY_SPIKE_RATIO = 3.0
+WAIT_POLL_S = 0.5
+
+
+@dataclass
+class LimiterStats:
+    limit: float
+    in_flight: int
+    completed: int
+    throttled: int
+    latency_per_ktok_s: float
+    baseline_per_ktok_s: float
+    spikes: int = 0
+
+
+class AdaptiveLimiter:
+    def __init__(self, limit: float = 4.0, baseline_per_ktok_s: float = 0.0) -> None:
+        self._cond = threading.Condition()
+        self._limit = min(MAX_LIMIT, max(MIN_LIMIT, float(limit)))
+        self._in_flight = 0
+        self._completed = 0
+        self._throttled = 0
+        self._spikes = 0
+        self._latency = baseline_per_ktok_s
+        self._baseline = baseline_per_ktok_s
+        self._last_decrease = 0.0
+        self._seq = itertools.count()
+        self._waiting: list[tuple[int, int]] = []
+
+    @property
+    def limit(self) -> float:
+        with self._cond:
+            return self._limit
+
+    @contextmanager
+    def slot(
+        self, priority: int = 0, cancel: CancelToken | None = None, deadline: float | None = None
+    ) -> Iterator[LimiterSlot]:
+        if cancel is not None:
+            cancel.on_cancel(self._wake)
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            bisect.insort(self._waiting, ticket)
+            try:
+                while self._in_flight >= int(self._limit) or self._waiting[0] != ticket:
+                    if cancel is not None and cancel.cancelled:
+                        raise Cancelled()
+                    remaining = WAIT_POLL_S if deadline is None else min(WAIT_POLL_S, deadline - time.monotonic())
+                    if remaining <= 0:
+                        raise DeadlineExceeded("等待并发槽位超过截止时间，请求未发出")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+            self._in_flight += 1
+        slot = LimiterSlot(self)
+        ok = False
+        try:
+            yield slot
+            ok = True
+        except Exception as e:
+            slot.on_error(e)
+            raise
+        finally:
+            healthy = ok and not slot.throttled and not slot.overloaded
+            self._release(time.monotonic() - slot.started, slot.tokens, healthy, slot.overloaded)
+
+    def on_throttled(self) -> None:
+        with self._cond:
+            self._throttled += 1
+            self._decrease()
+
+    def stats(self) -> LimiterStats:
+        with self._cond:
+            return LimiterStats(
+                limit=self._limit,
+                in_flight=self._in_flight,
+                completed=self._completed,
+                throttled=self._throttled,
+                latency_per_ktok_s=self._latency,
+                baseline_per_ktok_s=self._baseline,
+                spikes=self._spikes,
+            )
+
+    def _release(self, latency_s: float, tokens: int, ok: bool, overloaded: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._completed += 1
+            if ok:
+                spike = False
+                if tokens > 0:
+                    per_ktok = latency_s * 1000 / tokens
+                    spike = self._baseline > 0 and per_ktok > self._baseline * LATENCY_SPIKE_RATIO
+                    self._latency = per_ktok if not self._latency else self._latency + LATENCY_ALPHA * (per_ktok - self._latency)
+                    self._baseline = per_ktok if not self._baseline else self._baseline + BASELINE_ALPHA * (per_ktok - self._baseline)
+                if spike:
+                    self._spikes += 1
+                    self._decrease()
+                elif self._in_flight + 1 >= int(self._limit):
+                    self._limit = min(MAX_LIMIT, self._limit + 1.0 / self._limit)
+            elif overloaded:
+                self._decrease()
+            self._cond.notify_all()
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN_S:
+            return
+        self._last_decrease = now
+        self._limit = max(MIN_LIMIT, self._limit / 2)
+
+
+class LimiterSlot:
+    def __init__(self, limiter: AdaptiveLimiter) -> None:
+        self._limiter = limiter
+        self.throttled = False
+        self.overloaded = False
+        self.tokens = 0
+        self.started = time.monotonic()
+
+    def on_retry(self, event: RetryEvent) -> None:
+        if event.reason == "HTTP 429":
+            self.throttled = True
+            self._limiter.on_throttled()
+        else:
+            self.overloaded = True
+
+    def on_error(self, error: Exception) -> None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        if status == 429 and not self.throttled:
+            self.throttled = True
+            self._limiter.on_throttled()
+        elif isinstance(error, RETRY_EXCEPTIONS) or (isinstance(status, int) and status >= 500):
+            self.overloaded = True
+
+
+class ConcurrencyController:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._limiters: dict[str, AdaptiveLimiter] = {}
+        self._learned: dict[str, dict[str, float]] = {}
+
+    def limiter(self, provider_id: str, base_url: str, model: str, initial: float = 4.0) -> AdaptiveLimiter:
+        key = limiter_key(provider_id, base_url, model)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                learned = self._learned.get(key, {})
+                limiter = AdaptiveLimiter(learned.get("limit", initial), learned.get("baseline_per_ktok_s", 0.0))
+                self._limiters[key] = limiter
+            return limiter
+
+    def snapshot(self) -> dict[str, LimiterStats]:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {key: limiter.stats() for key, limiter in limiters.items()}
+
+    def load(self, path: Path) -> None:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        learned: dict[str, dict[str, float]] = {}
+        for key, row in data.items():
+            if isinstance(row, dict) and isinstance(row.get("limit"), (int, float)):
+                learned[str(key)] = {
+                    "limit": float(row["limit"]),
+                    "baseline_per_ktok_s": float(row.get("baseline_per_ktok_s") or 0.0),
+                }
+        with self._lock:
+            self._learned.update(learned)
+
+    def save(self, path: Path) -> None:
+        with self._lock:
+            data = {key: dict(row) for key, row in self._learned.items()}
+            limiters = dict(self._limiters)
+        for key, limiter in limiters.items():
+            st = limiter.stats()
+            if st.completed:
+                data[key] = {"limit": round(st.limit, 2), "baseline_per_ktok_s": round(st.baseline_per_ktok_s, 4)}
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+
+def limiter_key(provider_id: str, base_url: str, model: str) -> str:
+    return f"{provider_id}|{base_url.strip().rstrip('/')}|{model.strip()}"
+
+
+_CONTROLLER = ConcurrencyController()
+
+
+def get_controller() -> ConcurrencyController:
+    return _CONTROLLER
+
+
+def format_limits(snapshot: dict[str, LimiterStats]) -> str:
+    lines = []
+    for key, st in sorted(snapshot.items()):
+        provider, _, rest = key.partition("|")
+        model = rest.rpartition("|")[2]
+        lines.append(
+            f"{provider}·{model}  并发上限 {st.limit:.1f}  进行中 {st.in_flight}  完成 {st.completed}  "
+            f"限流 {st.throttled}  延迟突增 {st.spikes}  每千 token 耗时 {st.latency_per_ktok_s:.2f}s（基线 {st.baseline_per_ktok_s:.2f}s）"
+        )
+    return "\n".join(lines)
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import sys
+from functools import lru_cache
 from pathlib import Path
 
-from PyQt6.QtGui import QIcon
+from PyQt6.QtGui import QIcon, QPixmap
 
 
 def _get_assets_dir() -> Path:
@@ -17,14 +18,26 @@ def _get_assets_dir() -> Path:
 
 
 def icon_for_file(path: Path) -> QIcon:
-    ext = path.suffix.lower().lstrip(".")
-    name = _map_ext_to_icon_name(ext)
+    return _icon_by_name(_map_ext_to_icon_name(path.suffix.lower().lstrip(".")))
+
+
+def pixmap_for_file(path: Path, size: int = 18) -> QPixmap:
+    return _pixmap_by_name(_map_ext_to_icon_name(path.suffix.lower().lstrip(".")), size)
+
+
+@lru_cache(maxsize=None)
+def _icon_by_name(name: str) -> QIcon:
     icon_path = _get_assets_dir() / "icons" / f"{name}.svg"
     if icon_path.exists():
         return QIcon(str(icon_path))
     return QIcon()
 
 
+@lru_cache(maxsize=None)
+def _pixmap_by_name(name: str, size: int) -> QPixmap:
+    return _icon_by_name(name).pixmap(size, size)
+
+
 def _map_ext_to_icon_name(ext: str) -> str:
     if ext in {"py", "pyw"}:
         return "python"
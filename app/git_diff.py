@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import re
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.ingest import CODE_EXTENSIONS
+
+GIT_TIMEOUT = 60
+
+_HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+_LOCATION_RE = re.compile(r"([\w./\\-]+\.\w+)\s*[:：]\s*(?:L|第\s*)?(\d+)(?:\s*[-~–]\s*(?:L)?(\d+))?")
+
+
+class GitDiffError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class DiffHunk:
+    path: str
+    start_line: int
+    end_line: int
+    added: int
+    removed: int
+    text: str
+
+    @property
+    def location(self) -> str:
+        return f"{self.path}:{self.start_line}-{self.end_line}"
+
+
+def run_git_diff(repo: Path, base: str, context: int = 10, paths: tuple[str, ...] = ()) -> str:
+    base = base.strip()
+    if not base or base.startswith("-"):
+        raise GitDiffError(f"无效的基线分支：{base!r}")
+    args = [
+        "git", "-C", str(repo), "-c", "core.quotepath=false", "diff", "--no-color", "--no-ext-diff",
+        "--no-prefix", f"--unified={max(0, int(context))}", f"{base}...HEAD", "--", *paths,
+    ]
+    try:
+        proc = subprocess.run(args, capture_output=True, timeout=GIT_TIMEOUT)
+    except FileNotFoundError as e:
+        raise GitDiffError("未找到 git 可执行文件，请确认已安装 Git 并加入 PATH。") from e
+    except subprocess.TimeoutExpired as e:
+        raise GitDiffError(f"git diff 超时（{GIT_TIMEOUT} 秒）。") from e
+    if proc.returncode != 0:
+        message = proc.stderr.decode("utf-8", errors="replace").strip()
+        raise GitDiffError(f"git diff 失败：{message or proc.returncode}")
+    return proc.stdout.decode("utf-8", errors="replace")
+
+
+def parse_diff(diff: str, extensions: frozenset[str] | None = CODE_EXTENSIONS) -> list[DiffHunk]:
+    hunks: list[DiffHunk] = []
+    path = ""
+    keep = in_hunk = False
+    lines: list[str] = []
+    start = line_no = added = removed = 0
+
+    def flush() -> None:
+        if keep and in_hunk and (added or removed):
+            end = max(start, line_no - 1)
+            hunks.append(DiffHunk(path, start, end, added, removed, "\n".join(lines)))
+
+    for raw in diff.splitlines():
+        if raw.startswith("diff --git "):
+            flush()
+            path, keep, in_hunk = "", False, False
+            continue
+        if not in_hunk and raw.startswith("+++ "):
+            path = raw[4:].strip().strip('"')
+            keep = path != "/dev/null" and (extensions is None or Path(path).suffix.lower() in extensions)
+            continue
+        m = _HUNK_RE.match(raw)
+        if m:
+            flush()
+            in_hunk = True
+            lines = []
+            start = line_no = int(m.group(1))
+            added = removed = 0
+            continue
+        if not keep or not in_hunk:
+            continue
+        mark, text = (raw[0], raw[1:]) if raw else (" ", "")
+        if mark == "-":
+            lines.append(f"{'':>5} -{text}")
+            removed += 1
+        elif mark in "+ ":
+            lines.append(f"{line_no:>5} {mark}{text}")
+            line_no += 1
+            added += mark == "+"
+    flush()
+    return hunks
+
+
+def changed_hunks(
+    repo: Path, base: str, context: int = 10, paths: tuple[str, ...] = (), extensions: frozenset[str] | None = CODE_EXTENSIONS
+) -> list[DiffHunk]:
+    return parse_diff(run_git_diff(repo, base, context, paths), extensions)
+
+
+def format_hunks(hunks: list[DiffHunk]) -> str:
+    parts: list[str] = []
+    current = ""
+    for h in hunks:
+        if h.path != current:
+            current = h.path
+            parts.append(f"### {h.path}")
+        parts.append(f"@@ 第 {h.start_line}-{h.end_line} 行 @@\n{h.text}")
+    return "\n".join(parts)
+
+
+def locate_issue(issue: str, hunks: list[DiffHunk]) -> str:
+    for m in _LOCATION_RE.finditer(issue):
+        ref, first = m.group(1).replace("\\", "/"), int(m.group(2))
+        last = int(m.group(3) or first)
+        for h in hunks:
+            if _same_path(h.path, ref) and h.start_line <= last and first <= h.end_line:
+                return f"{h.path}:{first}" if first == last else f"{h.path}:{first}-{last}"
+    mentioned = {h.path for h in hunks if h.path in issue}
+    if len(mentioned) == 1:
+        path = mentioned.pop()
+        return ",".join(h.location for h in hunks if h.path == path)
+    return ""
+
+
+def _same_path(path: str, ref: str) -> bool:
+    return path == ref or path.endswith("/" + ref.lstrip("./"))
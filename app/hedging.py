@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+WINDOW = 100
+MIN_SAMPLES = 8
+MIN_DELAY_S = 1.0
+MAX_CREDIT = 5.0
+
+
+@dataclass(frozen=True)
+class HedgeStats:
+    requests: int
+    hedged: int
+    won: int
+    skipped: int
+    credit: float
+
+
+class Hedger:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latencies: dict[str, deque[float]] = {}
+        self._requests = 0
+        self._hedged = 0
+        self._won = 0
+        self._skipped = 0
+        self._credit = 0.0
+
+    def delay(self, key: str, percentile: int) -> float | None:
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        q = min(99, max(50, percentile)) / 100
+        return max(MIN_DELAY_S, samples[min(len(samples) - 1, int(q * len(samples)))])
+
+    def observe(self, key: str, latency_s: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=WINDOW)).append(latency_s)
+
+    def admit(self, budget_pct: int) -> None:
+        with self._lock:
+            self._requests += 1
+            self._credit = min(MAX_CREDIT, self._credit + max(0, budget_pct) / 100)
+
+    def try_hedge(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                self._skipped += 1
+                return False
+            self._credit -= 1.0
+            self._hedged += 1
+            return True
+
+    def record_win(self) -> None:
+        with self._lock:
+            self._won += 1
+
+    def stats(self) -> HedgeStats:
+        with self._lock:
+            return HedgeStats(self._requests, self._hedged, self._won, self._skipped, self._credit)
+
+
+def format_hedge_stats(stats: HedgeStats) -> str:
+    if not stats.hedged and not stats.skipped:
+        return ""
+    return (
+        f"对冲请求 {stats.hedged}/{stats.requests}（备份胜出 {stats.won}）  "
+        f"因预算跳过 {stats.skipped}"
+    )
+
+
+_HEDGER = Hedger()
+
+
+def get_hedger() -> Hedger:
+    return _HEDGER
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator
+
+CODE_EXTENSIONS = frozenset(
+    {
+        ".py", ".pyw", ".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs", ".java", ".go", ".rs",
+        ".c", ".h", ".cc", ".cpp", ".cxx", ".hpp", ".cs", ".kt", ".swift", ".rb", ".php", ".scala",
+    }
+)
+
+ALWAYS_SKIPPED_DIRS = frozenset({".git", ".hg", ".svn"})
+
+SNIFF_BYTES = 8192
+
+
+@dataclass(frozen=True)
+class IngestOptions:
+    max_bytes: int = 1024 * 1024
+    extensions: frozenset[str] | None = CODE_EXTENSIONS
+    use_gitignore: bool = True
+    include_hidden: bool = False
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    skipped_ignored: int = 0
+    skipped_size: int = 0
+    skipped_binary: int = 0
+    skipped_extension: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class _Rule:
+    regex: re.Pattern[str]
+    negate: bool
+    dir_only: bool
+
+
+class GitIgnore:
+    def __init__(self) -> None:
+        self._rules: list[tuple[str, _Rule]] = []
+
+    def load(self, directory: Path, rel_dir: str) -> None:
+        path = directory / ".gitignore"
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return
+        for line in text.splitlines():
+            rule = _compile_rule(line)
+            if rule is not None:
+                self._rules.append((rel_dir, rule))
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        result = False
+        for base, rule in self._rules:
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                sub = rel_path[len(base) + 1 :]
+            else:
+                sub = rel_path
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(sub):
+                result = not rule.negate
+        return result
+
+    def scoped(self) -> GitIgnore:
+        child = GitIgnore()
+        child._rules = list(self._rules)
+        return child
+
+
+def _compile_rule(line: str) -> _Rule | None:
+    raw = line.rstrip("\n")
+    if not raw.strip() or raw.startswith("#"):
+        return None
+    raw = raw.rstrip()
+    negate = raw.startswith("!")
+    if negate:
+        raw = raw[1:]
+    if raw.startswith("\\"):
+        raw = raw[1:]
+    dir_only = raw.endswith("/")
+    raw = raw.rstrip("/")
+    if not raw:
+        return None
+    anchored = "/" in raw
+    raw = raw.lstrip("/")
+    out = []
+    i = 0
+    while i < len(raw):
+        c = raw[i]
+        if c == "*":
+            if raw[i : i + 3] == "**/":
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if raw[i : i + 2] == "**":
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = raw.find("]", i + 1)
+            if j < 0:
+                out.append(re.escape(c))
+            else:
+                cls = raw[i + 1 : j].replace("\\", "\\\\")
+                if cls.startswith("!"):
+                    cls = "^" + cls[1:]
+                out.append(f"[{cls}]")
+                i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    body = "".join(out)
+    prefix = "" if anchored else "(?:.*/)?"
+    return _Rule(regex=re.compile(f"^{prefix}{body}(?:/.*)?$"), negate=negate, dir_only=dir_only)
+
+
+def is_binary(head: bytes) -> bool:
+    if not head:
+        return False
+    if b"\x00" in head:
+        return True
+    control = sum(1 for b in head if b < 32 and b not in (9, 10, 12, 13, 27))
+    return control / len(head) > 0.3
+
+
+def decode_source(data: bytes) -> str:
+    if data.startswith(b"\xef\xbb\xbf"):
+        data = data[3:]
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("utf-8", errors="replace")
+
+
+def read_source(path: Path, max_bytes: int = 0, stats: IngestStats | None = None) -> str | None:
+    try:
+        with open(path, "rb") as f:
+            data = f.read(max_bytes + 1) if max_bytes > 0 else f.read()
+    except OSError as e:
+        if stats is not None:
+            stats.errors.append(f"{path}: {e}")
+        return None
+    if max_bytes > 0 and len(data) > max_bytes:
+        if stats is not None:
+            stats.skipped_size += 1
+        return None
+    if is_binary(data[:SNIFF_BYTES]):
+        if stats is not None:
+            stats.skipped_binary += 1
+        return None
+    return decode_source(data)
+
+
+def iter_source_files(root: Path, options: IngestOptions, stats: IngestStats | None = None) -> Iterator[Path]:
+    root = root.resolve()
+    stats = stats if stats is not None else IngestStats()
+    base_rules = GitIgnore()
+    if options.use_gitignore:
+        base_rules.load(root, "")
+    stack: list[tuple[Path, str, GitIgnore]] = [(root, "", base_rules)]
+    while stack:
+        directory, rel_dir, rules = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError as e:
+            stats.errors.append(f"{directory}: {e}")
+            continue
+        subdirs: list[tuple[Path, str, GitIgnore]] = []
+        for entry in entries:
+            name = entry.name
+            rel = f"{rel_dir}/{name}" if rel_dir else name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                is_file = entry.is_file(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if name in ALWAYS_SKIPPED_DIRS or (not options.include_hidden and name.startswith(".")):
+                    continue
+                if rules.ignored(rel, True):
+                    stats.skipped_ignored += 1
+                    continue
+                child_rules = rules
+                if options.use_gitignore and os.path.exists(os.path.join(entry.path, ".gitignore")):
+                    child_rules = rules.scoped()
+                    child_rules.load(Path(entry.path), rel)
+                subdirs.append((Path(entry.path), rel, child_rules))
+            elif is_file:
+                if not options.include_hidden and name.startswith("."):
+                    continue
+                if options.extensions is not None and Path(name).suffix.lower() not in options.extensions:
+                    stats.skipped_extension += 1
+                    continue
+                if rules.ignored(rel, False):
+                    stats.skipped_ignored += 1
+                    continue
+                if options.max_bytes > 0:
+                    try:
+                        if entry.stat().st_size > options.max_bytes:
+                            stats.skipped_size += 1
+                            continue
+                    except OSError:
+                        continue
+                yield Path(entry.path)
+        stack.extend(reversed(subdirs))
+
+
+def ingest(
+    paths: list[Path],
+    options: IngestOptions,
+    batch_size: int = 64,
+    on_batch: Callable[[list[tuple[Path, str]]], None] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+) -> IngestStats:
+    stats = IngestStats()
+    batch: list[tuple[Path, str]] = []
+    for path in paths:
+        if should_stop is not None and should_stop():
+            break
+        candidates: Iterator[Path] = iter_source_files(path, options, stats) if path.is_dir() else iter([path])
+        for file_path in candidates:
+            if should_stop is not None and should_stop():
+                break
+            text = read_source(file_path, options.max_bytes if path.is_dir() else 0, stats)
+            if text is None:
+                continue
+            stats.files += 1
+            batch.append((file_path.resolve(), text))
+            if len(batch) >= batch_size:
+                if on_batch is not None:
+                    on_batch(batch)
+                batch = []
+    if batch and on_batch is not None:
+        on_batch(batch)
+    return stats
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import bisect
+import json
+import re
+from typing import Any
+
+_WS = " \t\r\n"
+
+_STRUCT_RE = re.compile(r'[{}\[\],:"]')
+_STRING_STOP_RE = re.compile(r'["\\]')
+_KEY_TAIL_RE = re.compile(r'"(?:[^"\\]|\\.)*"\s*$')
+_PARTIAL_ESCAPE_RE = re.compile(r"\\(?:u[0-9a-fA-F]{0,3})?$")
+
+
+class JsonExtractor:
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+        self._buf = ""
+        self._base = 0
+        self._pos = 0
+        self._start = -1
+        self._end = -1
+        self._stack: list[str] = []
+        self._opened: list[int] = []
+        self._expect: list[str] = []
+        self._in_str = False
+        self._str_start = -1
+        self._str_is_key = False
+        self._last_comma = -1
+        self._drop: list[int] = []
+
+    @property
+    def started(self) -> bool:
+        return self._start >= 0
+
+    @property
+    def complete(self) -> bool:
+        return self._end >= 0
+
+    def feed(self, chunk: str) -> None:
+        if self._end >= 0 or not chunk:
+            return
+        self._chunks.append(chunk)
+        buf = self._buf + chunk
+        base = self._base
+        i = self._pos - base
+        n = len(buf)
+        if self._start < 0:
+            i = buf.find("{", i)
+            if i < 0:
+                self._buf, self._base, self._pos = "", base + n, base + n
+                return
+            self._start = base + i
+            self._open("{", self._start)
+            i += 1
+        while i < n:
+            if self._in_str:
+                m = _STRING_STOP_RE.search(buf, i)
+                if m is None:
+                    i = n
+                    break
+                if m.group() == "\\":
+                    if m.end() >= n:
+                        i = m.start()
+                        break
+                    i = m.end() + 1
+                    continue
+                i = m.end()
+                self._in_str = False
+                if self._str_is_key:
+                    self._expect[-1] = "colon"
+                    self._key_read(self._str_start, base + i)
+                else:
+                    self._value_done()
+                    self._value_read(self._str_start, base + i)
+                continue
+            m = _STRUCT_RE.search(buf, i)
+            stop = m.start() if m else n
+            if stop > i and not buf[i:stop].isspace():
+                if m is None:
+                    break
+                self._value_done()
+                literal = buf[i:stop]
+                self._value_read(base + i + len(literal) - len(literal.lstrip()), base + i + len(literal.rstrip()))
+            if m is None:
+                i = n
+                break
+            c = m.group()
+            i = m.end()
+            if c == '"':
+                self._in_str = True
+                self._str_start = base + m.start()
+                self._str_is_key = self._stack[-1] == "{" and self._expect[-1] == "key"
+                self._last_comma = -1
+            elif c in "{[":
+                self._open(c, base + m.start())
+            elif c in "}]":
+                if self._last_comma >= 0:
+                    self._drop.append(self._last_comma)
+                self._stack.pop()
+                self._expect.pop()
+                opened = self._opened.pop()
+                if not self._stack:
+                    self._end = base + i
+                    break
+                self._value_done()
+                self._value_read(opened, base + i)
+            elif c == ",":
+                self._last_comma = base + m.start()
+                self._expect[-1] = "key" if self._stack[-1] == "{" else "value"
+            else:
+                self._expect[-1] = "value"
+        self._buf = buf[i:]
+        self._base = self._pos = base + i
+
+    def value(self) -> Any:
+        if self._start < 0:
+            return _MISSING
+        if self._end >= 0:
+            return _loads(self._body(self._end))
+        return _loads(self._repaired())
+
+    def _text(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def _open(self, c: str, at: int) -> None:
+        self._stack.append(c)
+        self._opened.append(at)
+        self._expect.append("key" if c == "{" else "value")
+        self._last_comma = -1
+
+    def _value_done(self) -> None:
+        self._expect[-1] = "comma"
+        self._last_comma = -1
+
+    def _key_read(self, start: int, end: int) -> None:
+        pass
+
+    def _value_read(self, start: int, end: int) -> None:
+        pass
+
+    def _body(self, end: int) -> str:
+        return self._span(self._start, end)
+
+    def _span(self, start: int, end: int) -> str:
+        text = self._text()
+        parts: list[str] = []
+        prev = start
+        for at in self._drop[bisect.bisect_left(self._drop, start) :]:
+            if at >= end:
+                break
+            parts.append(text[prev:at])
+            prev = at + 1
+        parts.append(text[prev:end])
+        return "".join(parts)
+
+    def _repaired(self) -> str:
+        expect = self._expect[-1]
+        tail = ""
+        if self._in_str:
+            if self._str_is_key:
+                body = self._body(self._str_start)
+                expect = "key"
+            else:
+                body = _PARTIAL_ESCAPE_RE.sub("", self._body(len(self._text())))
+                tail = '"'
+                expect = "comma"
+        else:
+            body = self._body(self._pos)
+            literal = self._text()[self._pos :].strip()
+            if literal and _loads(literal) is not _MISSING:
+                tail = literal
+                expect = "comma"
+        body = body.rstrip() + tail
+        if expect == "colon":
+            body = _KEY_TAIL_RE.sub("", body)
+        body = body.rstrip()
+        if body.endswith(":"):
+            body = _KEY_TAIL_RE.sub("", body[:-1]).rstrip()
+        if body.endswith(","):
+            body = body[:-1]
+        return body + "".join("}" if c == "{" else "]" for c in reversed(self._stack))
+
+
+class ReviewStreamParser(JsonExtractor):
+    def __init__(self, array_key: str = "categories") -> None:
+        super().__init__()
+        self._array_key = array_key
+        self._key: str | None = None
+        self._item_index = 0
+        self._events: list[tuple[str, Any, Any]] = []
+        self.fields: dict[str, Any] = {}
+
+    @property
+    def done(self) -> bool:
+        return self.complete
+
+    def feed(self, chunk: str) -> list[tuple[str, Any, Any]]:
+        super().feed(chunk)
+        events, self._events = self._events, []
+        return events
+
+    def _key_read(self, start: int, end: int) -> None:
+        if len(self._stack) == 1:
+            key = _loads(self._span(start, end))
+            self._key = key if isinstance(key, str) else None
+
+    def _value_read(self, start: int, end: int) -> None:
+        depth = len(self._stack)
+        if depth == 1 and self._key is not None:
+            value = _loads(self._span(start, end))
+            if value is not _MISSING:
+                self.fields[self._key] = value
+                self._events.append(("field", self._key, value))
+        elif depth == 2 and self._stack[-1] == "[" and self._key == self._array_key:
+            item = _loads(self._span(start, end))
+            if isinstance(item, dict):
+                self._events.append(("item", self._item_index, item))
+                self._item_index += 1
+
+
+def extract_json_object(text: str) -> tuple[Any, bool]:
+    start = text.find("{")
+    if start < 0:
+        return None, False
+    try:
+        return _DECODER.raw_decode(text, start)[0], True
+    except ValueError:
+        pass
+    extractor = JsonExtractor()
+    extractor.feed(text[start:])
+    value = extractor.value()
+    if value is _MISSING or (not value and not extractor.complete):
+        return None, False
+    return value, extractor.complete
+
+
+_DECODER = json.JSONDecoder()
+_MISSING = object()
+
+
+def _loads(raw: str) -> Any:
+    try:
+        return json.loads(raw)
+    except Exception:
+        return _MISSING
@@ -0,0 +1,536 @@
+from __future__ import annotations
+
+import ast
+import hashlib
+import multiprocessing
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import Any
+
+UNKNOWN_LANGUAGE = "未知/自动"
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": "Python",
+    ".pyw": "Python",
+    ".js": "JavaScript/TypeScript",
+    ".jsx": "JavaScript/TypeScript",
+    ".mjs": "JavaScript/TypeScript",
+    ".cjs": "JavaScript/TypeScript",
+    ".ts": "JavaScript/TypeScript",
+    ".tsx": "JavaScript/TypeScript",
+    ".c": "C/C++",
+    ".h": "C/C++",
+    ".cc": "C/C++",
+    ".cpp": "C/C++",
+    ".cxx": "C/C++",
+    ".hpp": "C/C++",
+    ".hh": "C/C++",
+    ".java": "Java",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".cs": "C#",
+    ".kt": "Kotlin",
+    ".swift": "Swift",
+    ".scala": "Scala",
+    ".php": "PHP",
+    ".rb": "Ruby",
+}
+
+BRACE_LANGUAGES = frozenset(
+    {"JavaScript/TypeScript", "C/C++", "Java", "Go", "Rust", "C#", "Kotlin", "Swift", "Scala", "PHP"}
+)
+
+MEDIUM_COMPLEXITY = 10
+HIGH_COMPLEXITY = 20
+MEMO_SIZE = 4096
+PROCESS_POOL_MIN_CHARS = 2 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FunctionMetrics:
+    name: str
+    start_line: int
+    end_line: int
+    loc: int
+    complexity: int
+    max_nesting: int
+
+
+@dataclass(frozen=True)
+class FileMetrics:
+    language: str
+    lines: int
+    code_lines: int
+    comment_lines: int
+    classes: int
+    functions: tuple[FunctionMetrics, ...] = ()
+    parse_error: bool = False
+
+    @property
+    def max_complexity(self) -> int:
+        return max((f.complexity for f in self.functions), default=0)
+
+    @property
+    def max_nesting(self) -> int:
+        return max((f.max_nesting for f in self.functions), default=0)
+
+    def to_dict(self, top: int = 5) -> dict[str, Any]:
+        complexities = [f.complexity for f in self.functions]
+        worst = sorted(self.functions, key=lambda f: (-f.complexity, f.start_line))[:top]
+        data: dict[str, Any] = {
+            "language": self.language,
+            "lines": self.lines,
+            "code_lines": self.code_lines,
+            "comment_lines": self.comment_lines,
+            "functions": len(self.functions),
+            "classes": self.classes,
+            "max_complexity": self.max_complexity,
+            "avg_complexity": round(sum(complexities) / len(complexities), 1) if complexities else 0,
+            "max_nesting": self.max_nesting,
+            "complexity_hint": complexity_hint(self.max_complexity),
+            "complex_functions": [
+                f"{f.name}@L{f.start_line} cc={f.complexity} depth={f.max_nesting} loc={f.loc}"
+                for f in worst
+                if f.complexity >= MEDIUM_COMPLEXITY
+            ],
+        }
+        if self.parse_error:
+            data["parse_error"] = True
+        return data
+
+
+def complexity_hint(max_complexity: int) -> str:
+    if max_complexity >= HIGH_COMPLEXITY:
+        return "高"
+    if max_complexity >= MEDIUM_COMPLEXITY:
+        return "中"
+    return "低"
+
+
+def combine(metrics: list[FileMetrics]) -> dict[str, Any]:
+    functions = [f for m in metrics for f in m.functions]
+    worst = max(functions, key=lambda f: f.complexity, default=None)
+    languages = sorted({m.language for m in metrics if m.language != UNKNOWN_LANGUAGE})
+    data: dict[str, Any] = {
+        "files": len(metrics),
+        "languages": languages,
+        "lines": sum(m.lines for m in metrics),
+        "code_lines": sum(m.code_lines for m in metrics),
+        "comment_lines": sum(m.comment_lines for m in metrics),
+        "functions": len(functions),
+        "classes": sum(m.classes for m in metrics),
+        "max_complexity": worst.complexity if worst is not None else 0,
+        "avg_complexity": round(sum(f.complexity for f in functions) / len(functions), 1) if functions else 0,
+        "max_nesting": max((m.max_nesting for m in metrics), default=0),
+        "complexity_hint": complexity_hint(worst.complexity if worst is not None else 0),
+    }
+    return data
+
+
+def detect_language(code: str, path: str = "") -> str:
+    if path:
+        language = LANGUAGE_BY_EXTENSION.get(PurePath(path).suffix.lower())
+        if language:
+            return language
+    return _sniff_language(code[:4096])
+
+
+def _sniff_language(head: str) -> str:
+    if re.search(r"^\s*(?:async\s+)?def\s+\w+\(|^\s*from\s+[\w.]+\s+import\b", head, flags=re.M):
+        return "Python"
+    if re.search(r"^\s*(?:pub\s+)?fn\s+\w+|\blet\s+mut\b", head, flags=re.M):
+        return "Rust"
+    if re.search(r"^\s*package\s+\w+\s*$|^\s*func\s", head, flags=re.M):
+        return "Go"
+    if "#include" in head or "std::" in head:
+        return "C/C++"
+    if "public class " in head or "System.out" in head:
+        return "Java"
+    if re.search(r"^\s*(?:export\s+)?(?:async\s+)?function\b|console\.log|=>", head, flags=re.M):
+        return "JavaScript/TypeScript"
+    if re.search(r"^\s*import\s+[\w.]+\s*$", head, flags=re.M):
+        return "Python"
+    return UNKNOWN_LANGUAGE
+
+
+_MEMO: OrderedDict[tuple[bytes, str], FileMetrics] = OrderedDict()
+_MEMO_LOCK = threading.Lock()
+
+
+def content_hash(code: str) -> bytes:
+    return hashlib.blake2b(code.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
+
+def measure(code: str, path: str = "", language: str = "") -> FileMetrics:
+    language = language or detect_language(code, path)
+    key = (content_hash(code), language)
+    with _MEMO_LOCK:
+        hit = _MEMO.get(key)
+        if hit is not None:
+            _MEMO.move_to_end(key)
+            return hit
+    result = _measure_uncached(code, language)
+    _remember(key, result)
+    return result
+
+
+def measure_many(files: list[tuple[str, str]], max_workers: int = 0) -> list[FileMetrics]:
+    languages = [detect_language(code, name) for name, code in files]
+    keys = [(content_hash(code), lang) for (_, code), lang in zip(files, languages)]
+    out: list[FileMetrics | None] = [None] * len(files)
+    missing: dict[tuple[bytes, str], list[int]] = {}
+    with _MEMO_LOCK:
+        for i, key in enumerate(keys):
+            hit = _MEMO.get(key)
+            if hit is not None:
+                out[i] = hit
+            else:
+                missing.setdefault(key, []).append(i)
+    if missing:
+        todo = [(files[idx[0]][1], key[1]) for key, idx in missing.items()]
+        results = _run_pool(todo, max_workers)
+        for (key, idx), result in zip(missing.items(), results):
+            _remember(key, result)
+            for i in idx:
+                out[i] = result
+    return [m for m in out if m is not None]
+
+
+def _run_pool(todo: list[tuple[str, str]], max_workers: int) -> list[FileMetrics]:
+    workers = max_workers or (os.cpu_count() or 1)
+    total = sum(len(code) for code, _ in todo)
+    if workers <= 1 or len(todo) < 2 or total < PROCESS_POOL_MIN_CHARS:
+        return [_measure_uncached(code, lang) for code, lang in todo]
+    workers = min(workers, len(todo))
+    try:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            codes = [code for code, _ in todo]
+            langs = [lang for _, lang in todo]
+            return list(pool.map(_measure_uncached, codes, langs, chunksize=max(1, len(todo) // (workers * 4))))
+    except (OSError, RuntimeError):
+        return [_measure_uncached(code, lang) for code, lang in todo]
+
+
+def _remember(key: tuple[bytes, str], result: FileMetrics) -> None:
+    with _MEMO_LOCK:
+        _MEMO[key] = result
+        _MEMO.move_to_end(key)
+        while len(_MEMO) > MEMO_SIZE:
+            _MEMO.popitem(last=False)
+
+
+def _measure_uncached(code: str, language: str) -> FileMetrics:
+    if language == "Python":
+        return _measure_python(code)
+    if language in BRACE_LANGUAGES:
+        return _measure_braces(code, language)
+    return _measure_lines(code, language)
+
+
+def _measure_lines(code: str, language: str, parse_error: bool = False) -> FileMetrics:
+    lines = code.splitlines()
+    non_blank = [ln.strip() for ln in lines if ln.strip()]
+    comments = sum(1 for ln in non_blank if ln.startswith(("#", "//", "/*", "*", "--")))
+    return FileMetrics(
+        language=language,
+        lines=len(non_blank),
+        code_lines=len(non_blank) - comments,
+        comment_lines=comments,
+        classes=sum(1 for ln in non_blank if re.match(r"(?:public\s+)?class\s+\w+", ln)),
+        parse_error=parse_error,
+    )
+
+
+class _PythonVisitor(ast.NodeVisitor):
+    _BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler)
+    _NESTING = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try)
+
+    def __init__(self, code_lines: list[int]) -> None:
+        self.code_lines = code_lines
+        self.functions: list[FunctionMetrics] = []
+        self.classes = 0
+        self._stack: list[list[Any]] = []
+        self._elif: set[int] = set()
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self.classes += 1
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        frame: list[Any] = [1, 0, 0]
+        self._stack.append(frame)
+        for child in node.body:
+            self.visit(child)
+        self._stack.pop()
+        end = getattr(node, "end_lineno", None) or node.lineno
+        start = min([node.lineno, *(d.lineno for d in node.decorator_list)])
+        self.functions.append(
+            FunctionMetrics(
+                name=node.name,
+                start_line=start,
+                end_line=end,
+                loc=self.code_lines[end] - self.code_lines[start - 1],
+                complexity=frame[0],
+                max_nesting=frame[2],
+            )
+        )
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def generic_visit(self, node: ast.AST) -> None:
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None:
+            if isinstance(node, self._BRANCHES):
+                frame[0] += 1
+            elif isinstance(node, ast.BoolOp):
+                frame[0] += len(node.values) - 1
+            elif isinstance(node, ast.comprehension):
+                frame[0] += 1 + len(node.ifs)
+            elif sys.version_info >= (3, 10) and isinstance(node, ast.match_case):
+                frame[0] += 1
+        if isinstance(node, ast.If) and len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
+            self._elif.add(id(node.orelse[0]))
+        nests = frame is not None and isinstance(node, self._NESTING) and id(node) not in self._elif
+        if nests:
+            frame[1] += 1
+            frame[2] = max(frame[2], frame[1])
+        super().generic_visit(node)
+        if nests:
+            frame[1] -= 1
+
+
+def _measure_python(code: str) -> FileMetrics:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError, RecursionError):
+        return _measure_lines(code, "Python", parse_error=True)
+    lines = code.splitlines()
+    prefix = [0]
+    comments = 0
+    for ln in lines:
+        stripped = ln.strip()
+        is_comment = stripped.startswith("#")
+        comments += is_comment
+        prefix.append(prefix[-1] + (1 if stripped and not is_comment else 0))
+    prefix.append(prefix[-1])
+    visitor = _PythonVisitor(prefix)
+    visitor.visit(tree)
+    non_blank = prefix[len(lines)] + comments
+    return FileMetrics(
+        language="Python",
+        lines=non_blank,
+        code_lines=prefix[len(lines)],
+        comment_lines=comments,
+        classes=visitor.classes,
+        functions=tuple(sorted(visitor.functions, key=lambda f: f.start_line)),
+    )
+
+
+_TOKEN_PATTERN = r"""
+    (?P<nl>\n)
+    |(?P<ws>[ \t\r\f\v]+)
+    |(?P<lc>//[^\n]*)
+    |(?P<bc>/\*.*?(?:\*/|\Z))
+    |(?P<raw>r(?P<hashes>\#*)".*?"(?P=hashes))
+    |(?P<str>"(?:\\.|[^"\\\n])*"?)
+    |(?P<tpl>`(?:\\.|[^`\\])*`?)
+    |{quote}
+    |(?P<id>[A-Za-z_$][\w$]*)
+    |(?P<num>\d[\w.]*)
+    |(?P<op>&&|\|\||\?\?|\?\.|=>|->|::|[{{}}()\[\];?:=,])
+    |(?P<other>.)
+"""
+_C_TOKEN_RE = re.compile(_TOKEN_PATTERN.format(quote=r"(?P<chr>'(?:\\[^'\n]{1,10}|[^'\\\n])')"), re.S | re.X)
+_JS_TOKEN_RE = re.compile(_TOKEN_PATTERN.format(quote=r"(?P<sq>'(?:\\.|[^'\\\n])*'?)"), re.S | re.X)
+
+_CONTROL = frozenset(
+    {
+        "if", "for", "while", "switch", "catch", "return", "sizeof", "typeof", "with", "match", "foreach",
+        "else", "do", "try", "finally", "loop", "unsafe", "defer", "go", "select", "new", "delete", "throw",
+        "await", "using", "lock", "fixed", "guard", "when",
+    }
+)
+_DECISIONS = frozenset({"if", "for", "while", "case", "catch", "foreach", "guard", "when"})
+_CLASS_KEYWORDS = frozenset({"class", "struct", "interface", "trait", "enum", "impl", "namespace", "union"})
+_COUNTED_CLASSES = frozenset({"class", "struct", "interface", "trait", "object", "record"})
+_EXTRA_CLASS_KEYWORDS = {"Scala": {"object"}, "Kotlin": {"object"}, "Java": {"record"}, "C#": {"record"}}
+_NEWLINE_TERMINATED = frozenset({"Go", "JavaScript/TypeScript", "Kotlin", "Swift", "Scala"})
+_ANONYMOUS = "<anonymous>"
+
+
+@dataclass
+class _Statement:
+    paren: int = 0
+    candidate: str = ""
+    line: int = 0
+    frozen: bool = False
+    kind: str = ""
+    assigned: str = ""
+    generic: str = ""
+
+
+@dataclass
+class _Frame:
+    kind: str
+    saved: _Statement
+    name: str = ""
+    line: int = 0
+    complexity: int = 1
+    depth: int = 0
+    max_nesting: int = 0
+
+
+def _measure_braces(code: str, language: str) -> FileMetrics:
+    token_re = _JS_TOKEN_RE if language in ("JavaScript/TypeScript", "PHP") else _C_TOKEN_RE
+    class_keywords = _CLASS_KEYWORDS | _EXTRA_CLASS_KEYWORDS.get(language, set())
+    newline_ends = language in _NEWLINE_TERMINATED
+    has_code = bytearray(b"\x00\x00")
+    has_comment = bytearray(b"\x00\x00")
+    line = 1
+
+    functions: list[FunctionMetrics] = []
+    classes = 0
+    stack: list[_Frame] = []
+    open_functions: list[_Frame] = []
+    st = _Statement()
+    prev = ""
+    prev_kind = ""
+
+    for m in token_re.finditer(code):
+        kind = m.lastgroup
+        if kind == "nl":
+            line += 1
+            has_code.append(0)
+            has_comment.append(0)
+            if newline_ends and st.paren == 0 and prev not in ("(", ",", "=>", "=", "&&", "||", ":", "?"):
+                st = _Statement()
+            continue
+        if kind == "ws":
+            continue
+        text = m.group()
+        if kind in ("lc", "bc"):
+            span = text.count("\n")
+            has_comment[line] = 1
+            if span:
+                line += span
+                has_code.extend(b"\x00" * span)
+                has_comment.extend(b"\x01" * span)
+            continue
+        has_code[line] = 1
+        if kind in ("str", "tpl", "raw", "chr", "sq"):
+            span = text.count("\n")
+            if span:
+                line += span
+                has_code.extend(b"\x01" * span)
+                has_comment.extend(b"\x00" * span)
+            prev, prev_kind = "", "str"
+            continue
+
+        current = open_functions[-1] if open_functions else None
+        if kind == "id":
+            if current is not None and text in _DECISIONS:
+                current.complexity += 1
+            if st.paren == 0 and not st.frozen:
+                if text in _CONTROL:
+                    st.candidate, st.kind = "", st.kind or "control"
+                elif text in class_keywords and not st.candidate and not st.kind:
+                    st.kind = text
+        elif kind == "op":
+            if text in ("&&", "||", "??"):
+                if current is not None:
+                    current.complexity += 1
+            elif text == "?":
+                if current is not None and language != "Rust" and code[m.end() : m.end() + 1] not in (":", ".", ")", ",", ">", "?"):
+                    current.complexity += 1
+            elif text == "=>" and language == "Rust":
+                if current is not None and st.paren == 0:
+                    current.complexity += 1
+            elif text == "(":
+                if st.paren == 0 and not st.frozen:
+                    if prev_kind == "id" and prev not in _CONTROL:
+                        st.candidate = (st.assigned or _ANONYMOUS) if prev in ("function", "func") else prev
+                        st.line = line
+                    elif prev == ">" and st.generic:
+                        st.candidate = st.generic
+                        st.line = line
+                    elif prev_kind == "id" or prev not in (")", "]", ">"):
+                        st.candidate = ""
+                st.paren += 1
+            elif text == ")":
+                st.paren = max(0, st.paren - 1)
+            elif text in ("=", ":") and st.paren == 0:
+                if prev_kind == "id":
+                    st.assigned = prev
+                if text == ":" and st.candidate and prev == ")":
+                    st.frozen = True
+            elif text == ";" and st.paren == 0:
+                st = _Statement()
+            elif text == "{":
+                saved = st if st.paren > 0 else _Statement()
+                if prev == "=>" or (st.candidate and st.paren == 0 and not st.kind):
+                    name = st.candidate if prev != "=>" else (st.assigned if st.paren == 0 and st.assigned else _ANONYMOUS)
+                    frame = _Frame("function", saved, name=name, line=st.line if prev != "=>" else line, depth=len(stack) + 1)
+                    open_functions.append(frame)
+                elif st.kind and st.kind != "control":
+                    if st.kind in _COUNTED_CLASSES:
+                        classes += 1
+                    frame = _Frame("class", saved)
+                else:
+                    frame = _Frame("block", saved)
+                    if current is not None:
+                        current.max_nesting = max(current.max_nesting, len(stack) + 1 - current.depth)
+                stack.append(frame)
+                st = _Statement()
+            elif text == "}":
+                if stack:
+                    frame = stack.pop()
+                    if frame.kind == "function":
+                        open_functions.pop()
+                        functions.append(
+                            FunctionMetrics(
+                                name=frame.name,
+                                start_line=frame.line,
+                                end_line=line,
+                                loc=0,
+                                complexity=frame.complexity,
+                                max_nesting=frame.max_nesting,
+                            )
+                        )
+                    st = frame.saved
+                else:
+                    st = _Statement()
+        elif text == "<" and prev_kind == "id" and st.paren == 0 and prev not in _CONTROL:
+            st.generic = prev
+        prev, prev_kind = text, kind
+
+    prefix = [0]
+    for flag in has_code[1 : line + 1]:
+        prefix.append(prefix[-1] + flag)
+    measured = [
+        FunctionMetrics(
+            name=f.name,
+            start_line=f.start_line,
+            end_line=f.end_line,
+            loc=prefix[f.end_line] - prefix[f.start_line - 1],
+            complexity=f.complexity,
+            max_nesting=f.max_nesting,
+        )
+        for f in functions
+    ]
+    code_lines = prefix[-1]
+    comment_lines = sum(1 for ln in range(1, line + 1) if has_comment[ln] and not has_code[ln])
+    return FileMetrics(
+        language=language,
+        lines=code_lines + comment_lines,
+        code_lines=code_lines,
+        comment_lines=comment_lines,
+        classes=classes,
+        functions=tuple(sorted(measured, key=lambda f: f.start_line)),
+    )
@@ -3,6 +3,32 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Any
 
+MIN_CATEGORIES = 5
+
+_CATEGORY_SCHEMA: dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "score": {"type": "integer", "minimum": 0, "maximum": 100},
+        "summary": {"type": "string"},
+        "issues": {"type": "array", "items": {"type": "string"}},
+        "suggestions": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["name", "score", "summary", "issues", "suggestions"],
+    "additionalProperties": False,
+}
+
+REVIEW_SCHEMA: dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "overall_score": {"type": "integer", "minimum": 0, "maximum": 100},
+        "overall_summary": {"type": "string"},
+        "categories": {"type": "array", "items": _CATEGORY_SCHEMA},
+    },
+    "required": ["overall_score", "overall_summary", "categories"],
+    "additionalProperties": False,
+}
+
 
 @dataclass(frozen=True)
 class CategoryResult:
@@ -30,6 +56,23 @@ def clamp_int(value: Any, low: int, high: int, default: int) -> int:
     return max(low, min(high, num))
 
 
+def parse_category_json(item: dict[str, Any]) -> CategoryResult:
+    name = str(item.get("name") or "").strip() or "未命名"
+    score = clamp_int(item.get("score"), 0, 100, 0)
+    summary = str(item.get("summary") or "").strip()
+    issues_raw = item.get("issues") if isinstance(item.get("issues"), list) else []
+    suggestions_raw = item.get("suggestions") if isinstance(item.get("suggestions"), list) else []
+    issues = [str(x) for x in issues_raw if isinstance(x, (str, int, float))]
+    suggestions = [str(x) for x in suggestions_raw if isinstance(x, (str, int, float))]
+    return CategoryResult(
+        name=name,
+        score=score,
+        summary=summary,
+        issues=issues,
+        suggestions=suggestions,
+    )
+
+
 def parse_review_json(payload: dict[str, Any]) -> ReviewResult:
     overall_score = clamp_int(payload.get("overall_score"), 0, 100, 0)
     overall_summary = str(payload.get("overall_summary") or "").strip()
@@ -41,20 +84,7 @@ def parse_review_json(payload: dict[str, Any]) -> ReviewResult:
         for item in categories_raw:
             if not isinstance(item, dict):
                 continue
-            name = str(item.get("name") or "").strip() or "未命名"
-            score = clamp_int(item.get("score"), 0, 100, 0)
-            summary = str(item.get("summary") or "").strip()
-            issues = [str(x) for x in item.get("issues", []) if isinstance(x, (str, int, float))]
-            suggestions = [str(x) for x in item.get("suggestions", []) if isinstance(x, (str, int, float))]
-            categories.append(
-                CategoryResult(
-                    name=name,
-                    score=score,
-                    summary=summary,
-                    issues=issues,
-                    suggestions=suggestions,
-                )
-            )
+            categories.append(parse_category_json(item))
 
     if not categories:
         for name in ["简洁性", "可读性", "复杂度", "可维护性", "风格一致性", "潜在缺陷", "安全性"]:
@@ -70,3 +100,90 @@ def parse_review_json(payload: dict[str, Any]) -> ReviewResult:
         metrics=metrics,
         raw_json=payload,
     )
+
+
+def review_result_from_dict(data: dict[str, Any]) -> ReviewResult:
+    categories = [parse_category_json(c) for c in data.get("categories") or [] if isinstance(c, dict)]
+    return ReviewResult(
+        overall_score=clamp_int(data.get("overall_score"), 0, 100, 0),
+        overall_summary=str(data.get("overall_summary") or ""),
+        categories=categories,
+        metrics=data.get("metrics") if isinstance(data.get("metrics"), dict) else {},
+        raw_json=data.get("raw_json") if isinstance(data.get("raw_json"), dict) else {},
+    )
+
+
+def review_problems(payload: dict[str, Any], min_categories: int = MIN_CATEGORIES) -> list[str]:
+    if "raw_text" in payload:
+        return ["输出不是合法 JSON"]
+    problems: list[str] = []
+    if not _is_score(payload.get("overall_score")):
+        problems.append("overall_score 缺失或不是 0-100 的整数")
+    if not isinstance(payload.get("overall_summary"), str) or not payload["overall_summary"].strip():
+        problems.append("overall_summary 缺失或为空")
+    categories = payload.get("categories")
+    if not isinstance(categories, list):
+        problems.append("categories 缺失或不是数组")
+        return problems
+    valid = 0
+    for i, item in enumerate(categories):
+        if not isinstance(item, dict):
+            problems.append(f"categories[{i}] 不是对象")
+            continue
+        label = f"categories[{i}]（{item.get('name') or '未命名'}）"
+        bad = [
+            key
+            for key, ok in (
+                ("name", isinstance(item.get("name"), str) and bool(item["name"].strip())),
+                ("score", _is_score(item.get("score"))),
+                ("summary", isinstance(item.get("summary"), str)),
+                ("issues", _is_str_list(item.get("issues"))),
+                ("suggestions", _is_str_list(item.get("suggestions"))),
+            )
+            if not ok
+        ]
+        if bad:
+            problems.append(f"{label} 字段不合法：{', '.join(bad)}")
+        else:
+            valid += 1
+    if valid < min_categories:
+        problems.append(f"categories 只有 {valid} 个有效维度，至少需要 {min_categories} 个")
+    if payload.get("repaired"):
+        problems.append("输出被截断，末尾条目可能不完整")
+    return problems
+
+
+def merge_review_fix(payload: dict[str, Any], fix: dict[str, Any]) -> dict[str, Any]:
+    if "raw_text" in payload:
+        return fix
+    merged = {k: v for k, v in payload.items() if k != "repaired"}
+    for key in ("overall_score", "overall_summary"):
+        if key in fix:
+            merged[key] = fix[key]
+    if isinstance(fix.get("categories"), list):
+        categories = [c for c in payload.get("categories") or [] if isinstance(c, dict)]
+        index = {str(c.get("name") or ""): i for i, c in enumerate(categories)}
+        for item in fix["categories"]:
+            if not isinstance(item, dict):
+                continue
+            at = index.get(str(item.get("name") or ""))
+            if at is None:
+                index[str(item.get("name") or "")] = len(categories)
+                categories.append(item)
+            else:
+                categories[at] = {**categories[at], **item}
+        merged["categories"] = categories
+    return merged
+
+
+def _is_score(value: Any) -> bool:
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return False
+    try:
+        return 0 <= float(value) <= 100
+    except ValueError:
+        return False
+
+
+def _is_str_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(x, (str, int, float)) for x in value)
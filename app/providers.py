@@ -1,7 +1,25 @@
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass
 
+from app.retry import RetryPolicy
+
+DEFAULT_CONTEXT_TOKENS = 32768
+OUTPUT_RESERVE_TOKENS = 4096
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    input_per_m: float
+    output_per_m: float
+    cached_per_m: float | None = None
+
+    def cost(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        cached = min(max(0, cached_tokens), prompt_tokens)
+        cached_rate = self.input_per_m if self.cached_per_m is None else self.cached_per_m
+        return ((prompt_tokens - cached) * self.input_per_m + cached * cached_rate + completion_tokens * self.output_per_m) / 1e6
+
 
 @dataclass(frozen=True)
 class ProviderSpec:
@@ -9,6 +27,13 @@ class ProviderSpec:
     display_name: str
     default_base_url: str
     default_models: tuple[str, ...]
+    context_limits: tuple[tuple[str, int], ...] = ()
+    default_context_tokens: int = DEFAULT_CONTEXT_TOKENS
+    stream_usage: bool = False
+    retry_policy: RetryPolicy = RetryPolicy()
+    initial_concurrency: int = 4
+    response_format: str = ""
+    prices: tuple[tuple[str, ModelPrice], ...] = ()
 
 
 PROVIDERS: tuple[ProviderSpec, ...] = (
@@ -17,42 +42,88 @@ PROVIDERS: tuple[ProviderSpec, ...] = (
         display_name="DeepSeek",
         default_base_url="https://api.deepseek.com",
         default_models=("deepseek-chat", "deepseek-reasoner"),
+        context_limits=(("deepseek-chat", 65536), ("deepseek-reasoner", 65536)),
+        default_context_tokens=65536,
+        stream_usage=True,
+        initial_concurrency=8,
+        response_format="json_object",
+        prices=(
+            ("deepseek-chat", ModelPrice(0.28, 0.42, 0.028)),
+            ("deepseek-reasoner", ModelPrice(0.28, 0.42, 0.028)),
+        ),
     ),
     ProviderSpec(
         provider_id="openai",
         display_name="OpenAI",
         default_base_url="https://api.openai.com",
         default_models=("gpt-4o-mini", "gpt-4o", "gpt-5.2"),
+        context_limits=(("gpt-4o-mini", 128000), ("gpt-4o", 128000), ("gpt-5.2", 400000)),
+        default_context_tokens=128000,
+        stream_usage=True,
+        initial_concurrency=8,
+        response_format="json_schema",
+        prices=(
+            ("gpt-4o-mini", ModelPrice(0.15, 0.60, 0.075)),
+            ("gpt-4o", ModelPrice(2.50, 10.00, 1.25)),
+            ("gpt-5.2", ModelPrice(1.75, 14.00, 0.175)),
+        ),
     ),
     ProviderSpec(
         provider_id="openrouter",
         display_name="OpenRouter",
         default_base_url="https://openrouter.ai/api/v1",
         default_models=("openai/gpt-4o-mini", "openai/gpt-5.2"),
+        context_limits=(("openai/gpt-4o-mini", 128000), ("openai/gpt-5.2", 400000)),
+        stream_usage=True,
+        response_format="json_object",
     ),
     ProviderSpec(
         provider_id="groq",
         display_name="Groq",
         default_base_url="https://api.groq.com/openai/v1",
         default_models=("llama-3.3-70b-versatile", "llama3-8b-8192"),
+        context_limits=(("llama-3.3-70b-versatile", 131072), ("llama3-8b-8192", 8192)),
+        retry_policy=RetryPolicy(max_attempts=8, max_delay_s=60.0, deadline_s=300.0),
+        initial_concurrency=2,
+        response_format="json_object",
+        prices=(
+            ("llama-3.3-70b-versatile", ModelPrice(0.59, 0.79)),
+            ("llama3-8b-8192", ModelPrice(0.05, 0.08)),
+        ),
     ),
     ProviderSpec(
         provider_id="together",
         display_name="Together",
         default_base_url="https://api.together.xyz/v1",
         default_models=("openai/gpt-oss-20b", "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"),
+        context_limits=(("openai/gpt-oss-20b", 131072), ("meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo", 131072)),
+        stream_usage=True,
+        response_format="json_object",
+        prices=(
+            ("openai/gpt-oss-20b", ModelPrice(0.05, 0.20)),
+            ("meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo", ModelPrice(0.18, 0.18)),
+        ),
     ),
     ProviderSpec(
         provider_id="siliconflow",
         display_name="SiliconFlow",
         default_base_url="https://api.siliconflow.cn/v1",
         default_models=("deepseek-ai/DeepSeek-V3.2", "deepseek-ai/DeepSeek-R1", "Qwen/Qwen3-32B"),
+        context_limits=(
+            ("deepseek-ai/DeepSeek-V3.2", 131072),
+            ("deepseek-ai/DeepSeek-R1", 65536),
+            ("Qwen/Qwen3-32B", 32768),
+        ),
+        stream_usage=True,
+        response_format="json_object",
     ),
     ProviderSpec(
         provider_id="moonshot",
         display_name="Moonshot（Kimi）",
         default_base_url="https://api.moonshot.cn/v1",
         default_models=("kimi-k2-turbo-preview", "moonshot-v1-8k"),
+        context_limits=(("kimi-k2-turbo-preview", 262144), ("moonshot-v1-8k", 8192)),
+        response_format="json_object",
     ),
     ProviderSpec(
         provider_id="custom",
@@ -70,3 +141,36 @@ def get_provider(provider_id: str) -> ProviderSpec:
             return p
     return next(p for p in PROVIDERS if p.provider_id == "custom")
 
+
+def context_limit(provider_id: str, model: str) -> int:
+    name = (model or "").strip()
+    spec = get_provider(provider_id)
+    for mid, limit in spec.context_limits:
+        if mid == name:
+            return limit
+    for p in PROVIDERS:
+        for mid, limit in p.context_limits:
+            if mid == name or mid.split("/")[-1] == name.split("/")[-1]:
+                return limit
+    m = re.search(r"(\d+)k\b", name.lower())
+    if m:
+        return int(m.group(1)) * 1024
+    return spec.default_context_tokens
+
+
+def model_price(provider_id: str, model: str) -> ModelPrice | None:
+    name = (model or "").strip()
+    for mid, price in get_provider(provider_id).prices:
+        if mid == name:
+            return price
+    for p in PROVIDERS:
+        for mid, price in p.prices:
+            if mid == name or mid.split("/")[-1] == name.split("/")[-1]:
+                return price
+    return None
+
+
+def input_token_budget(provider_id: str, model: str, overhead_tokens: int = 0) -> int:
+    limit = context_limit(provider_id, model)
+    reserve = min(OUTPUT_RESERVE_TOKENS, limit // 4)
+    return max(1024, limit - reserve - max(0, overhead_tokens))
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from app.api_client import PROMPT_VERSION
+
+
+def cache_key(
+    code: str,
+    model: str,
+    base_url: str,
+    language_hint: str,
+    extra_requirements: str = "",
+    prompt_version: str = PROMPT_VERSION,
+) -> str:
+    material = json.dumps(
+        [prompt_version, base_url.strip().rstrip("/"), model.strip(), language_hint, extra_requirements.strip(), code],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(payload: dict[str, Any]) -> bool:
+    return (
+        isinstance(payload.get("categories"), list)
+        and bool(payload["categories"])
+        and "raw_text" not in payload
+        and not payload.get("repaired")
+    )
+
+
+class ResultCache:
+    def __init__(self, path: Path, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self._path = Path(path)
+        self._max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self._path), timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        with self._lock:
+            self._max_bytes = max(0, int(max_bytes))
+            self._evict()
+            self._conn.commit()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM entries WHERE key = ?", (key,)).fetchone()
+            payload: dict[str, Any] | None = None
+            if row is not None:
+                try:
+                    obj = json.loads(row[0])
+                    payload = obj if isinstance(obj, dict) else None
+                except Exception:
+                    payload = None
+            if payload is None:
+                self.misses += 1
+                self._bump("misses")
+            else:
+                self.hits += 1
+                self._bump("hits")
+                self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return payload
+
+    def put(self, key: str, payload: dict[str, Any]) -> None:
+        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        size = len(text.encode("utf-8"))
+        if self._max_bytes and size > self._max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, payload, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, text, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        if not self._max_bytes:
+            return
+        total = int(self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0])
+        if total <= self._max_bytes:
+            return
+        doomed: list[tuple[str]] = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used ASC"):
+            if total <= self._max_bytes:
+                break
+            doomed.append((key,))
+            total -= int(size)
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self._bump("evictions", len(doomed))
+
+    def _bump(self, name: str, amount: int = 1) -> None:
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            totals = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "entries": int(entries),
+            "bytes": int(total),
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": int(totals.get("hits", 0)),
+            "total_misses": int(totals.get("misses", 0)),
+            "evictions": int(totals.get("evictions", 0)),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import email.utils
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Mapping
+
+import requests
+
+RETRY_STATUSES = frozenset({408, 409, 425, 429, 500, 502, 503, 504, 520, 522, 524, 529})
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay_s: float = 1.0
+    max_delay_s: float = 30.0
+    deadline_s: float = 180.0
+    statuses: frozenset[int] = RETRY_STATUSES
+
+
+@dataclass(frozen=True)
+class RetryEvent:
+    attempt: int
+    delay_s: float
+    reason: str
+    hinted: bool = False
+
+
+def call_with_retry(
+    send: Callable[[], requests.Response],
+    policy: RetryPolicy,
+    on_retry: Callable[[RetryEvent], None] | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+) -> requests.Response:
+    started = clock()
+    attempt = 0
+    while True:
+        attempt += 1
+        resp: requests.Response | None = None
+        try:
+            resp = send()
+        except RETRY_EXCEPTIONS as e:
+            error: Exception | None = e
+            reason = type(e).__name__
+        else:
+            if resp.status_code not in policy.statuses:
+                return resp
+            error = None
+            reason = f"HTTP {resp.status_code}"
+        hint = retry_after_s(resp.headers) if resp is not None else None
+        delay = hint * random.uniform(1.0, 1.1) if hint is not None else backoff_delay(policy, attempt)
+        remaining = policy.deadline_s - (clock() - started)
+        if attempt >= max(1, policy.max_attempts) or delay > remaining:
+            if error is not None:
+                raise error
+            return resp
+        if resp is not None:
+            resp.close()
+        if on_retry is not None:
+            on_retry(RetryEvent(attempt=attempt, delay_s=delay, reason=reason, hinted=hint is not None))
+        sleep(delay)
+
+
+def backoff_delay(policy: RetryPolicy, attempt: int) -> float:
+    cap = min(policy.max_delay_s, policy.base_delay_s * (2 ** max(0, attempt - 1)))
+    return random.uniform(0, cap)
+
+
+def retry_after_s(headers: Mapping[str, Any]) -> float | None:
+    ms = _float(headers.get("retry-after-ms"))
+    if ms is not None:
+        return max(0.0, ms / 1000)
+    value = headers.get("retry-after")
+    if value:
+        seconds = _float(value)
+        if seconds is None:
+            try:
+                seconds = email.utils.parsedate_to_datetime(str(value)).timestamp() - time.time()
+            except (TypeError, ValueError, IndexError, OverflowError):
+                seconds = None
+        if seconds is not None:
+            return max(0.0, seconds)
+    waits = []
+    for kind in ("requests", "tokens"):
+        if str(headers.get(f"x-ratelimit-remaining-{kind}", "")).strip() == "0":
+            reset = parse_duration_s(str(headers.get(f"x-ratelimit-reset-{kind}", "")))
+            if reset is not None:
+                waits.append(reset)
+    if waits:
+        return max(waits)
+    return None
+
+
+def parse_duration_s(text: str) -> float | None:
+    text = text.strip()
+    if not text:
+        return None
+    plain = _float(text)
+    if plain is not None:
+        return max(0.0, plain)
+    parts = _DURATION_PART_RE.findall(text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(n) * scale[u] for n, u in parts)
+
+
+def _float(value: Any) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import requests
+
+WINDOW = 50
+MIN_SAMPLES = 3
+BASE_COOLDOWN_S = 5.0
+MAX_COOLDOWN_S = 120.0
+UNHEALTHY_ERROR_RATE = 0.5
+TAIL_WEIGHT = 0.5
+
+
+@dataclass(frozen=True)
+class RouteEndpoint:
+    provider: str
+    model: str
+    base_url: str = ""
+    api_key: str = ""
+    weight: float = 1.0
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}|{self.base_url.strip().rstrip('/')}|{self.model}"
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+
+@dataclass(frozen=True)
+class EndpointStats:
+    samples: int
+    p50_s: float
+    p95_s: float
+    error_rate: float
+    cooling_s: float
+
+
+class _Health:
+    def __init__(self) -> None:
+        self.samples: deque[tuple[float, bool]] = deque(maxlen=WINDOW)
+        self.failures = 0
+        self.down_until = 0.0
+
+    def stats(self, now: float) -> EndpointStats:
+        latencies = sorted(lat for lat, ok in self.samples if ok)
+        errors = sum(1 for _, ok in self.samples if not ok)
+        return EndpointStats(
+            samples=len(self.samples),
+            p50_s=_percentile(latencies, 0.5),
+            p95_s=_percentile(latencies, 0.95),
+            error_rate=errors / len(self.samples) if self.samples else 0.0,
+            cooling_s=max(0.0, self.down_until - now),
+        )
+
+
+def parse_route_spec(text: str) -> list[tuple[str, str, float]]:
+    routes: list[tuple[str, str, float]] = []
+    for item in text.replace("\n", ",").split(","):
+        item = item.strip()
+        if not item or ":" not in item:
+            continue
+        weight = 1.0
+        if "*" in item:
+            item, _, w = item.rpartition("*")
+            try:
+                weight = max(0.1, float(w))
+            except ValueError:
+                weight = 1.0
+        provider, _, model = item.partition(":")
+        if provider.strip() and model.strip():
+            routes.append((provider.strip().lower(), model.strip(), weight))
+    return routes
+
+
+class Router:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._health: dict[str, _Health] = {}
+
+    def ranked(self, endpoints: tuple[RouteEndpoint, ...]) -> list[RouteEndpoint]:
+        now = time.monotonic()
+        with self._lock:
+            stats = {e.key: self._health.setdefault(e.key, _Health()).stats(now) for e in endpoints}
+
+        expected = {key: _expected_latency(st) for key, st in stats.items()}
+        prior = _percentile(sorted(v for v in expected.values() if v is not None), 0.5)
+
+        def score(item: tuple[int, RouteEndpoint]) -> tuple[int, float, int]:
+            index, e = item
+            st = stats[e.key]
+            unhealthy = st.cooling_s > 0 or (st.samples >= MIN_SAMPLES and st.error_rate >= UNHEALTHY_ERROR_RATE)
+            latency = expected[e.key]
+            return (1 if unhealthy else 0, (prior if latency is None else latency) / e.weight, index)
+
+        return [e for _, e in sorted(enumerate(endpoints), key=score)]
+
+    def record(self, endpoint: RouteEndpoint, latency_s: float, ok: bool) -> None:
+        with self._lock:
+            health = self._health.setdefault(endpoint.key, _Health())
+            health.samples.append((latency_s, ok))
+            if ok:
+                health.failures = 0
+                health.down_until = 0.0
+            else:
+                health.failures += 1
+                cooldown = min(MAX_COOLDOWN_S, BASE_COOLDOWN_S * 2 ** (health.failures - 1))
+                health.down_until = time.monotonic() + cooldown
+
+    def snapshot(self, endpoints: tuple[RouteEndpoint, ...]) -> dict[str, EndpointStats]:
+        now = time.monotonic()
+        with self._lock:
+            return {e.label: self._health.setdefault(e.key, _Health()).stats(now) for e in endpoints}
+
+
+def should_fail_over(error: Exception) -> bool:
+    return isinstance(error, requests.RequestException)
+
+
+def format_routes(snapshot: dict[str, EndpointStats]) -> str:
+    lines = []
+    for label, st in snapshot.items():
+        state = f"冷却 {st.cooling_s:.0f}s" if st.cooling_s > 0 else "可用"
+        lines.append(
+            f"{label}  {state}  p50 {st.p50_s:.1f}s  p95 {st.p95_s:.1f}s  "
+            f"错误率 {st.error_rate:.0%}  样本 {st.samples}"
+        )
+    return "\n".join(lines)
+
+
+def _expected_latency(st: EndpointStats) -> float | None:
+    if st.samples < MIN_SAMPLES or st.p50_s <= 0:
+        return None
+    return st.p50_s + TAIL_WEIGHT * (st.p95_s - st.p50_s)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+_ROUTER = Router()
+
+
+def get_router() -> Router:
+    return _ROUTER
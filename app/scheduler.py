@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import contextvars
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+from app.cancel import Cancelled, CancelToken
+
+INTERACTIVE = 0
+BATCH = 10
+BACKGROUND = 20
+
+PRIORITY_NAMES = {INTERACTIVE: "交互", BATCH: "批量", BACKGROUND: "后台"}
+
+MAX_JOBS = 4
+MAX_QUEUED_JOBS = 64
+MAX_WAITING_REQUESTS = 1024
+DEFAULT_PROVIDER_CAP = 16
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("priority", default=INTERACTIVE)
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class _Waiter:
+    priority: int
+    seq: int
+    provider: str
+    enqueued: float
+    admitted: bool = False
+
+
+@dataclass
+class _Job:
+    priority: int
+    seq: int
+    fn: Callable[[], Any]
+    future: Future
+    enqueued: float
+    deadline: float | None
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+
+@dataclass
+class _WaitStats:
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+    def add(self, wait_s: float) -> None:
+        self.count += 1
+        self.total_s += wait_s
+        self.max_s = max(self.max_s, wait_s)
+
+
+@dataclass(frozen=True)
+class SchedulerStats:
+    queued_jobs: int
+    running_jobs: int
+    waiting: dict[str, int]
+    running: dict[str, int]
+    caps: dict[str, int]
+    avg_wait_s: dict[str, float]
+    max_wait_s: dict[str, float]
+    rejected: int
+    expired: int
+
+
+class Scheduler:
+    def __init__(
+        self,
+        max_jobs: int = MAX_JOBS,
+        max_queued_jobs: int = MAX_QUEUED_JOBS,
+        max_waiting: int = MAX_WAITING_REQUESTS,
+        provider_cap: int = DEFAULT_PROVIDER_CAP,
+    ) -> None:
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._max_jobs = max(1, max_jobs)
+        self._max_queued_jobs = max(1, max_queued_jobs)
+        self._max_waiting = max(1, max_waiting)
+        self._provider_cap = max(1, provider_cap)
+        self._caps: dict[str, int] = {}
+        self._jobs: list[_Job] = []
+        self._job_threads = 0
+        self._running_jobs = 0
+        self._waiters: list[_Waiter] = []
+        self._running: dict[str, int] = {}
+        self._waits: dict[int, _WaitStats] = {}
+        self._rejected = 0
+        self._expired = 0
+
+    def configure(self, provider_cap: int | None = None, caps: dict[str, int] | None = None) -> None:
+        with self._cond:
+            if provider_cap is not None:
+                self._provider_cap = max(1, provider_cap)
+            if caps is not None:
+                self._caps = {k: max(1, v) for k, v in caps.items()}
+            self._dispatch()
+
+    def submit(
+        self, fn: Callable[[], Any], priority: int = INTERACTIVE, deadline_s: float | None = None
+    ) -> Future:
+        future: Future = Future()
+        now = time.monotonic()
+        deadline = now + deadline_s if deadline_s else None
+        with self._cond:
+            if len(self._jobs) >= self._max_queued_jobs:
+                self._rejected += 1
+                raise QueueFull(f"任务队列已满（{self._max_queued_jobs}）")
+            self._jobs.append(_Job(priority, next(self._seq), fn, future, now, deadline))
+            self._jobs.sort(key=lambda j: (j.priority, j.seq))
+            if self._job_threads < self._max_jobs and self._job_threads - self._running_jobs < len(self._jobs):
+                self._job_threads += 1
+                threading.Thread(target=self._job_loop, name="scheduler-job", daemon=True).start()
+            self._cond.notify_all()
+        return future
+
+    @contextmanager
+    def admit(self, provider: str, cancel: CancelToken | None = None) -> Iterator[None]:
+        priority = _priority.get()
+        deadline = _deadline.get()
+        with self._cond:
+            if len(self._waiters) >= self._max_waiting:
+                self._rejected += 1
+                raise QueueFull(f"请求队列已满（{self._max_waiting}）")
+            waiter = _Waiter(priority, next(self._seq), provider, time.monotonic())
+            self._waiters.append(waiter)
+            self._dispatch()
+            if cancel is not None and not waiter.admitted:
+                cancel.on_cancel(self._wake)
+            while not waiter.admitted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if cancel is not None and cancel.cancelled:
+                    self._waiters.remove(waiter)
+                    raise Cancelled()
+                if remaining is not None and remaining <= 0:
+                    self._waiters.remove(waiter)
+                    self._expired += 1
+                    raise DeadlineExceeded("排队超过截止时间，请求未发出")
+                self._cond.wait(remaining)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running[provider] -= 1
+                self._dispatch()
+                self._cond.notify_all()
+
+    def stats(self) -> SchedulerStats:
+        with self._cond:
+            waiting: dict[str, int] = {}
+            for w in self._waiters:
+                name = PRIORITY_NAMES.get(w.priority, str(w.priority))
+                waiting[name] = waiting.get(name, 0) + 1
+            return SchedulerStats(
+                queued_jobs=len(self._jobs),
+                running_jobs=self._running_jobs,
+                waiting=waiting,
+                running={k: v for k, v in self._running.items() if v},
+                caps={k: self._cap(k) for k in self._running},
+                avg_wait_s={PRIORITY_NAMES.get(p, str(p)): w.total_s / w.count for p, w in self._waits.items() if w.count},
+                max_wait_s={PRIORITY_NAMES.get(p, str(p)): w.max_s for p, w in self._waits.items()},
+                rejected=self._rejected,
+                expired=self._expired,
+            )
+
+    def _cap(self, provider: str) -> int:
+        return self._caps.get(provider, self._provider_cap)
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        admitted = False
+        for w in sorted(self._waiters, key=lambda w: (w.priority, w.seq)):
+            if self._running.get(w.provider, 0) >= self._cap(w.provider):
+                continue
+            self._running[w.provider] = self._running.get(w.provider, 0) + 1
+            self._waiters.remove(w)
+            self._waits.setdefault(w.priority, _WaitStats()).add(now - w.enqueued)
+            w.admitted = admitted = True
+        if admitted:
+            self._cond.notify_all()
+
+    def _job_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    if not self._cond.wait(30):
+                        if not self._jobs:
+                            self._job_threads -= 1
+                            return
+                job = self._jobs.pop(0)
+                self._running_jobs += 1
+            try:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                if job.deadline is not None and time.monotonic() > job.deadline:
+                    with self._cond:
+                        self._expired += 1
+                    job.future.set_exception(DeadlineExceeded("任务排队超过截止时间"))
+                    continue
+                try:
+                    result = job.context.run(_run_job, job)
+                except BaseException as e:
+                    job.future.set_exception(e)
+                else:
+                    job.future.set_result(result)
+            finally:
+                with self._cond:
+                    self._running_jobs -= 1
+
+
+def _run_job(job: _Job) -> Any:
+    _priority.set(job.priority)
+    _deadline.set(job.deadline)
+    return job.fn()
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def current_deadline() -> float | None:
+    return _deadline.get()
+
+
+@contextmanager
+def scheduling(priority: int, deadline_s: float | None = None) -> Iterator[None]:
+    token = _priority.set(priority)
+    deadline_token = _deadline.set(time.monotonic() + deadline_s) if deadline_s else None
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+        if deadline_token is not None:
+            _deadline.reset(deadline_token)
+
+
+def format_scheduler_stats(stats: SchedulerStats) -> str:
+    parts = []
+    if stats.running:
+        parts.append("运行 " + "  ".join(f"{k} {v}/{stats.caps.get(k, v)}" for k, v in sorted(stats.running.items())))
+    if stats.waiting or stats.queued_jobs:
+        queued = "  ".join(f"{k} {v}" for k, v in stats.waiting.items())
+        parts.append(f"排队 {queued or 0}  任务 {stats.queued_jobs}")
+    if stats.avg_wait_s:
+        parts.append(
+            "等待 " + "  ".join(f"{k} 平均 {v:.1f}s/最长 {stats.max_wait_s.get(k, 0):.1f}s" for k, v in stats.avg_wait_s.items())
+        )
+    if stats.rejected or stats.expired:
+        parts.append(f"拒绝 {stats.rejected}  超时 {stats.expired}")
+    return f"调度：{'；'.join(parts)}" if parts else ""
+
+
+_SCHEDULER = Scheduler()
+
+
+def get_scheduler() -> Scheduler:
+    return _SCHEDULER
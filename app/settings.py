@@ -1,23 +1,43 @@
 from __future__ import annotations
 
+import os
+import sys
 from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
-from PyQt6.QtCore import QSettings, QStandardPaths
-
+from app.compaction import COMPACTION_MODES
 from app.providers import get_provider
+from app.routing import RouteEndpoint, parse_route_spec
+from app.transport import TransportConfig
+
+if TYPE_CHECKING:
+    from PyQt6.QtCore import QSettings
+
+ORGANIZATION_NAME = "代码检测"
+APPLICATION_NAME = "代码检测"
+
+
+def config_dir() -> Path:
+    if sys.platform == "win32":
+        base = Path(os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Preferences"
+    else:
+        xdg = os.environ.get("XDG_CONFIG_HOME", "")
+        base = Path(xdg) if xdg and Path(xdg).is_absolute() else Path.home() / ".config"
+    return base / ORGANIZATION_NAME / APPLICATION_NAME / "deepseek_code_quality_tool"
 
 
 def settings_path() -> Path:
-    base = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppConfigLocation)
-    if not base:
-        base = str(Path.home() / ".config")
-    cfg_dir = Path(base) / "deepseek_code_quality_tool"
+    cfg_dir = config_dir()
     cfg_dir.mkdir(parents=True, exist_ok=True)
     return cfg_dir / "settings.ini"
 
 
 def settings_store() -> QSettings:
+    from PyQt6.QtCore import QSettings
+
     return QSettings(str(settings_path()), QSettings.Format.IniFormat)
 
 
@@ -27,7 +47,32 @@ class AppSettings:
     api_key: str
     base_url: str
     model: str
-
+    pool_size: int = 16
+    keep_alive: bool = True
+    gzip_min_bytes: int = 0
+    stream: bool = True
+    cache_enabled: bool = True
+    cache_max_mb: int = 64
+    project_mode: str = "combined"
+    max_workers: int = 16
+    reduce_with_model: bool = True
+    diff_base: str = "main"
+    diff_context: int = 10
+    compaction: str = "whitespace"
+    route_spec: str = ""
+    routes: tuple[RouteEndpoint, ...] = ()
+    hedging: bool = False
+    hedge_percentile: int = 90
+    hedge_budget_pct: int = 10
+    hedge_spec: str = ""
+    hedge_backup: tuple[RouteEndpoint, ...] = ()
+    budget_job_soft_tokens: int = 200000
+    budget_job_hard_tokens: int = 0
+    budget_daily_soft_usd: float = 0.0
+    budget_daily_hard_usd: float = 0.0
+
+
+PROJECT_MODES = ("combined", "per_file")
 
 DEFAULT_PROVIDER = "deepseek"
 
@@ -45,7 +90,66 @@ def load_settings() -> AppSettings:
     base_url = str(store.value(f"{provider}/base_url", base_url_default, type=str)).strip() or base_url_default
     model = str(store.value(f"{provider}/model", model_default, type=str)).strip() or model_default
 
-    return AppSettings(provider=provider, api_key=api_key, base_url=base_url, model=model)
+    pool_size = int(store.value("network/pool_size", 16, type=int))
+    keep_alive = bool(store.value("network/keep_alive", True, type=bool))
+    gzip_min_bytes = int(store.value("network/gzip_min_bytes", 0, type=int))
+    stream = bool(store.value("analysis/stream", True, type=bool))
+    cache_enabled = bool(store.value("cache/enabled", True, type=bool))
+    cache_max_mb = int(store.value("cache/max_mb", 64, type=int))
+    project_mode = str(store.value("analysis/project_mode", "combined", type=str)).strip()
+    if project_mode not in PROJECT_MODES:
+        project_mode = "combined"
+    max_workers = int(store.value("analysis/max_workers", 16, type=int))
+    reduce_with_model = bool(store.value("analysis/reduce_with_model", True, type=bool))
+    diff_base = str(store.value("analysis/diff_base", "main", type=str)).strip() or "main"
+    diff_context = int(store.value("analysis/diff_context", 10, type=int))
+    compaction = str(store.value("analysis/compaction", "whitespace", type=str)).strip()
+    if compaction not in COMPACTION_MODES:
+        compaction = "whitespace"
+    route_spec = str(store.value("analysis/routes", "", type=str)).strip()
+
+    def stored(key: str, default: str = "") -> str:
+        return str(store.value(key, default, type=str)).strip() or default
+
+    routes = resolve_routes(route_spec, stored)
+    hedging = bool(store.value("hedging/enabled", False, type=bool))
+    hedge_percentile = int(store.value("hedging/percentile", 90, type=int))
+    hedge_budget_pct = int(store.value("hedging/budget_pct", 10, type=int))
+    hedge_spec = str(store.value("hedging/backup", "", type=str)).strip()
+    budget_job_soft_tokens = int(store.value("budget/job_soft_tokens", 200000, type=int))
+    budget_job_hard_tokens = int(store.value("budget/job_hard_tokens", 0, type=int))
+    budget_daily_soft_usd = float(store.value("budget/daily_soft_usd", 0.0, type=float))
+    budget_daily_hard_usd = float(store.value("budget/daily_hard_usd", 0.0, type=float))
+
+    return AppSettings(
+        provider=provider,
+        api_key=api_key,
+        base_url=base_url,
+        model=model,
+        pool_size=max(1, pool_size),
+        keep_alive=keep_alive,
+        gzip_min_bytes=max(0, gzip_min_bytes),
+        stream=stream,
+        cache_enabled=cache_enabled,
+        cache_max_mb=max(1, cache_max_mb),
+        project_mode=project_mode,
+        max_workers=max(1, max_workers),
+        reduce_with_model=reduce_with_model,
+        diff_base=diff_base,
+        diff_context=max(0, diff_context),
+        compaction=compaction,
+        route_spec=route_spec,
+        routes=routes,
+        hedging=hedging,
+        hedge_percentile=min(99, max(50, hedge_percentile)),
+        hedge_budget_pct=min(100, max(0, hedge_budget_pct)),
+        hedge_spec=hedge_spec,
+        hedge_backup=resolve_routes(hedge_spec, stored),
+        budget_job_soft_tokens=max(0, budget_job_soft_tokens),
+        budget_job_hard_tokens=max(0, budget_job_hard_tokens),
+        budget_daily_soft_usd=max(0.0, budget_daily_soft_usd),
+        budget_daily_hard_usd=max(0.0, budget_daily_hard_usd),
+    )
 
 
 def save_settings(settings: AppSettings) -> None:
@@ -59,4 +163,66 @@ def save_settings(settings: AppSettings) -> None:
         f"{provider}/model",
         settings.model.strip() or (spec.default_models[0] if spec.default_models else ""),
     )
+    store.setValue("network/pool_size", settings.pool_size)
+    store.setValue("network/keep_alive", settings.keep_alive)
+    store.setValue("network/gzip_min_bytes", settings.gzip_min_bytes)
+    store.setValue("analysis/stream", settings.stream)
+    store.setValue("cache/enabled", settings.cache_enabled)
+    store.setValue("cache/max_mb", settings.cache_max_mb)
+    store.setValue("analysis/project_mode", settings.project_mode)
+    store.setValue("analysis/max_workers", settings.max_workers)
+    store.setValue("analysis/reduce_with_model", settings.reduce_with_model)
+    store.setValue("analysis/diff_base", settings.diff_base.strip() or "main")
+    store.setValue("analysis/diff_context", settings.diff_context)
+    store.setValue("analysis/compaction", settings.compaction)
+    store.setValue("analysis/routes", settings.route_spec.strip())
+    store.setValue("hedging/enabled", settings.hedging)
+    store.setValue("hedging/percentile", settings.hedge_percentile)
+    store.setValue("hedging/budget_pct", settings.hedge_budget_pct)
+    store.setValue("hedging/backup", settings.hedge_spec.strip())
+    store.setValue("budget/job_soft_tokens", settings.budget_job_soft_tokens)
+    store.setValue("budget/job_hard_tokens", settings.budget_job_hard_tokens)
+    store.setValue("budget/daily_soft_usd", settings.budget_daily_soft_usd)
+    store.setValue("budget/daily_hard_usd", settings.budget_daily_hard_usd)
     store.sync()
+
+
+def resolve_routes(route_spec: str, stored: Callable[[str, str], str]) -> tuple[RouteEndpoint, ...]:
+    routes: list[RouteEndpoint] = []
+    for provider, model, weight in parse_route_spec(route_spec):
+        spec = get_provider(provider)
+        pid = spec.provider_id
+        routes.append(
+            RouteEndpoint(
+                provider=pid,
+                model=model,
+                base_url=stored(f"{pid}/base_url", spec.default_base_url),
+                api_key=stored(f"{pid}/api_key", ""),
+                weight=weight,
+            )
+        )
+    return tuple(r for r in routes if r.base_url and r.api_key)
+
+
+def result_cache_path() -> Path:
+    return settings_path().parent / "result_cache.sqlite3"
+
+
+def concurrency_state_path() -> Path:
+    return settings_path().parent / "concurrency.json"
+
+
+def telemetry_path() -> Path:
+    return settings_path().parent / "telemetry.jsonl"
+
+
+def spend_path() -> Path:
+    return settings_path().parent / "spend.json"
+
+
+def transport_config(settings: AppSettings) -> TransportConfig:
+    return TransportConfig(
+        pool_size=settings.pool_size,
+        keep_alive=settings.keep_alive,
+        gzip_min_bytes=settings.gzip_min_bytes,
+    )
@@ -1,17 +1,21 @@
 from __future__ import annotations
 
+from dataclasses import replace
 from typing import Optional
 
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import (
+    QCheckBox,
     QComboBox,
     QDialog,
     QDialogButtonBox,
+    QDoubleSpinBox,
     QFormLayout,
     QHBoxLayout,
     QLabel,
     QLineEdit,
     QPushButton,
+    QSpinBox,
     QVBoxLayout,
     QWidget,
 )
@@ -26,6 +30,7 @@ class SettingsDialog(QDialog):
         self.setWindowTitle("设置")
         self.setModal(True)
         self.setMinimumWidth(520)
+        self._initial = initial
         self._draft: dict[str, tuple[str, str, str]] = {}
 
         layout = QVBoxLayout(self)
@@ -69,6 +74,135 @@ class SettingsDialog(QDialog):
 
         layout.addLayout(form)
 
+        advanced = QFormLayout()
+        advanced.setHorizontalSpacing(12)
+        advanced.setVerticalSpacing(10)
+
+        self.pool_size = QSpinBox()
+        self.pool_size.setRange(1, 256)
+        self.pool_size.setValue(initial.pool_size)
+        advanced.addRow("连接池大小", self.pool_size)
+
+        self.keep_alive = QCheckBox("复用连接（Keep-Alive）")
+        self.keep_alive.setChecked(initial.keep_alive)
+        advanced.addRow("连接", self.keep_alive)
+
+        self.gzip_kb = QSpinBox()
+        self.gzip_kb.setRange(0, 10240)
+        self.gzip_kb.setSuffix(" KB")
+        self.gzip_kb.setSpecialValueText("关闭")
+        self.gzip_kb.setValue(initial.gzip_min_bytes // 1024)
+        self.gzip_kb.setToolTip("请求体超过该大小时使用 gzip 压缩（需接口支持）")
+        advanced.addRow("gzip 压缩阈值", self.gzip_kb)
+
+        self.stream = QCheckBox("流式输出（边生成边显示结果）")
+        self.stream.setChecked(initial.stream)
+        advanced.addRow("输出", self.stream)
+
+        self.cache_enabled = QCheckBox("复用未改动代码的检测结果")
+        self.cache_enabled.setChecked(initial.cache_enabled)
+        self.cache_max_mb = QSpinBox()
+        self.cache_max_mb.setRange(1, 4096)
+        self.cache_max_mb.setSuffix(" MB")
+        self.cache_max_mb.setValue(initial.cache_max_mb)
+        cache_row = QWidget()
+        cache_row_layout = QHBoxLayout(cache_row)
+        cache_row_layout.setContentsMargins(0, 0, 0, 0)
+        cache_row_layout.setSpacing(8)
+        cache_row_layout.addWidget(self.cache_enabled, 1)
+        cache_row_layout.addWidget(self.cache_max_mb, 0)
+        advanced.addRow("结果缓存", cache_row)
+
+        self.project_mode = QComboBox()
+        self.project_mode.addItem("合并为一次请求", "combined")
+        self.project_mode.addItem("逐文件并行 + 汇总", "per_file")
+        self.project_mode.setCurrentIndex(max(0, self.project_mode.findData(initial.project_mode)))
+        advanced.addRow("多文件模式", self.project_mode)
+
+        self.compaction = QComboBox()
+        self.compaction.addItem("关闭（原样发送）", "off")
+        self.compaction.addItem("去除多余空白", "whitespace")
+        self.compaction.addItem("激进（折叠许可证、长注释、数据表与生成代码）", "aggressive")
+        self.compaction.setCurrentIndex(max(0, self.compaction.findData(initial.compaction)))
+        self.compaction.setToolTip("发送前压缩代码以减少输入 token；本地指标始终基于原始代码计算")
+        advanced.addRow("代码压缩", self.compaction)
+
+        self.max_workers = QSpinBox()
+        self.max_workers.setRange(1, 64)
+        self.max_workers.setValue(initial.max_workers)
+        self.max_workers.setToolTip("最大并发请求数；实际并发会按限流（429）与延迟自动增减")
+        self.reduce_with_model = QCheckBox("用模型汇总跨文件维度")
+        self.reduce_with_model.setChecked(initial.reduce_with_model)
+        workers_row = QWidget()
+        workers_row_layout = QHBoxLayout(workers_row)
+        workers_row_layout.setContentsMargins(0, 0, 0, 0)
+        workers_row_layout.setSpacing(8)
+        workers_row_layout.addWidget(self.max_workers, 0)
+        workers_row_layout.addWidget(self.reduce_with_model, 1)
+        advanced.addRow("并发数", workers_row)
+
+        self.diff_base = QLineEdit(initial.diff_base)
+        self.diff_base.setPlaceholderText("main")
+        self.diff_base.setToolTip("审查 Git 变更时对比的基线分支或提交（git diff 基线...HEAD）")
+        self.diff_context = QSpinBox()
+        self.diff_context.setRange(0, 200)
+        self.diff_context.setSuffix(" 行上下文")
+        self.diff_context.setValue(initial.diff_context)
+        diff_row = QWidget()
+        diff_row_layout = QHBoxLayout(diff_row)
+        diff_row_layout.setContentsMargins(0, 0, 0, 0)
+        diff_row_layout.setSpacing(8)
+        diff_row_layout.addWidget(self.diff_base, 1)
+        diff_row_layout.addWidget(self.diff_context, 0)
+        advanced.addRow("变更审查基线", diff_row)
+
+        self.route_spec = QLineEdit(initial.route_spec)
+        self.route_spec.setPlaceholderText("留空则只用上方厂商；例：deepseek:deepseek-chat, groq:llama-3.3-70b-versatile*0.5")
+        self.route_spec.setToolTip(
+            "逗号分隔的 厂商:模型，可加 *权重；按实时延迟与错误率选择最快的可用端点，出错或超时自动切换。\n"
+            "各厂商的 API Key 与 Base URL 取自其已保存的配置。"
+        )
+        advanced.addRow("多厂商路由", self.route_spec)
+
+        self.hedging = QCheckBox("慢请求对冲")
+        self.hedging.setChecked(initial.hedging)
+        self.hedging.setToolTip("超过近期延迟分位数仍无响应（或流式无首字节）时，再发一个相同请求，先返回有效 JSON 者胜出，另一个被取消")
+        self.hedge_percentile = QSpinBox()
+        self.hedge_percentile.setRange(50, 99)
+        self.hedge_percentile.setPrefix("p")
+        self.hedge_percentile.setValue(initial.hedge_percentile)
+        self.hedge_budget = QSpinBox()
+        self.hedge_budget.setRange(0, 100)
+        self.hedge_budget.setSuffix(" % 预算")
+        self.hedge_budget.setValue(initial.hedge_budget_pct)
+        self.hedge_budget.setToolTip("对冲请求最多占普通请求数的百分比，用于限制额外花费")
+        self.hedge_backup = QLineEdit(initial.hedge_spec)
+        self.hedge_backup.setPlaceholderText("备份 厂商:模型（留空则同一端点）")
+        hedge_row = QWidget()
+        hedge_row_layout = QHBoxLayout(hedge_row)
+        hedge_row_layout.setContentsMargins(0, 0, 0, 0)
+        hedge_row_layout.setSpacing(8)
+        hedge_row_layout.addWidget(self.hedging, 0)
+        hedge_row_layout.addWidget(self.hedge_percentile, 0)
+        hedge_row_layout.addWidget(self.hedge_budget, 0)
+        hedge_row_layout.addWidget(self.hedge_backup, 1)
+        advanced.addRow("尾延迟", hedge_row)
+
+        self.budget_job_soft = _token_spin(initial.budget_job_soft_tokens, "单次提醒 ")
+        self.budget_job_hard = _token_spin(initial.budget_job_hard_tokens, "单次上限 ")
+        self.budget_daily_soft = _usd_spin(initial.budget_daily_soft_usd, "每日提醒 $")
+        self.budget_daily_hard = _usd_spin(initial.budget_daily_hard_usd, "每日上限 $")
+        budget_row = QWidget()
+        budget_row.setToolTip("发送前按预估输入 token 与花费检查：超过提醒值需确认，超过上限则不发送；0 表示不限")
+        budget_row_layout = QHBoxLayout(budget_row)
+        budget_row_layout.setContentsMargins(0, 0, 0, 0)
+        budget_row_layout.setSpacing(8)
+        for widget in (self.budget_job_soft, self.budget_job_hard, self.budget_daily_soft, self.budget_daily_hard):
+            budget_row_layout.addWidget(widget, 1)
+        advanced.addRow("预算", budget_row)
+
+        layout.addLayout(advanced)
+
         info = QLabel(f"配置文件：{settings_path()}")
         info.setStyleSheet("color: #35506B;")
         info.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
@@ -149,9 +283,51 @@ class SettingsDialog(QDialog):
         self.model.setCurrentText(model)
 
     def settings(self) -> AppSettings:
-        return AppSettings(
+        return replace(
+            self._initial,
             provider=str(self.provider.currentData() or "deepseek"),
             api_key=self.api_key.text().strip(),
             base_url=self.base_url.text().strip(),
             model=self.model.currentText().strip(),
+            pool_size=self.pool_size.value(),
+            keep_alive=self.keep_alive.isChecked(),
+            gzip_min_bytes=self.gzip_kb.value() * 1024,
+            stream=self.stream.isChecked(),
+            cache_enabled=self.cache_enabled.isChecked(),
+            cache_max_mb=self.cache_max_mb.value(),
+            project_mode=str(self.project_mode.currentData() or "combined"),
+            compaction=str(self.compaction.currentData() or "whitespace"),
+            max_workers=self.max_workers.value(),
+            reduce_with_model=self.reduce_with_model.isChecked(),
+            diff_base=self.diff_base.text().strip() or "main",
+            diff_context=self.diff_context.value(),
+            route_spec=self.route_spec.text().strip(),
+            hedging=self.hedging.isChecked(),
+            hedge_percentile=self.hedge_percentile.value(),
+            hedge_budget_pct=self.hedge_budget.value(),
+            hedge_spec=self.hedge_backup.text().strip(),
+            budget_job_soft_tokens=self.budget_job_soft.value() * 1000,
+            budget_job_hard_tokens=self.budget_job_hard.value() * 1000,
+            budget_daily_soft_usd=self.budget_daily_soft.value(),
+            budget_daily_hard_usd=self.budget_daily_hard.value(),
         )
+
+
+def _token_spin(tokens: int, prefix: str) -> QSpinBox:
+    spin = QSpinBox()
+    spin.setRange(0, 10000)
+    spin.setPrefix(prefix)
+    spin.setSuffix("k token")
+    spin.setSpecialValueText(f"{prefix}不限")
+    spin.setValue(tokens // 1000)
+    return spin
+
+
+def _usd_spin(usd: float, prefix: str) -> QDoubleSpinBox:
+    spin = QDoubleSpinBox()
+    spin.setRange(0.0, 10000.0)
+    spin.setDecimals(2)
+    spin.setPrefix(prefix)
+    spin.setSpecialValueText(f"{prefix.rstrip('$')}不限")
+    spin.setValue(usd)
+    return spin
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Callable, Generic, TypeVar
+
+from app.cancel import Cancelled, CancelToken
+
+T = TypeVar("T")
+
+Delta = Callable[[str], None]
+
+
+class _Flight(Generic[T]):
+    def __init__(self) -> None:
+        self.future: Future[T] = Future()
+        self.token = CancelToken()
+        self.lock = threading.Lock()
+        self.waiters = 0
+        self.pieces: list[str] = []
+        self.listeners: list[Delta] = []
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight[T]] = {}
+        self._started = 0
+        self._joined = 0
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[CancelToken, Delta], T],
+        on_delta: Delta | None = None,
+        cancel: CancelToken | None = None,
+    ) -> tuple[T, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._started += 1
+            else:
+                self._joined += 1
+            flight.waiters += 1
+        if on_delta is not None:
+            with flight.lock:
+                for piece in flight.pieces:
+                    on_delta(piece)
+                flight.listeners.append(on_delta)
+        if leader:
+            relay = self._relay(flight)
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._run, key, flight, fn, relay), name="single-flight", daemon=True
+            ).start()
+        done = threading.Event()
+        flight.future.add_done_callback(lambda _: done.set())
+        if cancel is not None:
+            cancel.on_cancel(done.set)
+        done.wait()
+        if not flight.future.done():
+            self._leave(key, flight, on_delta)
+            raise Cancelled()
+        return flight.future.result(), not leader
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"started": self._started, "joined": self._joined, "in_flight": len(self._flights)}
+
+    def _relay(self, flight: _Flight[T]) -> Delta:
+        def relay(piece: str) -> None:
+            with flight.lock:
+                flight.pieces.append(piece)
+                for listener in flight.listeners:
+                    listener(piece)
+
+        return relay
+
+    def _run(self, key: str, flight: _Flight[T], fn: Callable[[CancelToken, Delta], T], relay: Delta) -> None:
+        try:
+            result = fn(flight.token, relay)
+        except BaseException as e:
+            flight.future.set_exception(e)
+        else:
+            flight.future.set_result(result)
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def _leave(self, key: str, flight: _Flight[T], on_delta: Delta | None) -> None:
+        if on_delta is not None:
+            with flight.lock:
+                if on_delta in flight.listeners:
+                    flight.listeners.remove(on_delta)
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters > 0:
+                return
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.token.cancel()
+
+
+def format_flight_stats(stats: dict[str, int]) -> str:
+    if not stats["joined"]:
+        return ""
+    return f"合并重复请求 {stats['joined']}（实际发出 {stats['started']}）"
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+from app.api_client import DeepSeekResponse, cached_prompt_tokens, estimate_prompt_tokens
+from app.providers import model_price
+from app.settings import AppSettings
+from app.tokens import estimate_tokens
+
+KEEP_DAYS = 62
+COMPLETION_ESTIMATE_TOKENS = 1200
+
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class SpendTotals:
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    unpriced: int = 0
+    estimated: int = 0
+
+    def add(self, other: SpendTotals) -> None:
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+
+@dataclass(frozen=True)
+class SpendEstimate:
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float | None
+
+
+@dataclass(frozen=True)
+class BudgetCheck:
+    level: str
+    reasons: tuple[str, ...] = ()
+
+
+class SpendLedger:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._session: dict[str, SpendTotals] = {}
+        self._days: dict[str, dict[str, SpendTotals]] = {}
+        self._pending: dict[str, dict[str, SpendTotals]] = {}
+
+    def charge(
+        self, provider: str, model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int, estimated: bool
+    ) -> None:
+        price = model_price(provider, model)
+        entry = SpendTotals(
+            requests=1,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=cached_tokens,
+            completion_tokens=completion_tokens,
+            cost=price.cost(prompt_tokens, completion_tokens, cached_tokens) if price is not None else 0.0,
+            unpriced=0 if price is not None else 1,
+            estimated=1 if estimated else 0,
+        )
+        key = provider or "custom"
+        with self._lock:
+            self._session.setdefault(key, SpendTotals()).add(entry)
+            self._days.setdefault(date.today().isoformat(), {}).setdefault(key, SpendTotals()).add(entry)
+            self._pending.setdefault(date.today().isoformat(), {}).setdefault(key, SpendTotals()).add(entry)
+
+    def charge_response(
+        self, provider: str, model: str, resp: DeepSeekResponse, code: str, language_hint: str, extra_requirements: str
+    ) -> None:
+        usage = resp.usage
+        if isinstance(usage.get("prompt_tokens"), (int, float)):
+            self.charge(
+                provider,
+                model,
+                int(usage["prompt_tokens"]),
+                cached_prompt_tokens(usage),
+                _usage_int(usage, "completion_tokens"),
+                estimated=False,
+            )
+            return
+        prompt = estimate_prompt_tokens(code, language_hint, extra_requirements)
+        self.charge(provider, model, prompt, 0, estimate_tokens(resp.content_text), estimated=True)
+
+    def session(self) -> dict[str, SpendTotals]:
+        with self._lock:
+            return {k: SpendTotals(**vars(v)) for k, v in self._session.items()}
+
+    def today(self) -> dict[str, SpendTotals]:
+        with self._lock:
+            return {k: SpendTotals(**vars(v)) for k, v in self._days.get(date.today().isoformat(), {}).items()}
+
+    def today_cost(self) -> float:
+        return sum(t.cost for t in self.today().values())
+
+    def enforce(self, daily_hard_usd: float) -> None:
+        if daily_hard_usd > 0 and self.today_cost() >= daily_hard_usd:
+            raise BudgetExceeded(f"今日花费已达上限 {_usd(daily_hard_usd)}，请求未发出")
+
+    def load(self, path: Path) -> None:
+        days = _read_days(path)
+        with self._lock:
+            _merge(self._days, days)
+
+    def save(self, path: Path) -> None:
+        cutoff = (date.today() - timedelta(days=KEEP_DAYS)).isoformat()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with _file_lock(path.with_name(path.name + ".lock")):
+                days = _read_days(path)
+                _merge(days, pending)
+                days = {d: rows for d, rows in days.items() if d >= cutoff}
+                data = {"days": {d: {p: vars(t) for p, t in rows.items()} for d, rows in days.items()}}
+                tmp = path.with_name(path.name + ".tmp")
+                tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, path)
+        except OSError:
+            with self._lock:
+                _merge(self._pending, pending)
+            return
+        with self._lock:
+            _merge(days, self._pending)
+            self._days = days
+
+
+def _read_days(path: Path) -> dict[str, dict[str, SpendTotals]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    days = data.get("days") if isinstance(data, dict) else None
+    if not isinstance(days, dict):
+        return {}
+    fields = set(vars(SpendTotals()))
+    result: dict[str, dict[str, SpendTotals]] = {}
+    for day, providers in days.items():
+        if not isinstance(providers, dict):
+            continue
+        for provider, row in providers.items():
+            if not isinstance(row, dict):
+                continue
+            totals = SpendTotals(**{k: v for k, v in row.items() if k in fields and isinstance(v, (int, float))})
+            result.setdefault(day, {}).setdefault(provider, SpendTotals()).add(totals)
+    return result
+
+
+def _merge(into: dict[str, dict[str, SpendTotals]], days: dict[str, dict[str, SpendTotals]]) -> None:
+    for day, rows in days.items():
+        for provider, totals in rows.items():
+            into.setdefault(day, {}).setdefault(provider, SpendTotals()).add(totals)
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    with open(path, "a+b") as f:
+        if sys.platform == "win32":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def estimate_spend(settings: AppSettings, prompts: list[tuple[str, str, str]], extra_requests: int = 0) -> SpendEstimate:
+    provider, model = settings.provider, settings.model
+    if settings.routes:
+        provider, model = settings.routes[0].provider, settings.routes[0].model
+    prompt_tokens = sum(estimate_prompt_tokens(code, hint, extra) for code, hint, extra in prompts)
+    requests = len(prompts) + extra_requests
+    completion_tokens = requests * COMPLETION_ESTIMATE_TOKENS
+    price = model_price(provider, model)
+    cost = price.cost(prompt_tokens, completion_tokens) if price is not None else None
+    return SpendEstimate(requests=requests, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cost=cost)
+
+
+def check_budget(settings: AppSettings, estimate: SpendEstimate, ledger: SpendLedger) -> BudgetCheck:
+    spent = ledger.today_cost()
+    projected = spent + (estimate.cost or 0.0)
+
+    def over(tokens_limit: int, cost_limit: float, name: str) -> list[str]:
+        reasons = []
+        if tokens_limit > 0 and estimate.prompt_tokens > tokens_limit:
+            reasons.append(f"预计输入 {estimate.prompt_tokens} token，超过单次{name} {tokens_limit}")
+        if cost_limit > 0 and estimate.cost is not None and projected > cost_limit:
+            reasons.append(f"今日已花费 {_usd(spent)}，本次预计 {_usd(estimate.cost)}，将超过每日{name} {_usd(cost_limit)}")
+        elif cost_limit > 0 and spent >= cost_limit:
+            reasons.append(f"今日已花费 {_usd(spent)}，已达每日{name} {_usd(cost_limit)}")
+        return reasons
+
+    hard = over(settings.budget_job_hard_tokens, settings.budget_daily_hard_usd, "上限")
+    if hard:
+        return BudgetCheck("hard", tuple(hard))
+    soft = over(settings.budget_job_soft_tokens, settings.budget_daily_soft_usd, "提醒值")
+    if soft:
+        return BudgetCheck("soft", tuple(soft))
+    return BudgetCheck("ok")
+
+
+def _usd(amount: float) -> str:
+    return f"${amount:.2f}" if amount >= 1 else f"${amount:.4f}"
+
+
+def format_estimate(estimate: SpendEstimate) -> str:
+    cost = f"约 {_usd(estimate.cost)}" if estimate.cost is not None else "价格未知"
+    return (
+        f"预计 {estimate.requests} 次请求，输入约 {estimate.prompt_tokens} token，"
+        f"输出约 {estimate.completion_tokens} token，{cost}（未计缓存命中）"
+    )
+
+
+def format_spend(ledger: SpendLedger) -> str:
+    lines = []
+    for title, rows in (("本次会话", ledger.session()), ("今日", ledger.today())):
+        if not rows:
+            continue
+        total = SpendTotals()
+        for t in rows.values():
+            total.add(t)
+        per = "  ".join(f"{p} {_usd(t.cost)}" for p, t in sorted(rows.items()))
+        note = f"（{total.unpriced} 次无价格）" if total.unpriced else ""
+        lines.append(
+            f"{title}花费：{_usd(total.cost)}{note}  请求 {total.requests}  "
+            f"token 输入 {total.prompt_tokens}（缓存 {total.cached_tokens}）/输出 {total.completion_tokens}  {per}"
+        )
+    return "\n".join(lines)
+
+
+def _usage_int(usage: dict[str, Any], name: str) -> int:
+    value = usage.get(name)
+    return int(value) if isinstance(value, (int, float)) else 0
+
+
+_LEDGER = SpendLedger()
+
+
+def get_ledger() -> SpendLedger:
+    return _LEDGER
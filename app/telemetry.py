@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+MAX_FILE_BYTES = 4 * 1024 * 1024
+BACKUP_FILES = 3
+RECENT_RECORDS = 1000
+
+
+@dataclass(frozen=True)
+class RequestRecord:
+    provider: str
+    model: str
+    host: str
+    stream: bool
+    status: str
+    http_status: int = 0
+    error: str = ""
+    retries: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    phases: dict[str, float] = field(default_factory=dict)
+    ts: float = field(default_factory=time.time)
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider or self.host}:{self.model}"
+
+
+class Telemetry:
+    def __init__(self, path: Path | None = None, max_bytes: int = MAX_FILE_BYTES, backups: int = BACKUP_FILES) -> None:
+        self._lock = threading.Lock()
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._recent: deque[RequestRecord] = deque(maxlen=RECENT_RECORDS)
+        self._seq = 0
+
+    @property
+    def path(self) -> Path | None:
+        return self._path
+
+    def configure(self, path: Path | None) -> None:
+        with self._lock:
+            self._path = path
+
+    def record(self, record: RequestRecord) -> None:
+        line = json.dumps(asdict(record), ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._recent.append(record)
+            self._seq += 1
+            if self._path is None:
+                return
+            try:
+                self._write(line.encode("utf-8"))
+            except OSError:
+                pass
+
+    def mark(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def since(self, mark: int) -> list[RequestRecord]:
+        with self._lock:
+            count = min(len(self._recent), self._seq - mark)
+            return list(self._recent)[len(self._recent) - count :] if count > 0 else []
+
+    def recent(self) -> list[RequestRecord]:
+        with self._lock:
+            return list(self._recent)
+
+    def _write(self, data: bytes) -> None:
+        path = self._path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size and size + len(data) > self._max_bytes:
+            for i in range(self._backups, 0, -1):
+                src = path if i == 1 else path.with_name(f"{path.name}.{i - 1}")
+                if src.exists():
+                    src.replace(path.with_name(f"{path.name}.{i}"))
+        with open(path, "ab") as f:
+            f.write(data)
+
+
+def _avg(values: list[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def _phase(records: list[RequestRecord], name: str) -> list[float]:
+    return [r.phases[name] for r in records if name in r.phases]
+
+
+def format_request_summary(records: list[RequestRecord]) -> str:
+    if not records:
+        return ""
+    ok = [r for r in records if r.status == "ok"]
+    failed = sum(1 for r in records if r.status == "error")
+    parts = [f"请求 {len(records)} 次" + (f"（失败 {failed}）" if failed else "")]
+    if ok:
+        parts.append(f"首字节 {_avg(_phase(ok, 'ttfb_ms')) / 1000:.1f}s  总耗时 {_avg(_phase(ok, 'total_ms')) / 1000:.1f}s")
+    setups = [sum(r.phases.get(k, 0.0) for k in ("dns_ms", "connect_ms", "tls_ms")) for r in records if "connect_ms" in r.phases]
+    if setups:
+        parts.append(f"新建连接 {len(setups)}（平均 {_avg(setups):.0f}ms）")
+    retries = sum(r.retries for r in records)
+    if retries:
+        parts.append(f"重试 {retries}")
+    prompt = sum(r.prompt_tokens for r in records)
+    if prompt:
+        cached = sum(r.cached_tokens for r in records)
+        completion = sum(r.completion_tokens for r in records)
+        parts.append(f"token 输入 {prompt}（缓存 {cached}）/输出 {completion}")
+    sent = sum(r.request_bytes for r in records)
+    received = sum(r.response_bytes for r in records)
+    parts.append(f"上行 {sent / 1024:.1f}KB/下行 {received / 1024:.1f}KB")
+    return "  ".join(parts)
+
+
+def format_telemetry_by_model(records: list[RequestRecord]) -> str:
+    groups: dict[str, list[RequestRecord]] = {}
+    for r in records:
+        groups.setdefault(r.label, []).append(r)
+    lines = []
+    for label, rows in sorted(groups.items()):
+        ok = [r for r in rows if r.status == "ok"]
+        totals = sorted(_phase(ok, "total_ms"))
+        p95 = totals[min(len(totals) - 1, int(0.95 * len(totals)))] / 1000 if totals else 0.0
+        failed = sum(1 for r in rows if r.status == "error")
+        lines.append(
+            f"{label}  请求 {len(rows)}  失败 {failed}  "
+            f"首字节 {_avg(_phase(ok, 'ttfb_ms')) / 1000:.1f}s  p95 {p95:.1f}s  "
+            f"token {sum(r.prompt_tokens for r in rows)}/{sum(r.completion_tokens for r in rows)}"
+        )
+    return "\n".join(lines)
+
+
+_TELEMETRY = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    return _TELEMETRY
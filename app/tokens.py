@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+import math
+
+ASCII_CHARS_PER_TOKEN = 3.6
+NON_ASCII_TOKENS_PER_CHAR = 1.0
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    n_chars = len(text)
+    n_bytes = len(text.encode("utf-8"))
+    if n_bytes == n_chars:
+        return math.ceil(n_chars / ASCII_CHARS_PER_TOKEN)
+    non_ascii = min(n_chars, (n_bytes - n_chars + 1) // 2)
+    ascii_chars = n_chars - non_ascii
+    return math.ceil(ascii_chars / ASCII_CHARS_PER_TOKEN + non_ascii * NON_ASCII_TOKENS_PER_CHAR)
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import gzip
+import json
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError
+from urllib3.util.connection import allowed_gai_family
+
+from app.cancel import CancelToken
+
+_phases = threading.local()
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    pool_size: int = 16
+    keep_alive: bool = True
+    gzip_min_bytes: int = 0
+
+
+@dataclass
+class _HostCounters:
+    requests: int = 0
+    errors: int = 0
+    bytes_sent: int = 0
+    bytes_saved: int = 0
+    retries: int = 0
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+class _Abort:
+    def __init__(self, conn: HTTPConnection) -> None:
+        self._lock = threading.Lock()
+        self._conn: HTTPConnection | None = conn
+
+    def __call__(self) -> None:
+        with self._lock:
+            sock = self._conn.sock if self._conn is not None else None
+            if sock is None:
+                return
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def disarm(self) -> None:
+        with self._lock:
+            self._conn = None
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    _abort: _Abort | None = None
+
+    def request(self, method: str, url: str, body: Any = None, headers: Any = None, **kwargs: Any) -> None:
+        cancel = getattr(_phases, "cancel", None)
+        if cancel is None:
+            return super().request(method, url, body=body, headers=headers, **kwargs)
+        cancel.raise_if_cancelled()
+        self._disarm()
+        self._abort = _Abort(self)
+        cancel.on_cancel(self._abort)
+        try:
+            super().request(method, url, body=body, headers=headers, **kwargs)
+        except BaseException:
+            self._disarm()
+            raise
+
+    def getresponse(self) -> Any:
+        try:
+            return super().getresponse()
+        except BaseException:
+            self._disarm()
+            raise
+
+    def close(self) -> None:
+        self._disarm()
+        super().close()
+
+    def _disarm(self) -> None:
+        abort, self._abort = self._abort, None
+        if abort is not None:
+            abort.disarm()
+
+    def _new_conn(self) -> socket.socket:
+        timings = getattr(_phases, "timings", None)
+        if timings is None:
+            return super()._new_conn()
+        host = self._dns_host
+        started = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host.strip("[]"), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        timings["dns_ms"] = _ms(started)
+        connected = time.perf_counter()
+        error: ConnectTimeoutError | None = None
+        try:
+            for address in dict.fromkeys(info[4][0] for info in infos):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                except ConnectTimeoutError as e:
+                    error = e
+                    continue
+                timings["connect_ms"] = _ms(connected)
+                return sock
+        finally:
+            self._dns_host = host
+        if error is None:
+            return super()._new_conn()
+        raise error
+
+
+class _TimedHTTPSConnection(_TimedHTTPConnection, HTTPSConnection):
+    def connect(self) -> None:
+        timings = getattr(_phases, "timings", None)
+        started = time.perf_counter()
+        super().connect()
+        if timings is not None and "connect_ms" in timings:
+            timings["tls_ms"] = max(0.0, round(_ms(started) - timings["dns_ms"] - timings["connect_ms"], 1))
+
+
+class _DisarmOnReturn:
+    def _put_conn(self, conn: Any) -> None:
+        if isinstance(conn, _TimedHTTPConnection):
+            conn._disarm()
+        super()._put_conn(conn)  # type: ignore[misc]
+
+
+class _TimedHTTPPool(_DisarmOnReturn, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSPool(_DisarmOnReturn, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPPool, "https": _TimedHTTPSPool}
+
+
+def host_key(url: str) -> str:
+    p = urlparse((url or "").strip())
+    if not p.scheme or not p.netloc:
+        raise ValueError("Base URL 不能为空")
+    return f"{p.scheme.lower()}://{p.netloc.lower()}"
+
+
+class Transport:
+    def __init__(self, config: TransportConfig | None = None) -> None:
+        self._config = config or TransportConfig()
+        self._lock = threading.Lock()
+        self._sessions: dict[str, requests.Session] = {}
+        self._counters: dict[str, _HostCounters] = {}
+
+    @property
+    def config(self) -> TransportConfig:
+        return self._config
+
+    def configure(self, config: TransportConfig) -> None:
+        with self._lock:
+            if config == self._config:
+                return
+            self._config = config
+            old = list(self._sessions.values())
+            self._sessions = {}
+        for s in old:
+            s.close()
+
+    def session_for(self, url: str) -> requests.Session:
+        key = host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._new_session()
+                self._sessions[key] = session
+                self._counters.setdefault(key, _HostCounters())
+            return session
+
+    def _new_session(self) -> requests.Session:
+        size = max(1, int(self._config.pool_size))
+        adapter = _TimedAdapter(pool_connections=1, pool_maxsize=size, max_retries=0)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self._config.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        body: bytes | None = None,
+        timeout: float | tuple[float, float] | None = None,
+        stream: bool = False,
+        timings: dict[str, float] | None = None,
+        cancel: CancelToken | None = None,
+    ) -> requests.Response:
+        session = self.session_for(url)
+        key = host_key(url)
+        hdrs = dict(headers or {})
+        data = body
+        saved = 0
+        threshold = self._config.gzip_min_bytes
+        if data is not None and threshold > 0 and len(data) >= threshold:
+            packed = gzip.compress(data, compresslevel=5)
+            if len(packed) < len(data):
+                saved = len(data) - len(packed)
+                data = packed
+                hdrs["Content-Encoding"] = "gzip"
+        if timings is not None:
+            timings.clear()
+            timings["request_bytes"] = len(data or b"")
+        _phases.timings = timings
+        _phases.cancel = cancel
+        started = time.perf_counter()
+        if timings is not None:
+            timings["sent_at"] = started
+        try:
+            resp = session.request(method, url, headers=hdrs, data=data, timeout=timeout, stream=stream)
+        except Exception:
+            self._count(key, sent=len(data or b""), saved=saved, error=True)
+            raise
+        finally:
+            _phases.timings = None
+            _phases.cancel = None
+        if timings is not None:
+            timings["ttfb_ms"] = _ms(started)
+            timings["status"] = resp.status_code
+        self._count(key, sent=len(data or b""), saved=saved, error=False)
+        return resp
+
+    def post_json(
+        self,
+        url: str,
+        payload: Any,
+        *,
+        headers: dict[str, str] | None = None,
+        timeout: float | tuple[float, float] | None = None,
+        stream: bool = False,
+        timings: dict[str, float] | None = None,
+        cancel: CancelToken | None = None,
+    ) -> requests.Response:
+        hdrs = {"Content-Type": "application/json", **(headers or {})}
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        return self.request(
+            "POST", url, headers=hdrs, body=body, timeout=timeout, stream=stream, timings=timings, cancel=cancel
+        )
+
+    def get(
+        self, url: str, *, headers: dict[str, str] | None = None, timeout: float | tuple[float, float] | None = None
+    ) -> requests.Response:
+        return self.request("GET", url, headers=headers, timeout=timeout)
+
+    def _count(self, key: str, sent: int, saved: int, error: bool) -> None:
+        with self._lock:
+            c = self._counters.setdefault(key, _HostCounters())
+            c.requests += 1
+            c.bytes_sent += sent
+            c.bytes_saved += saved
+            if error:
+                c.errors += 1
+
+    def count_retry(self, url: str) -> None:
+        key = host_key(url)
+        with self._lock:
+            self._counters.setdefault(key, _HostCounters()).retries += 1
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        out: dict[str, dict[str, int]] = {}
+        with self._lock:
+            sessions = dict(self._sessions)
+            counters = {k: _HostCounters(**vars(v)) for k, v in self._counters.items()}
+        for key, c in counters.items():
+            row = {
+                "requests": c.requests,
+                "errors": c.errors,
+                "retries": c.retries,
+                "bytes_sent": c.bytes_sent,
+                "bytes_saved": c.bytes_saved,
+                "connections_opened": 0,
+                "idle_connections": 0,
+                "pool_size": self._config.pool_size,
+            }
+            session = sessions.get(key)
+            adapter = session.get_adapter(key + "/") if session is not None else None
+            manager = getattr(adapter, "poolmanager", None)
+            pools = getattr(manager, "pools", None)
+            if pools is not None:
+                for pool_key in list(pools.keys()):
+                    pool = pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    row["connections_opened"] += int(getattr(pool, "num_connections", 0))
+                    q = getattr(pool, "pool", None)
+                    row["idle_connections"] += sum(1 for conn in list(getattr(q, "queue", [])) if conn is not None)
+            out[key] = row
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            old = list(self._sessions.values())
+            self._sessions = {}
+        for s in old:
+            s.close()
+
+
+_TRANSPORT = Transport()
+
+
+def get_transport() -> Transport:
+    return _TRANSPORT
+
+
+def configure_transport(config: TransportConfig) -> None:
+    _TRANSPORT.configure(config)
+
+
+def format_pool_stats(stats: dict[str, dict[str, int]]) -> str:
+    lines = []
+    for key, row in sorted(stats.items()):
+        reused = max(0, row["requests"] - row["connections_opened"])
+        lines.append(
+            f"{key}  请求 {row['requests']}  新建连接 {row['connections_opened']}  复用 {reused}  "
+            f"空闲 {row['idle_connections']}/{row['pool_size']}  失败 {row['errors']}  重试 {row['retries']}"
+        )
+    return "\n".join(lines)
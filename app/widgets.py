@@ -1,22 +1,29 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 
-from PyQt6.QtCore import QEvent, Qt, pyqtSignal
-from PyQt6.QtGui import QColor, QFont, QPainter, QPen
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QObject, QRect, QRectF, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QImage, QPainter, QPen, QPixmap, QTextDocument
 from PyQt6.QtWidgets import (
     QApplication,
     QFrame,
-    QGraphicsDropShadowEffect,
-    QHBoxLayout,
-    QLabel,
+    QHeaderView,
+    QListView,
     QMenu,
     QPlainTextEdit,
-    QProgressBar,
-    QVBoxLayout,
+    QStyle,
+    QStyledItemDelegate,
+    QStyleOptionViewItem,
+    QTableView,
     QWidget,
 )
 
+from app.file_icons import pixmap_for_file
+
 
 def score_color(score: int) -> str:
     if score >= 85:
@@ -30,194 +37,60 @@ def score_color(score: int) -> str:
     return "#EF4444"
 
 
-class CardWidget(QFrame):
-    def __init__(self, title: str, parent: Optional[QWidget] = None) -> None:
-        super().__init__(parent)
-        self.setObjectName("card")
-        self.setStyleSheet(
-            """
-            QFrame#card {
-                background: #FFFFFF;
-                border: 1px solid #CFE3F7;
-                border-radius: 14px;
-            }
-            """
-        )
-        shadow = QGraphicsDropShadowEffect(self)
-        shadow.setBlurRadius(22)
-        shadow.setOffset(0, 6)
-        shadow.setColor(QColor(0, 0, 0, 30))
-        self.setGraphicsEffect(shadow)
-
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(14, 12, 14, 12)
-        layout.setSpacing(10)
-
-        header = QHBoxLayout()
-        header.setSpacing(10)
-        self.title_label = QLabel(title)
-        font = QFont()
-        font.setPointSize(12)
-        font.setBold(True)
-        self.title_label.setFont(font)
-        self.title_label.setWordWrap(True)
-        header.addWidget(self.title_label, 1)
-        self.badge_label = QLabel("")
-        self.badge_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.badge_label.setMinimumWidth(54)
-        self.badge_label.setStyleSheet(
-            "background: #EEF6FF; border: 1px solid #CFE3F7; border-radius: 10px; padding: 4px 8px;"
-        )
-        header.addWidget(self.badge_label, 0)
-        layout.addLayout(header)
-
-        self.body = QVBoxLayout()
-        self.body.setSpacing(8)
-        layout.addLayout(self.body)
-
-    def set_badge(self, text: str, color: str = "#111111") -> None:
-        self.badge_label.setText(text)
-        self.badge_label.setStyleSheet(
-            f"background: #EEF6FF; border: 1px solid #CFE3F7; border-radius: 10px; padding: 4px 8px; color: {color};"
-        )
-
-    def add_paragraph(self, text: str) -> QLabel:
-        label = QLabel(text)
-        label.setWordWrap(True)
-        label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-        self.body.addWidget(label)
-        return label
-
-    def add_list(self, items: list[str], prefix: str = "• ") -> QLabel:
-        if not items:
-            label = QLabel("（无）")
-            self.body.addWidget(label)
-            return label
-        html = "<br/>".join([f"{prefix}{_escape(x)}" for x in items])
-        label = QLabel(html)
-        label.setWordWrap(True)
-        label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-        self.body.addWidget(label)
-        return label
-
-
-class ScoreBar(QWidget):
-    def __init__(self, label: str, score: int, parent: Optional[QWidget] = None) -> None:
-        super().__init__(parent)
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(6)
-        self.name = QLabel(label)
-        self.name.setWordWrap(True)
-        layout.addWidget(self.name)
-        row = QHBoxLayout()
-        row.setSpacing(10)
-        self.bar = QProgressBar()
-        self.bar.setRange(0, 100)
-        self.bar.setValue(max(0, min(100, int(score))))
-        self.bar.setTextVisible(False)
-        self.bar.setFixedHeight(10)
-        color = score_color(score)
-        self.bar.setStyleSheet(
-            f"""
-            QProgressBar {{
-                background: #EEF6FF;
-                border: 1px solid #CFE3F7;
-                border-radius: 6px;
-            }}
-            QProgressBar::chunk {{
-                background: {color};
-                border-radius: 6px;
-            }}
-            """
-        )
-        row.addWidget(self.bar, 1)
-        self.value = QLabel(f"{int(score)}")
-        self.value.setMinimumWidth(36)
-        self.value.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-        self.value.setStyleSheet(f"color: {color}; font-weight: 600;")
-        row.addWidget(self.value, 0)
-        layout.addLayout(row)
-
-
-class ColorBarChart(QWidget):
-    def __init__(self, parent: Optional[QWidget] = None) -> None:
-        super().__init__(parent)
-        self._names: list[str] = []
-        self._scores: list[int] = []
-        self.setMinimumHeight(260)
+def paint_score_chart(painter: QPainter, rect: QRect, names: list[str], scores: list[int]) -> None:
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+    painter.setBrush(Qt.BrushStyle.NoBrush)
 
-    def set_data(self, names: list[str], scores: list[int]) -> None:
-        self._names = [str(x) for x in names]
-        self._scores = [max(0, min(100, int(s))) for s in scores]
-        self.update()
+    outer = rect.adjusted(10, 10, -10, -10)
+    painter.fillRect(outer, QColor("#FFFFFF"))
 
-    def paintEvent(self, event) -> None:  # type: ignore[override]
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+    if not names or not scores:
+        painter.setPen(QColor("#35506B"))
+        painter.drawText(outer, Qt.AlignmentFlag.AlignCenter, "无图表数据")
+        return
 
-        outer = self.rect().adjusted(10, 10, -10, -10)
-        painter.fillRect(outer, QColor("#FFFFFF"))
+    n = min(len(names), len(scores))
+    names = names[:n]
+    scores = scores[:n]
 
-        if not self._names or not self._scores:
-            painter.setPen(QColor("#35506B"))
-            painter.drawText(outer, Qt.AlignmentFlag.AlignCenter, "无图表数据")
-            return
+    fm = painter.fontMetrics()
+    label_w = min(220, max(80, max(fm.horizontalAdvance(x) for x in names) + 8))
+    value_w = 42
+    gap = 10
 
-        n = min(len(self._names), len(self._scores))
-        names = self._names[:n]
-        scores = self._scores[:n]
+    chart_rect = outer.adjusted(label_w + gap, 8, -value_w - gap, -8)
+    row_h = max(24, int(chart_rect.height() / max(1, n)))
+    bar_h = max(10, int(row_h * 0.45))
 
-        fm = painter.fontMetrics()
-        label_w = min(220, max(80, max(fm.horizontalAdvance(x) for x in names) + 8))
-        value_w = 42
-        gap = 10
+    grid_pen = QPen(QColor("#D8E9FB"))
+    grid_pen.setWidth(1)
+    painter.setPen(grid_pen)
+    for t in [0, 50, 100]:
+        x = chart_rect.left() + int(chart_rect.width() * (t / 100))
+        painter.drawLine(x, chart_rect.top(), x, chart_rect.bottom())
 
-        chart_rect = outer.adjusted(label_w + gap, 8, -value_w - gap, -8)
-        row_h = max(24, int(chart_rect.height() / max(1, n)))
-        bar_h = max(10, int(row_h * 0.45))
+    for i, (name, score) in enumerate(zip(names, scores)):
+        y = chart_rect.top() + i * row_h + int((row_h - bar_h) / 2)
 
-        grid_pen = QPen(QColor("#D8E9FB"))
-        grid_pen.setWidth(1)
-        painter.setPen(grid_pen)
-        for t in [0, 50, 100]:
-            x = chart_rect.left() + int(chart_rect.width() * (t / 100))
-            painter.drawLine(x, chart_rect.top(), x, chart_rect.bottom())
+        painter.setPen(QColor("#111111"))
+        painter.drawText(outer.left(), y, label_w, bar_h, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, name)
 
-        for i, (name, score) in enumerate(zip(names, scores)):
-            y = chart_rect.top() + i * row_h + int((row_h - bar_h) / 2)
+        bar_w = int(chart_rect.width() * (score / 100))
+        color = QColor(score_color(score))
+        painter.fillRect(chart_rect.left(), y, bar_w, bar_h, color)
 
-            painter.setPen(QColor("#111111"))
-            painter.drawText(outer.left(), y, label_w, bar_h, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, name)
+        painter.setPen(QColor("#BFD9F2"))
+        painter.drawRect(chart_rect.left(), y, chart_rect.width(), bar_h)
 
-            bar_w = int(chart_rect.width() * (score / 100))
-            color = QColor(score_color(score))
-            painter.fillRect(chart_rect.left(), y, bar_w, bar_h, color)
-
-            painter.setPen(QColor("#BFD9F2"))
-            painter.drawRect(chart_rect.left(), y, chart_rect.width(), bar_h)
-
-            painter.setPen(color)
-            painter.drawText(
-                chart_rect.right() + gap,
-                y,
-                value_w,
-                bar_h,
-                Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignRight,
-                str(score),
-            )
-
-
-class CategoryChart(QWidget):
-    def __init__(self, parent: Optional[QWidget] = None) -> None:
-        super().__init__(parent)
-        root = QVBoxLayout(self)
-        root.setContentsMargins(0, 0, 0, 0)
-        self._chart = ColorBarChart(self)
-        root.addWidget(self._chart)
-
-    def set_data(self, names: list[str], scores: list[int]) -> None:
-        self._chart.set_data(names, scores)
+        painter.setPen(color)
+        painter.drawText(
+            chart_rect.right() + gap,
+            y,
+            value_w,
+            bar_h,
+            Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignRight,
+            str(score),
+        )
 
 
 class CodeEditor(QPlainTextEdit):
@@ -252,84 +125,466 @@ def _escape(text: str) -> str:
     )
 
 
-class FileCardWidget(QFrame):
-    clicked = pyqtSignal(str)
-    remove_requested = pyqtSignal(str)
+FILE_ID_ROLE = Qt.ItemDataRole.UserRole + 1
+
 
-    def __init__(self, file_id: str, title: str, icon, parent: Optional[QWidget] = None) -> None:
+class FileListModel(QAbstractListModel):
+    def __init__(self, parent: Optional[QObject] = None) -> None:
         super().__init__(parent)
-        self._file_id = file_id
-        self.setObjectName("fileCard")
-        self.setCursor(Qt.CursorShape.PointingHandCursor)
-        self.setSizePolicy(self.sizePolicy().horizontalPolicy(), self.sizePolicy().verticalPolicy())
-        self.setStyleSheet(
-            """
-            QFrame#fileCard {
-                background: #FFFFFF;
-                border: 1px solid #CFE3F7;
-                border-radius: 12px;
-            }
-            QFrame#fileCard[selected="true"] {
-                background: #E6F2FF;
-                border: 1px solid #76B2F5;
-            }
-            """
-        )
+        self._paths: list[Path] = []
+        self._rows: dict[str, int] = {}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # type: ignore[override]
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):  # type: ignore[override]
+        if not index.isValid() or not (0 <= index.row() < len(self._paths)):
+            return None
+        path = self._paths[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return path.name
+        if role == Qt.ItemDataRole.DecorationRole:
+            return pixmap_for_file(path, 18)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return str(path)
+        if role == FILE_ID_ROLE:
+            return str(path)
+        return None
+
+    def add_paths(self, paths: list[Path]) -> None:
+        fresh = [p for p in paths if str(p) not in self._rows]
+        if not fresh:
+            return
+        first = len(self._paths)
+        self.beginInsertRows(QModelIndex(), first, first + len(fresh) - 1)
+        for offset, p in enumerate(fresh):
+            self._rows[str(p)] = first + offset
+            self._paths.append(p)
+        self.endInsertRows()
+
+    def remove_path(self, file_id: str) -> None:
+        row = self._rows.get(file_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._paths[row]
+        self._rows = {str(p): i for i, p in enumerate(self._paths)}
+        self.endRemoveRows()
 
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(12, 10, 12, 10)
-        layout.setSpacing(10)
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._paths = []
+        self._rows = {}
+        self.endResetModel()
 
-        icon_box = QFrame(self)
-        icon_box.setObjectName("iconBox")
-        icon_box.setFixedSize(28, 28)
-        icon_box.setStyleSheet(
-            "QFrame#iconBox { background: transparent; border: 1px solid #76B2F5; border-radius: 6px; }"
-        )
-        ib_layout = QHBoxLayout(icon_box)
-        ib_layout.setContentsMargins(4, 4, 4, 4)
-        ib_layout.setSpacing(0)
-        self.icon_label = QLabel(icon_box)
-        self.icon_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.icon_label.setPixmap(icon.pixmap(18, 18))
-        ib_layout.addWidget(self.icon_label, 1)
-        layout.addWidget(icon_box, 0)
-
-        self.title_label = QLabel(title, self)
-        self.title_label.setWordWrap(False)
-        self.title_label.setTextInteractionFlags(Qt.TextInteractionFlag.NoTextInteraction)
-        self.title_label.setContextMenuPolicy(Qt.ContextMenuPolicy.NoContextMenu)
-        self.title_label.installEventFilter(self)
-        layout.addWidget(self.title_label, 1)
-
-        self.set_selected(False)
-
-    def set_selected(self, selected: bool) -> None:
-        self.setProperty("selected", "true" if selected else "false")
-        self.style().unpolish(self)
-        self.style().polish(self)
-
-    def mousePressEvent(self, event) -> None:  # type: ignore[override]
-        if event.button() == Qt.MouseButton.LeftButton:
-            self.clicked.emit(self._file_id)
-        super().mousePressEvent(event)
-
-    def contextMenuEvent(self, event) -> None:  # type: ignore[override]
-        self._show_context_menu(event.globalPos())
-
-    def eventFilter(self, obj, event) -> bool:  # type: ignore[override]
-        if obj is self.title_label and event.type() == QEvent.Type.ContextMenu:
-            self._show_context_menu(event.globalPos())
-            return True
-        return super().eventFilter(obj, event)
-
-    def _show_context_menu(self, global_pos) -> None:
+    def index_of(self, file_id: str) -> QModelIndex:
+        row = self._rows.get(file_id)
+        return self.index(row, 0) if row is not None else QModelIndex()
+
+
+class FileItemDelegate(QStyledItemDelegate):
+    ROW_HEIGHT = 48
+    SPACING = 8
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._fill = QColor("#FFFFFF")
+        self._border = QPen(QColor("#CFE3F7"))
+        self._selected_fill = QColor("#E6F2FF")
+        self._selected_border = QPen(QColor("#76B2F5"))
+        self._icon_border = QPen(QColor("#76B2F5"))
+        self._text = QColor("#111111")
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:  # type: ignore[override]
+        return QSize(0, self.ROW_HEIGHT + self.SPACING)
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:  # type: ignore[override]
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        rect = QRectF(option.rect.adjusted(1, self.SPACING // 2, -1, -self.SPACING // 2))
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        painter.setPen(self._selected_border if selected else self._border)
+        painter.setBrush(self._selected_fill if selected else self._fill)
+        painter.drawRoundedRect(rect, 12, 12)
+
+        icon_rect = QRectF(rect.left() + 12, rect.center().y() - 14, 28, 28)
+        painter.setPen(self._icon_border)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawRoundedRect(icon_rect, 6, 6)
+        pixmap = index.data(Qt.ItemDataRole.DecorationRole)
+        if isinstance(pixmap, QPixmap) and not pixmap.isNull():
+            painter.drawPixmap(int(icon_rect.left()) + 5, int(icon_rect.top()) + 5, pixmap)
+
+        text_rect = rect.adjusted(12 + 28 + 10, 0, -12, 0)
+        name = str(index.data(Qt.ItemDataRole.DisplayRole) or "")
+        painter.setPen(self._text)
+        painter.setFont(option.font)
+        elided = option.fontMetrics.elidedText(name, Qt.TextElideMode.ElideMiddle, int(text_rect.width()))
+        painter.drawText(text_rect, int(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft), elided)
+        painter.restore()
+
+
+class FileListView(QListView):
+    file_clicked = pyqtSignal(str)
+    remove_requested = pyqtSignal(str)
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(256)
+        self.setSelectionMode(QListView.SelectionMode.SingleSelection)
+        self.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.setItemDelegate(FileItemDelegate(self))
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._show_context_menu)
+        self.clicked.connect(self._on_clicked)
+
+    def select_file(self, file_id: str) -> None:
+        model = self.model()
+        if not isinstance(model, FileListModel):
+            return
+        index = model.index_of(file_id)
+        if index.isValid():
+            self.setCurrentIndex(index)
+            self.scrollTo(index)
+        else:
+            self.clearSelection()
+
+    def _on_clicked(self, index: QModelIndex) -> None:
+        file_id = index.data(FILE_ID_ROLE)
+        if isinstance(file_id, str):
+            self.file_clicked.emit(file_id)
+
+    def _show_context_menu(self, pos) -> None:
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return
+        file_id = index.data(FILE_ID_ROLE)
         menu = QMenu(self)
         copy_name_action = menu.addAction("复制文件名")
         menu.addSeparator()
         remove_action = menu.addAction("移出检测")
-        action = menu.exec(global_pos)
-        if action == remove_action:
-            self.remove_requested.emit(self._file_id)
+        action = menu.exec(self.viewport().mapToGlobal(pos))
+        if action == remove_action and isinstance(file_id, str):
+            self.remove_requested.emit(file_id)
         elif action == copy_name_action:
-            QApplication.clipboard().setText(self.title_label.text())
+            QApplication.clipboard().setText(str(index.data(Qt.ItemDataRole.DisplayRole) or ""))
+
+
+@dataclass(frozen=True)
+class ResultCard:
+    title: str
+    badge: str = ""
+    badge_color: str = "#111111"
+    blocks: tuple[str | tuple[str, ...], ...] = ()
+    chart: tuple[tuple[str, ...], tuple[int, ...]] | None = None
+
+    def plain_text(self) -> str:
+        lines = [f"{self.title}  {self.badge}".rstrip()]
+        for block in self.blocks:
+            if isinstance(block, str):
+                lines.append(block)
+            elif block:
+                lines.extend(f"• {x}" for x in block)
+            else:
+                lines.append("（无）")
+        if self.chart is not None:
+            lines.extend(f"{name}: {score}" for name, score in zip(*self.chart))
+        return "\n".join(lines)
+
+
+RESULT_CARD_ROLE = Qt.ItemDataRole.UserRole + 2
+
+
+class ResultCardModel(QAbstractListModel):
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._cards: list[ResultCard] = []
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # type: ignore[override]
+        return 0 if parent.isValid() else len(self._cards)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):  # type: ignore[override]
+        if not index.isValid() or not (0 <= index.row() < len(self._cards)):
+            return None
+        card = self._cards[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return card.title
+        if role == RESULT_CARD_ROLE:
+            return card
+        return None
+
+    def cards(self) -> list[ResultCard]:
+        return list(self._cards)
+
+    def set_cards(self, cards: list[ResultCard]) -> None:
+        self.beginResetModel()
+        self._cards = list(cards)
+        self.endResetModel()
+
+    def append_card(self, card: ResultCard) -> None:
+        row = len(self._cards)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._cards.append(card)
+        self.endInsertRows()
+
+    def set_card(self, row: int, card: ResultCard) -> None:
+        if not (0 <= row < len(self._cards)):
+            return
+        self._cards[row] = card
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index)
+
+    def clear(self) -> None:
+        self.set_cards([])
+
+
+@lru_cache(maxsize=8)
+def _shadow_tile(radius: int, blur: int, alpha: int) -> QPixmap:
+    corner = radius + blur
+    size = corner * 2 + 1
+    image = QImage(size, size, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+    painter.setPen(Qt.PenStyle.NoPen)
+    painter.setBrush(QColor(0, 0, 0, max(1, round(alpha / blur))))
+    for i in range(blur, 0, -1):
+        inset = blur - i
+        painter.drawRoundedRect(QRectF(inset, inset, size - 2 * inset, size - 2 * inset), radius + i, radius + i)
+    painter.end()
+    return QPixmap.fromImage(image)
+
+
+def _draw_shadow(painter: QPainter, rect: QRectF, tile: QPixmap, radius: int, blur: int) -> None:
+    r = rect.adjusted(-blur, -blur, blur, blur)
+    c = float(radius + blur)
+    t = float(tile.width())
+    mid_w, mid_h = r.width() - 2 * c, r.height() - 2 * c
+    if mid_w < 0 or mid_h < 0:
+        return
+    x0, y0, x1, y1 = r.left(), r.top(), r.right() - c, r.bottom() - c
+    painter.drawPixmap(QRectF(x0, y0, c, c), tile, QRectF(0, 0, c, c))
+    painter.drawPixmap(QRectF(x1, y0, c, c), tile, QRectF(t - c, 0, c, c))
+    painter.drawPixmap(QRectF(x0, y1, c, c), tile, QRectF(0, t - c, c, c))
+    painter.drawPixmap(QRectF(x1, y1, c, c), tile, QRectF(t - c, t - c, c, c))
+    painter.drawPixmap(QRectF(x0 + c, y0, mid_w, c), tile, QRectF(c, 0, 1, c))
+    painter.drawPixmap(QRectF(x0 + c, y1, mid_w, c), tile, QRectF(c, t - c, 1, c))
+    painter.drawPixmap(QRectF(x0, y0 + c, c, mid_h), tile, QRectF(0, c, c, 1))
+    painter.drawPixmap(QRectF(x1, y0 + c, c, mid_h), tile, QRectF(t - c, c, c, 1))
+    painter.drawPixmap(QRectF(x0 + c, y0 + c, mid_w, mid_h), tile, QRectF(c, c, 1, 1))
+
+
+class ResultCardDelegate(QStyledItemDelegate):
+    MARGIN_X = 12
+    MARGIN_TOP = 4
+    MARGIN_BOTTOM = 18
+    PAD_X = 14
+    PAD_Y = 12
+    HEADER_H = 30
+    GAP = 10
+    RADIUS = 14
+    SHADOW_BLUR = 11
+    SHADOW_OFFSET = 6
+    BADGE_W = 54
+    DOC_CACHE_SIZE = 256
+
+    def __init__(self, view: QTableView) -> None:
+        super().__init__(view)
+        self._view = view
+        self._width = -1
+        self._docs: OrderedDict[ResultCard, QTextDocument] = OrderedDict()
+        self._heights: dict[ResultCard, int] = {}
+        self._fill = QColor("#FFFFFF")
+        self._border = QPen(QColor("#CFE3F7"))
+        self._badge_fill = QColor("#EEF6FF")
+        self._text = QColor("#111111")
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:  # type: ignore[override]
+        card = index.data(RESULT_CARD_ROLE)
+        return QSize(0, self.card_height(card) if isinstance(card, ResultCard) else 0)
+
+    def card_height(self, card: ResultCard) -> int:
+        self._sync_width()
+        height = self._heights.get(card)
+        if height is None:
+            height = self.MARGIN_TOP + self.PAD_Y + self.HEADER_H + self.PAD_Y + self.MARGIN_BOTTOM
+            doc = self._document(card)
+            if doc is not None:
+                height += self.GAP + int(doc.size().height())
+            if card.chart is not None:
+                height += self.GAP + _chart_height(card.chart)
+            self._heights[card] = height
+        return height
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:  # type: ignore[override]
+        card = index.data(RESULT_CARD_ROLE)
+        if not isinstance(card, ResultCard):
+            return
+        self._sync_width()
+        rect = QRectF(option.rect).adjusted(self.MARGIN_X, self.MARGIN_TOP, -self.MARGIN_X, -self.MARGIN_BOTTOM)
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        tile = _shadow_tile(self.RADIUS, self.SHADOW_BLUR, 30)
+        _draw_shadow(painter, rect.translated(0, self.SHADOW_OFFSET), tile, self.RADIUS, self.SHADOW_BLUR)
+        painter.setPen(self._border)
+        painter.setBrush(self._fill)
+        painter.drawRoundedRect(rect.adjusted(0.5, 0.5, -0.5, -0.5), self.RADIUS, self.RADIUS)
+
+        header = QRectF(rect.left() + self.PAD_X, rect.top() + self.PAD_Y, rect.width() - 2 * self.PAD_X, self.HEADER_H)
+        if card.badge:
+            badge_rect = QRectF(header.right() - self.BADGE_W, header.top() + 2, self.BADGE_W, self.HEADER_H - 4)
+            painter.setPen(self._border)
+            painter.setBrush(self._badge_fill)
+            painter.drawRoundedRect(badge_rect, 10, 10)
+            painter.setPen(QColor(card.badge_color))
+            painter.setFont(self._view.font())
+            painter.drawText(badge_rect, int(Qt.AlignmentFlag.AlignCenter), card.badge)
+            header.setRight(badge_rect.left() - 10)
+        title_font = QFont(self._view.font())
+        title_font.setPointSize(12)
+        title_font.setBold(True)
+        painter.setFont(title_font)
+        painter.setPen(self._text)
+        title = painter.fontMetrics().elidedText(card.title, Qt.TextElideMode.ElideMiddle, int(header.width()))
+        painter.drawText(header, int(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft), title)
+
+        y = header.bottom() + self.GAP
+        doc = self._document(card)
+        if doc is not None:
+            painter.save()
+            painter.translate(header.left(), y)
+            doc.drawContents(painter)
+            painter.restore()
+            y += doc.size().height() + self.GAP
+        if card.chart is not None:
+            painter.setFont(self._view.font())
+            names, scores = card.chart
+            chart_rect = QRect(int(header.left()), int(y), int(rect.width() - 2 * self.PAD_X), _chart_height(card.chart))
+            paint_score_chart(painter, chart_rect, list(names), [max(0, min(100, int(s))) for s in scores])
+        painter.restore()
+
+    def _sync_width(self) -> None:
+        width = self._view.viewport().width()
+        if width != self._width:
+            self._width = width
+            self._docs.clear()
+            self._heights.clear()
+
+    def _document(self, card: ResultCard) -> QTextDocument | None:
+        if not card.blocks:
+            return None
+        doc = self._docs.get(card)
+        if doc is not None:
+            self._docs.move_to_end(card)
+            return doc
+        doc = QTextDocument()
+        doc.setDocumentMargin(0)
+        doc.setDefaultFont(self._view.font())
+        doc.setHtml(_card_body_html(card.blocks))
+        doc.setTextWidth(max(40, self._width - 2 * self.MARGIN_X - 2 * self.PAD_X))
+        self._docs[card] = doc
+        if len(self._docs) > self.DOC_CACHE_SIZE:
+            self._docs.popitem(last=False)
+        return doc
+
+
+def _chart_height(chart: tuple[tuple[str, ...], tuple[int, ...]]) -> int:
+    return max(260, 36 * min(len(chart[0]), len(chart[1])) + 36)
+
+
+def _card_body_html(blocks: tuple[str | tuple[str, ...], ...]) -> str:
+    parts = []
+    for i, block in enumerate(blocks):
+        margin = 0 if i == 0 else 8
+        if isinstance(block, str):
+            body = _escape(block).replace("\n", "<br/>")
+        elif block:
+            body = "<br/>".join(f"• {_escape(x)}" for x in block)
+        else:
+            body = "（无）"
+        parts.append(f'<p style="margin-top: {margin}px; margin-bottom: 0px; color: #111111;">{body}</p>')
+    return "".join(parts)
+
+
+class ResultCardView(QTableView):
+    ESTIMATED_HEIGHT = 160
+
+    def __init__(self, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self._measured: dict[int, int] = {}
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.verticalHeader().setDefaultSectionSize(self.ESTIMATED_HEIGHT)
+        self.setShowGrid(False)
+        self.setSelectionMode(QTableView.SelectionMode.NoSelection)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setVerticalScrollMode(QTableView.ScrollMode.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(24)
+        self.verticalScrollBar().valueChanged.connect(self._measure_visible)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setFrameShape(QFrame.Shape.NoFrame)
+        self.setItemDelegate(ResultCardDelegate(self))
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._show_context_menu)
+
+    def setModel(self, model) -> None:  # type: ignore[override]
+        super().setModel(model)
+        model.modelReset.connect(self._on_model_reset)
+        model.rowsInserted.connect(self._measure_visible)
+        model.dataChanged.connect(self._on_data_changed)
+        self._on_model_reset()
+
+    def resizeEvent(self, event) -> None:  # type: ignore[override]
+        super().resizeEvent(event)
+        if event.size().width() != event.oldSize().width():
+            self._measured = {}
+        self._measure_visible()
+
+    def _on_model_reset(self) -> None:
+        self._measured = {}
+        self._measure_visible()
+
+    def _on_data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex) -> None:
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            self._measured.pop(row, None)
+        self._measure_visible()
+
+    def _measure_visible(self) -> None:
+        model = self.model()
+        if model is None:
+            return
+        header = self.verticalHeader()
+        delegate = self.itemDelegate()
+        width = self.viewport().width()
+        height = self.viewport().height()
+        row = max(0, self.rowAt(0))
+        rows = model.rowCount()
+        while row < rows and header.sectionViewportPosition(row) < height:
+            if self._measured.get(row) != width:
+                card = model.index(row, 0).data(RESULT_CARD_ROLE)
+                if isinstance(card, ResultCard) and isinstance(delegate, ResultCardDelegate):
+                    header.resizeSection(row, delegate.card_height(card))
+                self._measured[row] = width
+            row += 1
+
+    def _show_context_menu(self, pos) -> None:
+        model = self.model()
+        if not isinstance(model, ResultCardModel):
+            return
+        card = self.indexAt(pos).data(RESULT_CARD_ROLE)
+        menu = QMenu(self)
+        copy_card_action = menu.addAction("复制此卡片") if isinstance(card, ResultCard) else None
+        copy_all_action = menu.addAction("复制全部结果")
+        action = menu.exec(self.viewport().mapToGlobal(pos))
+        if action is None:
+            return
+        if action == copy_card_action and isinstance(card, ResultCard):
+            QApplication.clipboard().setText(card.plain_text())
+        elif action == copy_all_action:
+            QApplication.clipboard().setText("\n\n".join(c.plain_text() for c in model.cards()))
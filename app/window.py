@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-import json
-import re
+import os
 import traceback
+from concurrent.futures import Future
+from dataclasses import replace
 from pathlib import Path
 from PyQt6.QtCore import QObject, QRunnable, Qt, QThreadPool, pyqtSignal
 from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import (
+    QCheckBox,
     QFileDialog,
     QHBoxLayout,
     QLabel,
@@ -14,7 +16,6 @@ from PyQt6.QtWidgets import (
     QMessageBox,
     QPlainTextEdit,
     QPushButton,
-    QScrollArea,
     QSizePolicy,
     QSplitter,
     QToolButton,
@@ -22,14 +23,48 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
-from app.api_client import DeepSeekClient
-from app.file_icons import icon_for_file
-from app.models import ReviewResult, parse_review_json
+from app.analysis import (
+    DIFF_LANGUAGE_HINT,
+    DIFF_REQUIREMENTS,
+    PROJECT_LANGUAGE_HINT,
+    PROJECT_REQUIREMENTS,
+    AnalysisState,
+    FileResult,
+    analyze_diff,
+    analyze_files,
+    analyze_single,
+    coalescing_stats,
+)
+from app.api_client import format_usage_stats, usage_stats
+from app.cancel import Cancelled, CancelToken
+from app.concurrency import format_limits, get_controller
+from app.git_diff import GitDiffError, changed_hunks, format_hunks
+from app.hedging import format_hedge_stats, get_hedger
+from app.ingest import IngestOptions, IngestStats, ingest
+from app.json_stream import ReviewStreamParser
+from app.metrics import detect_language
+from app.models import CategoryResult, ReviewResult, parse_category_json, parse_review_json
 from app.providers import get_provider
-from app.settings import AppSettings, load_settings, save_settings
+from app.result_cache import ResultCache
+from app.routing import format_routes, get_router
+from app.scheduler import BATCH, INTERACTIVE, QueueFull, format_scheduler_stats, get_scheduler
+from app.settings import (
+    AppSettings,
+    concurrency_state_path,
+    load_settings,
+    result_cache_path,
+    save_settings,
+    spend_path,
+    telemetry_path,
+    transport_config,
+)
 from app.settings_dialog import SettingsDialog
+from app.singleflight import format_flight_stats
+from app.spend import check_budget, estimate_spend, format_estimate, format_spend, get_ledger
+from app.telemetry import format_request_summary, format_telemetry_by_model, get_telemetry
 from app.theme import app_stylesheet
-from app.widgets import CardWidget, CategoryChart, CodeEditor, FileCardWidget, score_color
+from app.transport import configure_transport, format_pool_stats, get_transport
+from app.widgets import CodeEditor, FileListModel, FileListView, ResultCard, ResultCardModel, ResultCardView, score_color
 
 
 class MainWindow(QMainWindow):
@@ -40,10 +75,25 @@ class MainWindow(QMainWindow):
         self.setStyleSheet(app_stylesheet())
         self._thread_pool = QThreadPool.globalInstance()
         self._settings = load_settings()
+        configure_transport(transport_config(self._settings))
+        get_controller().load(concurrency_state_path())
+        get_scheduler().configure(provider_cap=self._settings.max_workers)
+        get_telemetry().configure(telemetry_path())
+        get_ledger().load(spend_path())
         self._opened_files: list[Path] = []
         self._file_contents: dict[str, str] = {}
-        self._file_cards: dict[str, FileCardWidget] = {}
         self._selected_file_id: str = ""
+        self._streaming = False
+        self._cache: ResultCache | None = None
+        self._last_from_cache = False
+        self._file_results: list[FileResult] = []
+        self._analysis_state = AnalysisState()
+        self._ingest_jobs: list[IngestJob] = []
+        self._ingest_generation = 0
+        self._run_generation = 0
+        self._run_cancel: CancelToken | None = None
+        self._run_future: Future | None = None
+        self._telemetry_mark = 0
 
         self._build_ui()
         self._render_placeholder("就绪。点击“开始检测”。")
@@ -85,6 +135,17 @@ class MainWindow(QMainWindow):
         open_btn.clicked.connect(self.open_files)
         btn_row.addWidget(open_btn, 0)
 
+        open_dir_btn = QPushButton("打开文件夹")
+        open_dir_btn.setObjectName("secondaryBtn")
+        open_dir_btn.clicked.connect(self.open_folder)
+        btn_row.addWidget(open_dir_btn, 0)
+
+        diff_btn = QPushButton("审查 Git 变更")
+        diff_btn.setObjectName("secondaryBtn")
+        diff_btn.setToolTip("只分析当前分支相对基线（见设置）的改动片段")
+        diff_btn.clicked.connect(self.review_git_changes)
+        btn_row.addWidget(diff_btn, 0)
+
         clear_btn = QPushButton("清空")
         clear_btn.setObjectName("secondaryBtn")
         clear_btn.clicked.connect(self.clear_code)
@@ -92,22 +153,36 @@ class MainWindow(QMainWindow):
 
         btn_row.addStretch(1)
 
+        self.force_refresh = QCheckBox("强制刷新")
+        self.force_refresh.setToolTip("忽略缓存，重新调用模型分析")
+        btn_row.addWidget(self.force_refresh, 0)
+
         self.run_btn = QPushButton("开始检测")
         self.run_btn.clicked.connect(self.run_analysis)
         btn_row.addWidget(self.run_btn, 0)
 
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setObjectName("secondaryBtn")
+        self.cancel_btn.setToolTip("中止正在进行的请求，并丢弃排队中的逐文件任务")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_analysis)
+        btn_row.addWidget(self.cancel_btn, 0)
+
         left_layout.addLayout(btn_row)
 
-        self.files_scroll = QScrollArea()
-        self.files_scroll.setWidgetResizable(True)
-        self.files_scroll.setFixedHeight(170)
-        self.files_scroll.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
-        self.files_scroll.setStyleSheet(
+        self.files_model = FileListModel(self)
+        self.files_view = FileListView()
+        self.files_view.setModel(self.files_model)
+        self.files_view.setFixedHeight(170)
+        self.files_view.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.files_view.setStyleSheet(
             """
-            QScrollArea {
+            QListView {
                 background: rgba(255, 255, 255, 120);
                 border: 1px solid rgba(191, 217, 242, 200);
                 border-radius: 14px;
+                padding: 6px 10px;
+                outline: 0;
             }
             QScrollBar:vertical {
                 background: transparent;
@@ -122,12 +197,9 @@ class MainWindow(QMainWindow):
             QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical { height: 0px; }
             """
         )
-        self.files_host = QWidget()
-        self.files_layout = QVBoxLayout(self.files_host)
-        self.files_layout.setContentsMargins(10, 10, 10, 10)
-        self.files_layout.setSpacing(10)
-        self.files_scroll.setWidget(self.files_host)
-        left_layout.addWidget(self.files_scroll, 0)
+        self.files_view.file_clicked.connect(self._select_file)
+        self.files_view.remove_requested.connect(self._remove_file)
+        left_layout.addWidget(self.files_view, 0)
 
         self.code_edit = CodeEditor()
         self.code_edit.setPlaceholderText("粘贴或打开需要检测的代码…")
@@ -148,16 +220,11 @@ class MainWindow(QMainWindow):
         self.status_label.setWordWrap(True)
         right_layout.addWidget(self.status_label, 0)
 
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-        self.result_host = QWidget()
-        self.result_layout = QVBoxLayout(self.result_host)
-        self.result_layout.setContentsMargins(0, 0, 0, 0)
-        self.result_layout.setSpacing(12)
-        self.result_layout.addStretch(1)
-        self.scroll.setWidget(self.result_host)
-        right_layout.addWidget(self.scroll, 1)
+        self.result_model = ResultCardModel(self)
+        self.result_view = ResultCardView()
+        self.result_view.setModel(self.result_model)
+        self.result_view.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        right_layout.addWidget(self.result_view, 1)
 
         splitter.addWidget(left)
         splitter.addWidget(right)
@@ -172,15 +239,21 @@ class MainWindow(QMainWindow):
             return
         self._add_files([Path(p) for p in paths])
 
+    def open_folder(self) -> None:
+        path = QFileDialog.getExistingDirectory(self, "选择项目文件夹", "")
+        if not path:
+            return
+        self._add_files([Path(path)])
+
     def clear_code(self) -> None:
+        self._cancel_ingest()
         self._opened_files = []
         self._file_contents = {}
-        self._file_cards = {}
         self._selected_file_id = ""
-        self._refresh_files_ui()
+        self._analysis_state = AnalysisState()
+        self.files_model.clear()
         self.code_edit.clear()
         self.status_label.setText("就绪。")
-        self._clear_results()
         self._render_placeholder("就绪。点击“开始检测”。")
 
     def open_settings(self) -> None:
@@ -188,50 +261,228 @@ class MainWindow(QMainWindow):
         if dialog.exec():
             self._settings = dialog.settings()
             save_settings(self._settings)
+            self._settings = load_settings()
+            configure_transport(transport_config(self._settings))
+            get_scheduler().configure(provider_cap=self._settings.max_workers)
             self.status_label.setText("设置已保存。")
 
     def run_analysis(self) -> None:
-        self.status_label.setText("正在生成…")
-        self._clear_results()
-        self._render_placeholder("正在生成…")
-
         code = self._build_code_for_analysis().strip("\n")
         if not code.strip():
             QMessageBox.information(self, "提示", "请先粘贴或打开代码。")
             self.status_label.setText("未检测：没有代码。")
             return
-        if not self._settings.api_key.strip():
-            provider_name = get_provider(self._settings.provider).display_name
-            QMessageBox.warning(self, "需要设置", f"请先在“设置”里填写 {provider_name} API Key。")
-            self.status_label.setText("未检测：需要设置 API Key。")
+        if not self._ensure_api_key():
             return
+        per_file = self._is_project_mode() and self._settings.project_mode == "per_file"
+        if per_file:
+            names = self._display_names()
+            files = [(names[str(p)], self._file_contents.get(str(p), "")) for p in self._opened_files]
+            prompts = [(content, detect_language(content, name), "") for name, content in files]
+            reduce_requests = 1 if self._settings.reduce_with_model and len(files) > 1 else 0
+            estimate = self._preflight(prompts, reduce_requests)
+        else:
+            path = "" if self._is_project_mode() else self._selected_file_id
+            language_hint = detect_language(code, path)
+            extra = ""
+            if self._is_project_mode():
+                extra = PROJECT_REQUIREMENTS
+                language_hint = PROJECT_LANGUAGE_HINT
+            estimate = self._preflight([(code, language_hint, extra)])
+        if estimate is None:
+            return
+        cancel = self._begin_run()
+        self.status_label.setText(f"正在生成…\n{estimate}")
+        self._render_pending("正在生成…")
+
+        self._streaming = False
+        self._last_from_cache = False
+        self._file_results = []
+        if per_file:
+            project_job = ProjectAnalyzeJob(
+                files=files,
+                settings=self._settings,
+                cache=self._result_cache(),
+                force_refresh=self.force_refresh.isChecked(),
+                state=self._analysis_state,
+                cancel=cancel,
+            )
+            self._start_job(project_job, BATCH)
+            return
+
+        job = AnalyzeJob(
+            code=code,
+            language_hint=language_hint,
+            settings=self._settings,
+            extra_requirements=extra,
+            cache=self._result_cache(),
+            force_refresh=self.force_refresh.isChecked(),
+            path=path,
+            cancel=cancel,
+        )
+        self._start_job(job)
+
+    def _preflight(self, prompts: list[tuple[str, str, str]], extra_requests: int = 0) -> str | None:
+        estimate = estimate_spend(self._settings, prompts, extra_requests)
+        text = format_estimate(estimate)
+        check = check_budget(self._settings, estimate, get_ledger())
+        reasons = "\n".join(check.reasons)
+        if check.level == "hard":
+            QMessageBox.warning(self, "超出预算", f"{text}\n\n{reasons}\n\n未发送。可在设置中调整预算。")
+            self.status_label.setText("未检测：超出预算。")
+            return None
+        if check.level == "soft":
+            answer = QMessageBox.question(self, "确认花费", f"{text}\n\n{reasons}\n\n仍要继续吗？")
+            if answer != QMessageBox.StandardButton.Yes:
+                self.status_label.setText("未检测：已取消。")
+                return None
+        return text
+
+    def review_git_changes(self) -> None:
+        if not self._ensure_api_key():
+            return
+        root = self._common_root()
+        repo = QFileDialog.getExistingDirectory(self, "选择 Git 仓库", str(root) if root else "")
+        if not repo:
+            return
+        self._begin_run()
+        base = self._settings.diff_base
+        self.status_label.setText(f"正在读取相对 {base} 的改动…")
+        self._render_pending(f"正在读取相对 {base} 的改动…")
+        self._streaming = False
+        self._last_from_cache = False
+        self._file_results = []
+        self._start_job(DiffLoadJob(repo=Path(repo), settings=self._settings))
+
+    def cancel_analysis(self) -> None:
+        if self._run_cancel is None:
+            return
+        self._run_cancel.cancel()
+        self._run_cancel = None
+        if self._run_future is not None:
+            self._run_future.cancel()
+            self._run_future = None
+        self._run_generation += 1
+        self._streaming = False
+        self.run_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.status_label.setText("已取消。")
+        self._render_placeholder("已取消。")
+
+    def _begin_run(self) -> CancelToken:
+        self._run_generation += 1
+        self._run_cancel = CancelToken()
+        self._telemetry_mark = get_telemetry().mark()
         self.run_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        return self._run_cancel
+
+    def _start_job(self, job: QRunnable, priority: int = INTERACTIVE) -> None:
+        generation = self._run_generation
+        handlers = {
+            "loaded": self._on_diff_loaded,
+            "rejected": self._on_diff_rejected,
+            "file_done": self._on_file_analyzed,
+            "cached": self._on_analysis_cached,
+            "partial": self._on_analysis_partial,
+            "succeeded": self._on_analysis_ok,
+            "failed": self._on_analysis_failed,
+            "finished": self._on_analysis_finished,
+        }
+        for name, handler in handlers.items():
+            signal = getattr(job.signals, name, None)
+            if signal is not None:
+                signal.connect(lambda *args, h=handler: h(*args) if generation == self._run_generation else None)
+        try:
+            self._run_future = get_scheduler().submit(job.run, priority=priority)
+        except QueueFull as e:
+            self._run_cancel = None
+            self._run_generation += 1
+            self.run_btn.setEnabled(True)
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText(f"未检测：{e}")
+            self._render_placeholder(f"未检测：{e}")
+
+    def _on_diff_loaded(self, hunks: list) -> None:
+        estimate = self._preflight([(format_hunks(hunks), DIFF_LANGUAGE_HINT, DIFF_REQUIREMENTS)])
+        if estimate is None:
+            self._render_placeholder(self.status_label.text())
+            self._on_analysis_finished()
+            return
+        files = len({h.path for h in hunks})
+        self.status_label.setText(f"正在分析 {files} 个文件中的 {len(hunks)} 处改动…\n{estimate}")
+        job = DiffReviewJob(
+            hunks=hunks,
+            settings=self._settings,
+            cache=self._result_cache(),
+            force_refresh=self.force_refresh.isChecked(),
+            cancel=self._run_cancel,
+        )
+        self._start_job(job)
 
-        language_hint = guess_language(code)
-        extra = ""
-        if self._is_project_mode():
-            extra = (
-                "这是一个多文件项目，请额外检测跨文件连贯逻辑：\n"
-                "- 调用链是否自洽、模块边界是否清晰\n"
-                "- 命名/接口/数据结构是否一致\n"
-                "- 重复逻辑与可复用点\n"
-                "- 潜在循环依赖、耦合过高点\n"
-                "请在 categories 增加维度：连贯性/跨文件逻辑、一致性/架构。"
-            )
-            language_hint = "多文件项目（可能多语言）"
-        job = AnalyzeJob(code=code, language_hint=language_hint, settings=self._settings, extra_requirements=extra)
-        job.signals.succeeded.connect(self._on_analysis_ok)
-        job.signals.failed.connect(self._on_analysis_failed)
-        job.signals.finished.connect(self._on_analysis_finished)
-        self._thread_pool.start(job)
+    def _on_diff_rejected(self, message: str) -> None:
+        self.status_label.setText(message)
+        self._render_placeholder(message)
+        self._on_analysis_finished()
+
+    def _ensure_api_key(self) -> bool:
+        if self._settings.api_key.strip() or self._settings.routes:
+            return True
+        provider_name = get_provider(self._settings.provider).display_name
+        QMessageBox.warning(self, "需要设置", f"请先在“设置”里填写 {provider_name} API Key。")
+        self.status_label.setText("未检测：需要设置 API Key。")
+        return False
+
+    def _on_file_analyzed(self, file_result: FileResult, done: int, total: int) -> None:
+        self._file_results.append(file_result)
+        state = "失败" if file_result.error else f"{file_result.result.overall_score}/100"
+        if file_result.unchanged:
+            state += "，未变更"
+        self.status_label.setText(f"逐文件分析中… {done}/{total}（{file_result.name}：{state}）")
+
+    def _on_analysis_partial(self, event: tuple) -> None:
+        kind, key, value = event
+        if not self._streaming:
+            self._streaming = True
+            self._render_pending("正在生成总体结论…")
+            self.status_label.setText("正在接收结果…")
+        overall = self.result_model.cards()[0]
+        if kind == "field" and key == "overall_summary":
+            self.result_model.set_card(0, replace(overall, blocks=(str(value),)))
+        elif kind == "field" and key == "overall_score" and isinstance(value, (int, float)):
+            score = max(0, min(100, int(value)))
+            self.result_model.set_card(0, replace(overall, badge=f"{score}", badge_color=score_color(score)))
+        elif kind == "item" and isinstance(value, dict):
+            self.result_model.append_card(self._category_card(parse_category_json(value)))
+            self.status_label.setText(f"正在接收结果…（已完成 {key + 1} 个维度）")
+
+    def _result_cache(self) -> ResultCache | None:
+        if not self._settings.cache_enabled:
+            return None
+        max_bytes = self._settings.cache_max_mb * 1024 * 1024
+        if self._cache is None:
+            try:
+                self._cache = ResultCache(result_cache_path(), max_bytes=max_bytes)
+            except Exception:
+                return None
+        else:
+            self._cache.set_max_bytes(max_bytes)
+        return self._cache
+
+    def _on_analysis_cached(self) -> None:
+        self._last_from_cache = True
 
     def _on_analysis_ok(self, result: ReviewResult) -> None:
-        self.status_label.setText(f"完成。总体分：{result.overall_score}/100")
-        self._clear_results()
+        source = "（缓存）" if self._last_from_cache else ""
+        if self._file_results:
+            fresh = sum(1 for fr in self._file_results if not fr.unchanged)
+            source = f"（重新分析 {fresh}/{len(self._file_results)} 个文件）"
+        self.status_label.setText(f"完成{source}。总体分：{result.overall_score}/100{self._request_summary()}")
+        self._streaming = False
         self._render_result(result)
 
     def _on_analysis_failed(self, message: str) -> None:
-        self.status_label.setText("失败。请检查网络/Key/模型。")
+        self.status_label.setText(f"失败。请检查网络/Key/模型。{self._request_summary()}")
         box = QMessageBox(self)
         box.setIcon(QMessageBox.Icon.Critical)
         box.setWindowTitle("分析失败")
@@ -243,50 +494,92 @@ class MainWindow(QMainWindow):
 
     def _on_analysis_finished(self) -> None:
         self.run_btn.setEnabled(True)
-
-    def _clear_results(self) -> None:
-        while self.result_layout.count():
-            item = self.result_layout.takeAt(0)
-            w = item.widget() if item is not None else None
-            if w is not None:
-                w.setParent(None)
-                w.deleteLater()
+        self.cancel_btn.setEnabled(False)
+        self._run_cancel = None
+        self._run_future = None
+        tooltip = format_pool_stats(get_transport().stats())
+        usage = format_usage_stats(usage_stats())
+        if usage:
+            tooltip += f"\n{usage}"
+        controller = get_controller()
+        limits = format_limits(controller.snapshot())
+        if limits:
+            tooltip += f"\n{limits}"
+        controller.save(concurrency_state_path())
+        routes = format_routes(get_router().snapshot(self._settings.routes))
+        if routes:
+            tooltip += f"\n{routes}"
+        hedges = format_hedge_stats(get_hedger().stats())
+        if hedges:
+            tooltip += f"\n{hedges}"
+        flights = format_flight_stats(coalescing_stats())
+        if flights:
+            tooltip += f"\n{flights}"
+        scheduled = format_scheduler_stats(get_scheduler().stats())
+        if scheduled:
+            tooltip += f"\n{scheduled}"
+        telemetry = format_telemetry_by_model(get_telemetry().recent())
+        if telemetry:
+            tooltip += f"\n{telemetry}"
+        ledger = get_ledger()
+        ledger.save(spend_path())
+        spend = format_spend(ledger)
+        if spend:
+            tooltip += f"\n{spend}"
+        if self._cache is not None:
+            st = self._cache.stats()
+            tooltip += f"\n结果缓存：命中 {st['hits']}  未命中 {st['misses']}  条目 {st['entries']}  {st['bytes'] // 1024} KB"
+        self.status_label.setToolTip(tooltip.strip())
+
+    def _request_summary(self) -> str:
+        summary = format_request_summary(get_telemetry().since(self._telemetry_mark))
+        return f"\n{summary}" if summary else ""
 
     def _render_result(self, result: ReviewResult) -> None:
-        overall = CardWidget("总体结论")
-        overall.set_badge(f"{result.overall_score}", score_color(result.overall_score))
-        overall.add_paragraph(result.overall_summary)
+        overall_blocks: list[str | tuple[str, ...]] = [result.overall_summary]
         metrics_text = _format_metrics(result.metrics)
         if metrics_text:
-            overall.add_paragraph(metrics_text)
-        self.result_layout.addWidget(overall)
-
-        chart_card = CardWidget("维度分数图表")
-        names = [c.name for c in result.categories]
-        scores = [c.score for c in result.categories]
+            overall_blocks.append(metrics_text)
+        complex_functions = result.metrics.get("complex_functions") if isinstance(result.metrics, dict) else None
+        if isinstance(complex_functions, list) and complex_functions:
+            overall_blocks.extend(["复杂度较高的函数：", tuple(str(x) for x in complex_functions)])
+        names = tuple(c.name for c in result.categories)
+        scores = tuple(c.score for c in result.categories)
         avg_score = int(round(sum(scores) / len(scores))) if scores else 0
-        chart_card.set_badge(f"{avg_score}", score_color(avg_score))
-        chart = CategoryChart()
-        chart.set_data(names, scores)
-        chart_card.body.addWidget(chart)
-        self.result_layout.addWidget(chart_card)
-
-        for cat in result.categories:
-            card = CardWidget(cat.name)
-            card.set_badge(f"{cat.score}", score_color(cat.score))
-            if cat.summary:
-                card.add_paragraph(cat.summary)
-            if cat.issues:
-                card.add_paragraph("主要问题：")
-                card.add_list(cat.issues)
-            if cat.suggestions:
-                card.add_paragraph("改进建议：")
-                card.add_list(cat.suggestions)
-            self.result_layout.addWidget(card)
-
-        self.result_layout.addStretch(1)
+        cards = [
+            ResultCard("总体结论", f"{result.overall_score}", score_color(result.overall_score), tuple(overall_blocks)),
+            ResultCard("维度分数图表", f"{avg_score}", score_color(avg_score), chart=(names, scores)),
+        ]
+        cards.extend(self._category_card(cat) for cat in result.categories)
+
+        if self._file_results:
+            failed = sum(1 for fr in self._file_results if fr.error)
+            summary = f"共 {len(self._file_results)} 个文件" + (f"，失败 {failed} 个" if failed else "")
+            cards.append(ResultCard("逐文件结果", f"{len(self._file_results)}", blocks=(summary,)))
+            for fr in self._file_results:
+                if fr.error:
+                    cards.append(ResultCard(fr.name, "失败", score_color(0), (fr.error,)))
+                else:
+                    score = fr.result.overall_score
+                    cards.append(ResultCard(fr.name, f"{score}", score_color(score), (fr.result.overall_summary,)))
+
+        self.result_model.set_cards(cards)
+
+    def _category_card(self, cat: CategoryResult) -> ResultCard:
+        blocks: list[str | tuple[str, ...]] = []
+        if cat.summary:
+            blocks.append(cat.summary)
+        if cat.issues:
+            blocks.extend(["主要问题：", tuple(cat.issues)])
+        if cat.suggestions:
+            blocks.extend(["改进建议：", tuple(cat.suggestions)])
+        return ResultCard(cat.name, f"{cat.score}", score_color(cat.score), tuple(blocks))
+
+    def _render_pending(self, text: str) -> None:
+        self.result_model.set_cards([ResultCard("总体结论", "…", blocks=(text,))])
 
     def _render_placeholder(self, text: str) -> None:
+        self._file_results = []
         placeholder = parse_review_json(
             {
                 "overall_score": 0,
@@ -306,54 +599,63 @@ class MainWindow(QMainWindow):
         self._render_result(placeholder)
 
     def _add_files(self, paths: list[Path]) -> None:
-        added = 0
-        for p in paths:
-            try:
-                resolved = p.resolve()
-            except Exception:
-                resolved = p
-            if resolved in self._opened_files:
-                continue
-            try:
-                text = resolved.read_text(encoding="utf-8")
-            except Exception:
-                text = resolved.read_text(encoding="utf-8", errors="replace")
-            self._opened_files.append(resolved)
-            self._file_contents[str(resolved)] = text
-            added += 1
-        self._refresh_files_ui()
-        if added and not self._selected_file_id and self._opened_files:
-            self._select_file(str(self._opened_files[0]))
-        elif added and self._opened_files:
-            self._select_file(str(self._opened_files[-1]))
-
-    def _refresh_files_ui(self) -> None:
-        for i in reversed(range(self.files_layout.count())):
-            item = self.files_layout.itemAt(i)
-            w = item.widget()
-            if w is not None:
-                w.setParent(None)
-                w.deleteLater()
-        self._file_cards = {}
+        generation = self._ingest_generation
+        select_last = not any(p.is_dir() for p in paths)
+        job = IngestJob(paths, IngestOptions())
+        job.signals.batch.connect(lambda batch: self._on_ingest_batch(generation, batch, select_last))
+        job.signals.done.connect(lambda stats: self._on_ingest_done(generation, job, stats))
+        self._ingest_jobs.append(job)
+        self.status_label.setText("正在加载文件…")
+        self._thread_pool.start(job)
 
-        if not self._opened_files:
+    def _cancel_ingest(self) -> None:
+        for job in self._ingest_jobs:
+            job.cancel()
+        self._ingest_jobs = []
+        self._ingest_generation += 1
+
+    def _on_ingest_batch(self, generation: int, batch: list, select_last: bool) -> None:
+        if generation != self._ingest_generation:
             return
+        added: list[Path] = []
+        for path, text in batch:
+            fid = str(path)
+            if fid in self._file_contents:
+                continue
+            self._opened_files.append(path)
+            self._file_contents[fid] = text
+            added.append(path)
+        if not added:
+            return
+        self.files_model.add_paths(added)
+        if select_last:
+            self._select_file(str(added[-1]))
+        elif not self._selected_file_id:
+            self._select_file(str(added[0]))
+        self.status_label.setText(f"正在加载文件… 已加载 {len(self._opened_files)} 个")
+
+    def _on_ingest_done(self, generation: int, job: IngestJob, stats: IngestStats) -> None:
+        if job in self._ingest_jobs:
+            self._ingest_jobs.remove(job)
+        if generation != self._ingest_generation or self._ingest_jobs:
+            return
+        skipped = []
+        if stats.skipped_ignored:
+            skipped.append(f"忽略 {stats.skipped_ignored}")
+        if stats.skipped_binary:
+            skipped.append(f"二进制 {stats.skipped_binary}")
+        if stats.skipped_size:
+            skipped.append(f"过大 {stats.skipped_size}")
+        if stats.errors:
+            skipped.append(f"读取失败 {len(stats.errors)}")
+        suffix = f"（跳过：{'，'.join(skipped)}）" if skipped else ""
+        self.status_label.setText(f"已加载 {len(self._opened_files)} 个文件{suffix}")
 
-        for p in self._opened_files:
-            fid = str(p)
-            icon = icon_for_file(p)
-            card = FileCardWidget(file_id=fid, title=p.name, icon=icon)
-            card.clicked.connect(self._select_file)
-            card.remove_requested.connect(self._remove_file)
-            card.set_selected(fid == self._selected_file_id)
-            self._file_cards[fid] = card
-            self.files_layout.addWidget(card)
     def _select_file(self, file_id: str) -> None:
         if file_id not in self._file_contents:
             return
         self._selected_file_id = file_id
-        for fid, card in self._file_cards.items():
-            card.set_selected(fid == file_id)
+        self.files_view.select_file(file_id)
         self.code_edit.blockSignals(True)
         self.code_edit.setPlainText(self._file_contents.get(file_id, ""))
         self.code_edit.blockSignals(False)
@@ -364,11 +666,10 @@ class MainWindow(QMainWindow):
             return
         self._opened_files = [p for p in self._opened_files if str(p) != file_id]
         self._file_contents.pop(file_id, None)
-        self._file_cards.pop(file_id, None)
+        self.files_model.remove_path(file_id)
         removed_selected = self._selected_file_id == file_id
         if removed_selected:
             self._selected_file_id = ""
-        self._refresh_files_ui()
         if removed_selected and self._opened_files:
             self._select_file(str(self._opened_files[0]))
         elif removed_selected:
@@ -376,7 +677,6 @@ class MainWindow(QMainWindow):
             self.code_edit.clear()
             self.code_edit.blockSignals(False)
             self.status_label.setText("就绪。")
-            self._clear_results()
             self._render_placeholder("就绪。点击“开始检测”。")
 
     def _on_code_changed(self) -> None:
@@ -389,69 +689,218 @@ class MainWindow(QMainWindow):
 
     def _build_code_for_analysis(self) -> str:
         if self._is_project_mode():
+            names = self._display_names()
             parts: list[str] = []
             for p in self._opened_files:
                 fid = str(p)
                 content = self._file_contents.get(fid, "")
-                parts.append(f"### {p.name}\n{content}")
+                parts.append(f"### {names[fid]}\n{content}")
             return "\n\n".join(parts)
         return self.code_edit.toPlainText()
 
+    def _common_root(self) -> Path | None:
+        if not self._opened_files:
+            return None
+        try:
+            return Path(os.path.commonpath([str(p.parent) for p in self._opened_files]))
+        except ValueError:
+            return None
+
+    def _display_names(self) -> dict[str, str]:
+        root = self._common_root()
+        if root is None:
+            return {str(p): p.as_posix() for p in self._opened_files}
+        return {str(p): p.relative_to(root).as_posix() for p in self._opened_files}
+
 
 def _format_metrics(metrics: dict) -> str:
     lines = []
     if not isinstance(metrics, dict):
         return ""
-    for key in ["lines", "functions", "classes", "complexity_hint"]:
+    keys = ["language", "lines", "functions", "classes", "max_complexity", "max_nesting", "complexity_hint"]
+    for key in [*keys, "hunks", "added_lines", "removed_lines", "input_tokens", "input_tokens_saved", "cached_prompt_tokens", "repaired_fields"]:
         if key in metrics and metrics[key] not in (None, ""):
             lines.append(f"{key}: {metrics[key]}")
     return " | ".join(lines)
 
 
-def guess_language(code: str) -> str:
-    if re.search(r"^\s*def\s+\w+\(", code, flags=re.M) or "import " in code:
-        return "Python"
-    if re.search(r"^\s*function\s+\w+\(", code, flags=re.M) or "console.log" in code:
-        return "JavaScript/TypeScript"
-    if "#include" in code or re.search(r"\bstd::", code):
-        return "C/C++"
-    if "public class " in code or "System.out" in code:
-        return "Java"
-    if "package main" in code or "func " in code:
-        return "Go"
-    return "未知/自动"
-
-
 class AnalyzeSignals(QObject):
+    cached = pyqtSignal()
+    partial = pyqtSignal(object)
     succeeded = pyqtSignal(object)
     failed = pyqtSignal(str)
     finished = pyqtSignal()
 
 
 class AnalyzeJob(QRunnable):
-    def __init__(self, code: str, language_hint: str, settings: AppSettings, extra_requirements: str = "") -> None:
+    def __init__(
+        self,
+        code: str,
+        language_hint: str,
+        settings: AppSettings,
+        extra_requirements: str = "",
+        cache: ResultCache | None = None,
+        force_refresh: bool = False,
+        path: str = "",
+        cancel: CancelToken | None = None,
+    ) -> None:
         super().__init__()
         self.code = code
         self.language_hint = language_hint
         self.settings = settings
         self.extra_requirements = extra_requirements
+        self.cache = cache
+        self.force_refresh = force_refresh
+        self.path = path
+        self.cancel = cancel
         self.signals = AnalyzeSignals()
 
     def run(self) -> None:
         try:
-            client = DeepSeekClient(base_url=self.settings.base_url, api_key=self.settings.api_key)
-            resp = client.analyze_code(
+            parser = ReviewStreamParser()
+
+            def on_delta(piece: str) -> None:
+                for event in parser.feed(piece):
+                    self.signals.partial.emit(event)
+
+            outcome = analyze_single(
+                self.settings,
                 code=self.code,
                 language_hint=self.language_hint,
-                model=self.settings.model,
                 extra_requirements=self.extra_requirements,
+                cache=self.cache,
+                force_refresh=self.force_refresh,
+                on_delta=on_delta,
+                path=self.path,
+                cancel=self.cancel,
+            )
+            if outcome.from_cache:
+                self.signals.cached.emit()
+            self.signals.succeeded.emit(outcome.result)
+        except Cancelled:
+            pass
+        except Exception as e:
+            detail = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+            self.signals.failed.emit(detail)
+        finally:
+            self.signals.finished.emit()
+
+
+class DiffLoadSignals(QObject):
+    loaded = pyqtSignal(object)
+    rejected = pyqtSignal(str)
+
+
+class DiffLoadJob(QRunnable):
+    def __init__(self, repo: Path, settings: AppSettings) -> None:
+        super().__init__()
+        self.repo = repo
+        self.settings = settings
+        self.signals = DiffLoadSignals()
+
+    def run(self) -> None:
+        base = self.settings.diff_base
+        try:
+            hunks = changed_hunks(self.repo, base, self.settings.diff_context)
+        except GitDiffError as e:
+            self.signals.rejected.emit(str(e))
+            return
+        except Exception as e:
+            self.signals.rejected.emit(f"读取改动失败：{type(e).__name__}: {e}")
+            return
+        if not hunks:
+            self.signals.rejected.emit(f"与 {base} 相比没有代码改动。")
+            return
+        self.signals.loaded.emit(hunks)
+
+
+class DiffReviewJob(QRunnable):
+    def __init__(
+        self,
+        hunks: list,
+        settings: AppSettings,
+        cache: ResultCache | None = None,
+        force_refresh: bool = False,
+        cancel: CancelToken | None = None,
+    ) -> None:
+        super().__init__()
+        self.hunks = hunks
+        self.settings = settings
+        self.cache = cache
+        self.force_refresh = force_refresh
+        self.cancel = cancel
+        self.signals = AnalyzeSignals()
+
+    def run(self) -> None:
+        try:
+            parser = ReviewStreamParser()
+
+            def on_delta(piece: str) -> None:
+                for event in parser.feed(piece):
+                    self.signals.partial.emit(event)
+
+            outcome = analyze_diff(
+                self.settings,
+                self.hunks,
+                cache=self.cache,
+                force_refresh=self.force_refresh,
+                on_delta=on_delta,
+                cancel=self.cancel,
+            )
+            if outcome.from_cache:
+                self.signals.cached.emit()
+            self.signals.succeeded.emit(outcome.result)
+        except Cancelled:
+            pass
+        except Exception as e:
+            detail = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+            self.signals.failed.emit(detail)
+        finally:
+            self.signals.finished.emit()
+
+
+class ProjectAnalyzeSignals(QObject):
+    file_done = pyqtSignal(object, int, int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+
+class ProjectAnalyzeJob(QRunnable):
+    def __init__(
+        self,
+        files: list[tuple[str, str]],
+        settings: AppSettings,
+        cache: ResultCache | None = None,
+        force_refresh: bool = False,
+        state: AnalysisState | None = None,
+        cancel: CancelToken | None = None,
+    ) -> None:
+        super().__init__()
+        self.files = files
+        self.settings = settings
+        self.cache = cache
+        self.force_refresh = force_refresh
+        self.state = state
+        self.cancel = cancel
+        self.signals = ProjectAnalyzeSignals()
+
+    def run(self) -> None:
+        try:
+            result, _ = analyze_files(
+                self.settings,
+                self.files,
+                max_workers=self.settings.max_workers,
+                cache=self.cache,
+                force_refresh=self.force_refresh,
+                reduce_with_model=self.settings.reduce_with_model,
+                on_file_done=lambda fr, done, total: self.signals.file_done.emit(fr, done, total),
+                state=self.state,
+                cancel=self.cancel,
             )
-            payload = _safe_parse_json(resp.content_text)
-            payload.setdefault("metrics", {})
-            if isinstance(payload.get("metrics"), dict):
-                payload["metrics"] = {**_local_metrics(self.code), **payload["metrics"]}
-            result = parse_review_json(payload)
             self.signals.succeeded.emit(result)
+        except Cancelled:
+            pass
         except Exception as e:
             detail = "".join(traceback.format_exception(type(e), e, e.__traceback__))
             self.signals.failed.emit(detail)
@@ -459,55 +908,34 @@ class AnalyzeJob(QRunnable):
             self.signals.finished.emit()
 
 
-def _local_metrics(code: str) -> dict:
-    lines = [ln for ln in code.splitlines() if ln.strip()]
-    functions = len(re.findall(r"^\s*def\s+\w+\(", code, flags=re.M)) + len(
-        re.findall(r"^\s*(?:async\s+)?function\s+\w+\(", code, flags=re.M)
-    )
-    classes = len(re.findall(r"^\s*class\s+\w+", code, flags=re.M)) + len(
-        re.findall(r"^\s*public\s+class\s+\w+", code, flags=re.M)
-    )
-    branch_tokens = len(re.findall(r"\b(if|elif|else if|for|while|case|catch|except)\b", code))
-    if branch_tokens >= 40:
-        complexity_hint = "高"
-    elif branch_tokens >= 18:
-        complexity_hint = "中"
-    else:
-        complexity_hint = "低"
-    return {"lines": len(lines), "functions": functions, "classes": classes, "complexity_hint": complexity_hint}
-
-
-def _safe_parse_json(text: str) -> dict:
-    text = text.strip()
-    if text.startswith("```"):
-        text = re.sub(r"^```[a-zA-Z0-9_-]*\s*", "", text)
-        text = re.sub(r"\s*```$", "", text)
-        text = text.strip()
-    try:
-        obj = json.loads(text)
-        return obj if isinstance(obj, dict) else {"overall_score": 0, "overall_summary": "模型输出非JSON对象", "raw": obj}
-    except Exception:
-        extracted = _extract_json_object(text)
-        if extracted:
-            try:
-                obj = json.loads(extracted)
-                return obj if isinstance(obj, dict) else {"overall_score": 0, "overall_summary": "模型输出非JSON对象", "raw": obj}
-            except Exception:
-                pass
-        return {"overall_score": 0, "overall_summary": "无法解析模型返回为JSON。", "raw_text": text}
+class IngestSignals(QObject):
+    batch = pyqtSignal(object)
+    done = pyqtSignal(object)
 
 
-def _extract_json_object(text: str) -> str:
-    start = text.find("{")
-    if start < 0:
-        return ""
-    depth = 0
-    for i in range(start, len(text)):
-        ch = text[i]
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                return text[start : i + 1]
-    return ""
+class IngestJob(QRunnable):
+    def __init__(self, paths: list[Path], options: IngestOptions, batch_size: int = 64) -> None:
+        super().__init__()
+        self.paths = paths
+        self.options = options
+        self.batch_size = batch_size
+        self.signals = IngestSignals()
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def run(self) -> None:
+        stats = IngestStats()
+        try:
+            stats = ingest(
+                self.paths,
+                self.options,
+                batch_size=self.batch_size,
+                on_batch=self.signals.batch.emit,
+                should_stop=lambda: self._cancelled,
+            )
+        except Exception as e:
+            stats.errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            self.signals.done.emit(stats)
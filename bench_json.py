@@ -0,0 +1,102 @@
+import json
+import re
+import sys
+import time
+
+from app.analysis import _safe_parse_json
+from app.json_stream import JsonExtractor
+
+
+def legacy_parse(text: str) -> dict:
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```[a-zA-Z0-9_-]*\s*", "", text)
+        text = re.sub(r"\s*```$", "", text)
+        text = text.strip()
+    try:
+        obj = json.loads(text)
+        return obj if isinstance(obj, dict) else {}
+    except Exception:
+        start = text.find("{")
+        depth = 0
+        for i in range(max(0, start), len(text)):
+            if text[i] == "{":
+                depth += 1
+            elif text[i] == "}":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        return json.loads(text[start : i + 1])
+                    except Exception:
+                        break
+        return {"raw_text": text}
+
+
+def sample(categories: int) -> str:
+    payload = {
+        "overall_score": 72,
+        "overall_summary": "整体结构清晰，但部分函数过长 {见下}",
+        "categories": [
+            {
+                "name": f"维度{i}",
+                "score": 60 + i % 40,
+                "summary": "说明 " * 20,
+                "issues": [f"第 {j} 处：使用 {{}} 占位并在 \"字符串\" 中嵌套 [括号]" for j in range(20)],
+                "suggestions": ["拆分函数，提取 {helper}" for _ in range(10)],
+            }
+            for i in range(categories)
+        ],
+    }
+    return json.dumps(payload, ensure_ascii=False, indent=1)
+
+
+def timed(fn, text: str, repeat: int) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def streamed(text: str, chunk: int = 16) -> object:
+    extractor = JsonExtractor()
+    for i in range(0, len(text), chunk):
+        extractor.feed(text[i : i + chunk])
+    return extractor.value()
+
+
+def main() -> int:
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 200, 2000]
+    print(f"{'场景':<14}{'大小':>10}{'旧实现':>12}{'新实现':>12}  结果")
+    failures = 0
+    for n in sizes:
+        text = sample(n)
+        variants = {
+            "合法 JSON": text,
+            "代码块包裹": f"```json\n{text}\n```",
+            "前后有说明": f"以下是结果：\n{text}\n以上。",
+            "尾随逗号": re.sub(r"([^\s,\[{])(\s*[\]}])", r"\1,\2", text),
+            "输出被截断": text[: len(text) * 2 // 3],
+            "只有说明文字": "抱歉，无法按 { JSON 格式输出本次结果。" * max(1, n // 10),
+        }
+        repeat = 5 if n <= 200 else 2
+        for name, body in variants.items():
+            old_s, old = timed(legacy_parse, body, repeat)
+            new_s, new = timed(_safe_parse_json, body, repeat)
+            old_n = len(old.get("categories", [])) if isinstance(old, dict) else 0
+            new_n = len(new.get("categories", [])) if isinstance(new, dict) else 0
+            kept = "  保留原文" if "raw_text" in new else ""
+            print(f"{name:<14}{len(body) // 1024:>8}KB{old_s * 1000:>10.1f}ms{new_s * 1000:>10.1f}ms  维度 {old_n} -> {new_n}{kept}")
+            if name == "只有说明文字" and new.get("raw_text") != body.strip():
+                failures += 1
+        stream_s, value = timed(streamed, text, 1)
+        ok = isinstance(value, dict) and len(value.get("categories", [])) == n
+        print(f"{'流式 16 字符':<14}{len(text) // 1024:>8}KB{'':>12}{stream_s * 1000:>10.1f}ms  {'一致' if ok else '不一致'}")
+        failures += 0 if ok else 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 import sys
 import traceback
@@ -7,6 +8,7 @@ from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import QApplication, QMessageBox
 
 try:
+    from app.settings import APPLICATION_NAME, ORGANIZATION_NAME
     from app.window import MainWindow
 except ImportError as e:
     app = QApplication(sys.argv)
@@ -41,8 +43,8 @@ def main() -> int:
             if platform_dir.exists():
                 os.environ.setdefault("QT_QPA_PLATFORM_PLUGIN_PATH", str(platform_dir))
         app = QApplication(sys.argv)
-        app.setApplicationName("代码检测")
-        app.setOrganizationName("代码检测")
+        app.setApplicationName(APPLICATION_NAME)
+        app.setOrganizationName(ORGANIZATION_NAME)
         icon_path = _find_app_icon()
         if icon_path is not None:
             app_icon = QIcon(str(icon_path))
@@ -58,4 +60,5 @@ def main() -> int:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     sys.exit(main())